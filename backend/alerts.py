@@ -0,0 +1,236 @@
+import asyncio
+import math
+import time
+from collections import deque
+from functools import partial
+from itertools import islice
+
+ALERTS_EVENT = 'alerts_batch'
+
+
+class AlertClient:
+    """Delivery state for one connected dashboard."""
+
+    __slots__ = ('sid', 'pending', 'in_flight', 'regions', 'frames', 'delivered', 'dropped')
+
+    def __init__(self, sid, buffer_size):
+        self.sid = sid
+        self.pending = deque(maxlen=buffer_size)  # Alerts not yet sent; oldest fall off when full
+        self.in_flight = {}                       # frame id -> send time, until the client acks
+        self.regions = None                       # None = every alert, else the set of region rooms
+        self.frames = 0
+        self.delivered = 0
+        self.dropped = 0
+
+
+class AlertLog:
+    """
+    Bounded, sequence-numbered log of alerts shared by several web workers (kept on a state
+    shard), so a dashboard connected to any worker sees alerts raised by every worker.
+    """
+
+    def __init__(self, size):
+        self.alerts = deque(maxlen=size)
+        self.seq = 0  # Alerts ever appended
+
+    def exchange(self, alerts, seq):
+        """
+        Appends a worker's new alerts and returns (seq, alerts after `seq`, missed) for it to
+        deliver: its own included, so every worker delivers the same stream. missed counts
+        alerts that fell out of the log before the worker came back. seq=None starts a reader
+        at the alerts it is appending.
+        """
+        start = self.seq if seq is None else seq
+        self.alerts.extend(alerts)
+        self.seq += len(alerts)
+        count = min(self.seq - start, len(self.alerts))
+        return self.seq, list(islice(self.alerts, len(self.alerts) - count, None)), self.seq - start - count
+
+
+class AlertBroadcaster:
+    """
+    Delivers fraud alerts to Socket.IO clients off the scoring path.
+    publish() only appends to a bounded queue (the oldest alert is dropped when full); run()
+    drains it every `interval` seconds into at most one ALERTS_EVENT frame per client.
+    A client either receives every alert or subscribes to a map viewport, which joins the
+    coarse region rooms (region_deg grid cells) it covers. Each client has its own bounded
+    buffer and at most max_in_flight unacknowledged frames, so a slow client falls behind by
+    dropping its oldest alerts rather than holding memory or delaying anyone else. Frames
+    not acked within ack_timeout are written off (clients that never ack still get
+    max_in_flight frames per timeout).
+    With several web workers, `relay` exchanges each drained batch for every worker's alerts
+    (see AlertLog), so each worker delivers the full stream to its own clients.
+    """
+
+    def __init__(self, emit, interval=0.1, queue_size=10000, client_buffer=1000, max_batch=500,
+                 max_in_flight=2, ack_timeout=10.0, region_deg=2.0, max_regions=2048, on_drop=None,
+                 relay=None):
+        self.emit = emit  # async (event, data, to=sid, callback=fn), e.g. sio.emit
+        self.relay = relay  # async (alerts) -> (alerts from all workers, missed), or None
+        self.interval = interval
+        self.client_buffer = client_buffer
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.region_deg = region_deg
+        self.max_regions = max_regions
+        self.on_drop = on_drop    # (reason, count) callback, e.g. a metrics counter
+        self.queue = deque(maxlen=queue_size)
+        self.clients = {}
+        self.everyone = set()     # sids without a viewport subscription
+        self.rooms = {}           # region -> set of sids
+        self._frame_ids = 0
+        self.published = 0
+        self.frames = 0
+        self.delivered = 0
+        self.timed_out = 0
+        self.dropped = {'queue': 0, 'client': 0, 'relay': 0}
+
+    def _drop(self, reason, count):
+        self.dropped[reason] += count
+        if self.on_drop is not None:
+            self.on_drop(reason, count)
+
+    # --- Producers (event loop, never await) ---
+    def publish(self, alert):
+        if len(self.queue) == self.queue.maxlen:
+            self._drop('queue', 1)
+        self.queue.append(alert)
+        self.published += 1
+
+    def publish_many(self, alerts):
+        for alert in alerts:
+            self.publish(alert)
+
+    # --- Subscriptions ---
+    def connect(self, sid):
+        self.clients[sid] = AlertClient(sid, self.client_buffer)
+        self.everyone.add(sid)
+
+    def disconnect(self, sid):
+        client = self.clients.pop(sid, None)
+        if client is None:
+            return
+        self._leave_rooms(client)
+        self.everyone.discard(sid)
+
+    def region_of(self, lat, lng):
+        return (math.floor(lat / self.region_deg), math.floor(lng / self.region_deg))
+
+    def subscribe(self, sid, min_lat=None, min_lng=None, max_lat=None, max_lng=None):
+        """
+        Restricts a client to alerts inside the viewport (rounded out to whole regions).
+        No viewport, or one spanning more than max_regions regions, means every alert.
+        Returns the number of regions joined (0 = everything).
+        """
+        client = self.clients.get(sid)
+        if client is None:
+            return 0
+        self._leave_rooms(client)
+        regions = None
+        if None not in (min_lat, min_lng, max_lat, max_lng):
+            lat0, lng0 = self.region_of(max(min_lat, -90.0), max(min_lng, -180.0))
+            lat1, lng1 = self.region_of(min(max_lat, 90.0), min(max_lng, 180.0))
+            if lat1 >= lat0 and lng1 >= lng0 and (lat1 - lat0 + 1) * (lng1 - lng0 + 1) <= self.max_regions:
+                regions = {(i, j) for i in range(lat0, lat1 + 1) for j in range(lng0, lng1 + 1)}
+        if regions is None:
+            self.everyone.add(sid)
+            return 0
+        self.everyone.discard(sid)
+        client.regions = regions
+        for region in regions:
+            self.rooms.setdefault(region, set()).add(sid)
+        return len(regions)
+
+    def _leave_rooms(self, client):
+        for region in client.regions or ():
+            room = self.rooms.get(region)
+            if room is not None:
+                room.discard(client.sid)
+                if not room:
+                    del self.rooms[region]
+        client.regions = None
+
+    # --- Delivery ---
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Alert broadcast failed: {e}")
+
+    def _route(self, alerts):
+        """Appends drained alerts to the buffers of the clients that should see them."""
+        targets = [(self.clients[sid], alerts) for sid in self.everyone]
+        if self.rooms:
+            by_region = {}
+            for alert in alerts:
+                by_region.setdefault(self.region_of(alert['lat'], alert['lng']), []).append(alert)
+            for region, region_alerts in by_region.items():
+                for sid in self.rooms.get(region, ()):
+                    targets.append((self.clients[sid], region_alerts))
+        for client, new in targets:
+            overflow = len(client.pending) + len(new) - self.client_buffer
+            if overflow > 0:
+                client.dropped += overflow
+                self._drop('client', overflow)
+            client.pending.extend(new)
+
+    async def flush(self):
+        """Routes queued alerts, then sends each client with capacity one frame of its backlog."""
+        alerts = list(self.queue)
+        self.queue.clear()
+        if self.relay is not None:
+            alerts, missed = await self.relay(alerts)
+            if missed:
+                self._drop('relay', missed)
+        if alerts:
+            self._route(alerts)
+
+        now = time.monotonic()
+        for client in list(self.clients.values()):
+            if not client.pending:
+                continue
+            if client.in_flight:
+                stale = [frame for frame, sent in client.in_flight.items() if now - sent > self.ack_timeout]
+                for frame in stale:
+                    del client.in_flight[frame]
+                self.timed_out += len(stale)
+                if len(client.in_flight) >= self.max_in_flight:
+                    continue  # Falling behind: keep buffering (drop-oldest)
+            count = min(len(client.pending), self.max_batch)
+            frame = [client.pending.popleft() for _ in range(count)]
+            self._frame_ids += 1
+            client.in_flight[self._frame_ids] = now
+            try:
+                await self.emit(ALERTS_EVENT, frame, to=client.sid,
+                                callback=partial(self._ack, client, self._frame_ids))
+            except Exception as e:
+                client.in_flight.pop(self._frame_ids, None)
+                print(f"Alert delivery to {client.sid} failed: {e}")
+                continue
+            client.frames += 1
+            client.delivered += count
+            self.frames += 1
+            self.delivered += count
+
+    def _ack(self, client, frame, *args):
+        client.in_flight.pop(frame, None)
+
+    def stats(self):
+        backlogs = [len(c.pending) for c in self.clients.values()]
+        return {
+            "queue_depth": len(self.queue),
+            "queue_size": self.queue.maxlen,
+            "clients": len(self.clients),
+            "viewport_clients": len(self.clients) - len(self.everyone),
+            "rooms": len(self.rooms),
+            "published": self.published,
+            "frames": self.frames,
+            "delivered": self.delivered,
+            "frames_timed_out": self.timed_out,
+            "dropped": dict(self.dropped),
+            "client_backlog": sum(backlogs),
+            "max_client_backlog": max(backlogs, default=0),
+        }
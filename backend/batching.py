@@ -0,0 +1,66 @@
+import asyncio
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent scoring requests into one vectorized call.
+    Rows submitted within max_wait_ms of the first pending row (or until max_batch rows
+    are pending) are scored together by the coroutine score_fn(rows) -> sequence of results,
+    and each caller's future is resolved with its own result.
+    """
+
+    def __init__(self, score_fn, max_batch=256, max_wait_ms=2.0):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def submit(self, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        """Starts scoring everything pending as one batch. Safe to call when nothing is pending."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        task = asyncio.ensure_future(self._score(pending))
+        self._tasks.add(task)  # Keep a reference until done
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, pending):
+        rows = [row for row, _ in pending]
+        try:
+            results = await self.score_fn(rows)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(rows)
+        for (_, future), result in zip(pending, results):
+            if not future.done():  # Caller may have been cancelled
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": (self.rows / self.batches) if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
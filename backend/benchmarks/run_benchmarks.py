@@ -0,0 +1,298 @@
+"""
+Offline benchmark suite for the backend hot paths.
+
+Generates transactions with data_generator.py (fixed seed and epoch, so runs are
+reproducible), then measures:
+  * detection state growth: apply_transaction throughput and check_graph_risk /
+    get_velocity_1h cost as FRAUD_GRAPH and the velocity store fill up
+  * single /predict latency and throughput through an in-process ASGI client
+  * /predict/batch throughput
+  * train_model.feature_engineering and train_model wall time and peak memory, each in a
+    fresh process so the peak resident set (ru_maxrss) covers numpy/sklearn buffers too
+
+Results are written as JSON and can be compared against a stored baseline.
+
+Run from the repository root:
+    python -m backend.benchmarks.run_benchmarks --sizes 50k,500k,5M
+    python -m backend.benchmarks.run_benchmarks --sizes 50k --baseline backend/benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backend.data_generator import generate_chunks
+
+RESULTS_DIR = 'backend/benchmarks/results'
+# Generated transactions end at this epoch (2026-01-01 UTC) rather than now, so a given
+# --seed yields the same data on every run
+BENCH_EPOCH = 1_767_225_600
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def benchmark_transactions(n, seed=42):
+    """n transactions from data_generator.generate_chunks, in time order."""
+    df = pd.concat(generate_chunks(n, seed=seed, end_time=BENCH_EPOCH), ignore_index=True)
+    return df.sort_values('timestamp', kind='stable', ignore_index=True)
+
+
+def _records(df):
+    records = df.drop(columns=['is_fraud', 'city']).to_dict(orient='records')
+    for r in records:
+        r['timestamp'] = r['timestamp'].isoformat()
+    return records
+
+
+def _summary(latencies):
+    lat = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p90_ms": float(np.percentile(lat, 90)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "mean_ms": float(lat.mean()),
+    }
+
+
+def bench_state_growth(main, df, checkpoints=5, probes=1000):
+    """Applies every transaction to the detection state, probing lookup cost at checkpoints."""
+    main.reset_state()
+    records = _records(df)
+    n = len(records)
+    marks = set(np.linspace(n / checkpoints, n, checkpoints, dtype=int).tolist())
+    rng = np.random.default_rng(0)
+    results = []
+    applied_time = 0.0
+    for i, record in enumerate(records, start=1):
+        txn = main.Transaction(**record)
+        t0 = time.perf_counter()
+        main.apply_transaction(txn, datetime.fromisoformat(record['timestamp']))
+        applied_time += time.perf_counter() - t0
+        if i in marks:
+            picks = rng.integers(0, i, probes)
+            now = datetime.fromisoformat(record['timestamp'])
+            t0 = time.perf_counter()
+            for j in picks:
+                main.check_graph_risk(records[j]['receiver_id'], now)
+            graph_us = (time.perf_counter() - t0) / probes * 1e6
+            t0 = time.perf_counter()
+            for j in picks:
+                main.get_velocity_1h(records[j]['sender_id'], now)
+            velocity_us = (time.perf_counter() - t0) / probes * 1e6
+            results.append({
+                "transactions": i,
+                "graph_nodes": main.FRAUD_GRAPH.number_of_nodes(),
+                "graph_edges": main.FRAUD_GRAPH.number_of_edges(),
+                "velocity_events": len(main.VELOCITY_STORE),
+                "check_graph_risk_us": graph_us,
+                "get_velocity_1h_us": velocity_us,
+            })
+    return {"apply_tps": n / applied_time if applied_time else 0.0, "checkpoints": results}
+
+
+async def _bench_predict(main, records, concurrency):
+    import httpx
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    queue = iter(records)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def worker():
+            for record in queue:
+                t0 = time.perf_counter()
+                response = await client.post('/predict', json=record)
+                latencies.append(time.perf_counter() - t0)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return dict(_summary(latencies), throughput_tps=len(records) / elapsed, concurrency=concurrency)
+
+
+async def _bench_batch(main, records, batch_size):
+    import httpx
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        start = time.perf_counter()
+        for i in range(0, len(records), batch_size):
+            t0 = time.perf_counter()
+            response = await client.post('/predict/batch', json=records[i:i + batch_size])
+            latencies.append(time.perf_counter() - t0)
+            response.raise_for_status()
+        elapsed = time.perf_counter() - start
+    return dict(_summary(latencies), throughput_tps=len(records) / elapsed, batch_size=batch_size)
+
+
+async def bench_predict(main, df, requests, concurrency_levels, batch_sizes):
+    records = _records(df.head(requests))
+    results = {}
+    for concurrency in concurrency_levels:
+        main.reset_state()
+        results[f"predict_c{concurrency}"] = await _bench_predict(main, records, concurrency)
+    for batch_size in batch_sizes:
+        main.reset_state()
+        results[f"predict_batch_{batch_size}"] = await _bench_batch(main, records, batch_size)
+    return results
+
+
+def _max_rss_mb():
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return maxrss / 2 ** 20 if sys.platform == 'darwin' else maxrss / 2 ** 10
+
+
+def _training_case(stage, input_path, output_path):
+    """
+    Runs one training stage on a pickled frame in this (fresh) process. input_rss_mb is the
+    peak after loading the input; peak_rss_mb includes the stage's native allocations.
+    """
+    from backend import train_model
+    df = pd.read_pickle(input_path)
+    input_rss = _max_rss_mb()
+    t0 = time.perf_counter()
+    if stage == 'feature_engineering':
+        features, _ = train_model.feature_engineering(df)
+        wall = time.perf_counter() - t0
+        features.to_pickle(output_path)
+    else:
+        train_model.train_model(df)
+        wall = time.perf_counter() - t0
+    return {"wall_s": wall, "input_rss_mb": input_rss, "peak_rss_mb": _max_rss_mb()}
+
+
+def _measure(stage, input_path, output_path=None):
+    """_training_case in a new interpreter, so its peak RSS is not the benchmark's own."""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(_training_case, stage, input_path, output_path).result()
+
+
+def bench_training(df):
+    with tempfile.TemporaryDirectory() as tmp:
+        raw, features = os.path.join(tmp, 'raw.pkl'), os.path.join(tmp, 'features.pkl')
+        df.to_pickle(raw)
+        fe = _measure('feature_engineering', raw, features)
+        train = _measure('train_model', features)
+    return {"feature_engineering": fe, "train_model": train}
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, list):
+            for i, item in enumerate(value):
+                flat.update(flatten(item, f"{name}[{i}]."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, tolerance):
+    """Returns metrics that regressed by more than tolerance (latency/time up or throughput down)."""
+    now, base = flatten(current), flatten(baseline)
+    regressions = []
+    for key, value in now.items():
+        old = base.get(key)
+        if not old:
+            continue
+        if key.endswith(('_ms', '_us', '_s', '_mb')):
+            ratio = value / old
+        elif key.endswith('_tps'):
+            ratio = old / value if value else float('inf')
+        else:
+            continue
+        if ratio > 1 + tolerance:
+            regressions.append({"metric": key, "baseline": old, "current": value, "ratio": ratio})
+    return regressions
+
+
+async def run(args):
+    from backend import main as app_main
+    # Same startup as the server (model load, compile, scoring pool), without lifespan.
+    # Persistence stays off so runs neither restore nor leave behind detection state.
+    app_main.STATE_PERSISTENCE = False
+    await app_main.startup_event()
+
+    results = {}
+    for size in (parse_size(s) for s in args.sizes.split(',')):
+        print(f"=== {size} transactions ===")
+        t0 = time.perf_counter()
+        df = benchmark_transactions(size, args.seed)
+        entry = {"generate_s": time.perf_counter() - t0}
+        entry["state_growth"] = bench_state_growth(app_main, df)
+        entry.update(await bench_predict(app_main, df, args.requests,
+                                         [int(c) for c in args.concurrency.split(',')],
+                                         [int(b) for b in args.batch_sizes.split(',')]))
+        if size <= args.train_max_rows:
+            entry.update(bench_training(df))
+        results[str(size)] = entry
+        print(json.dumps(entry, indent=2))
+
+    await app_main.shutdown_event()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='50k,500k,5M', help='comma-separated transaction counts')
+    parser.add_argument('--requests', type=int, default=2000, help='transactions sent through /predict')
+    parser.add_argument('--concurrency', default='1,64', help='comma-separated /predict client concurrency')
+    parser.add_argument('--batch-sizes', default='256,1024', help='comma-separated /predict/batch sizes')
+    parser.add_argument('--train-max-rows', type=int, default=100_000,
+                        help='skip feature engineering/training above this size (DBSCAN + RF are slow)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=None, help='output JSON path')
+    parser.add_argument('--baseline', default=None, help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression ratio')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    out = args.out or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['metric']}: {r['baseline']:.4g} -> {r['current']:.4g} (x{r['ratio']:.2f})")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+import heapq
+import os
+from datetime import datetime
+
+
+class Blocklist:
+    """
+    Frozen accounts, checked before any scoring work (one dict lookup per side).
+    Changes are appended to a journal ("account_id<TAB>frozen_at" freezes, "-account_id"
+    unfreezes), so the list survives restarts, and every process sharing the journal picks
+    up the others' changes with sync(). An optional seed file (one account ID per line,
+    e.g. exported from the core banking system) is bulk-loaded underneath the journal.
+    """
+
+    def __init__(self, path, seed_path=None):
+        self.path = path
+        self.seed_path = seed_path
+        self.frozen = {}           # account -> frozen_at (None if it came from the seed file)
+        self.hits = {}             # account -> transactions blocked since startup
+        self.side_hits = {'sender': 0, 'receiver': 0}
+        self.journal_lines = 0     # journal lines read, for deciding when to compact
+        self._offset = 0
+        self._inode = None
+
+    def __len__(self):
+        return len(self.frozen)
+
+    def __contains__(self, account_id):
+        return account_id in self.frozen
+
+    def match(self, sender_id, receiver_id):
+        """Returns 'sender' or 'receiver' if that side is frozen (counting the hit), else None."""
+        frozen = self.frozen
+        if sender_id in frozen:
+            side, account_id = 'sender', sender_id
+        elif receiver_id in frozen:
+            side, account_id = 'receiver', receiver_id
+        else:
+            return None
+        self.hits[account_id] = self.hits.get(account_id, 0) + 1
+        self.side_hits[side] += 1
+        return side
+
+    # --- Changes ---
+    @staticmethod
+    def _check_id(account_id):
+        if not account_id or account_id[0] in '-#' or any(c in account_id for c in '\t\r\n'):
+            raise ValueError(f"Invalid account ID {account_id!r}")
+
+    def freeze(self, account_id):
+        """Freezes an account in memory. Returns the journal line to append(), or None if already frozen."""
+        self._check_id(account_id)
+        if account_id in self.frozen:
+            return None
+        frozen_at = datetime.now().isoformat(timespec='seconds')
+        self.frozen[account_id] = frozen_at
+        return f'{account_id}\t{frozen_at}\n'
+
+    def unfreeze(self, account_id):
+        """Unfreezes an account in memory. Returns the journal line to append(), or None if it wasn't frozen."""
+        if account_id not in self.frozen:
+            return None
+        del self.frozen[account_id]
+        self.hits.pop(account_id, None)
+        return f'-{account_id}\n'
+
+    def append(self, line):
+        """Persists a change (one O_APPEND write, so concurrent writers never interleave). Blocking."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # --- Loading ---
+    def _seed_ids(self):
+        if not self.seed_path or not os.path.exists(self.seed_path):
+            return
+        with open(self.seed_path) as f:
+            for line in f:
+                account_id = line.split(',', 1)[0].strip()
+                if account_id and not account_id.startswith('#'):
+                    yield account_id
+
+    def load(self):
+        """Bulk-loads the seed file, then replays the journal over it. Returns the number of frozen accounts."""
+        self.frozen = dict.fromkeys(self._seed_ids())
+        self.journal_lines = 0
+        self._offset, self._inode = 0, None
+        self.sync()
+        return len(self.frozen)
+
+    def sync(self):
+        """Applies journal lines appended since the last call (by any process). Returns the number applied."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        if self._inode is not None and (st.st_ino != self._inode or st.st_size < self._offset):
+            # Replaced by a compaction elsewhere: start over
+            self.load()
+            return self.journal_lines
+        self._inode = st.st_ino
+        if st.st_size == self._offset:
+            return 0
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        end = data.rfind(b'\n') + 1  # A line still being written is picked up next time
+        self._offset += end
+        applied = 0
+        for line in data[:end].decode().splitlines():
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('-'):
+                self.frozen.pop(line[1:], None)
+                self.hits.pop(line[1:], None)
+            else:
+                account_id, _, frozen_at = line.partition('\t')
+                self.frozen[account_id] = frozen_at or None
+            applied += 1
+        self.journal_lines += applied
+        return applied
+
+    def compact(self):
+        """
+        Rewrites the journal as just the difference from the seed file. Only safe while no
+        other process is appending (e.g. at single-process startup).
+        """
+        seed = set(self._seed_ids())
+        lines = [f'{a}\t{t or ""}\n' for a, t in self.frozen.items() if a not in seed]
+        lines += [f'-{a}\n' for a in seed if a not in self.frozen]
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        st = os.stat(self.path)
+        self._offset, self._inode, self.journal_lines = st.st_size, st.st_ino, len(lines)
+
+    def stats(self, top=10):
+        return {
+            "frozen": len(self.frozen),
+            "hits": dict(self.side_hits),
+            "top_accounts": [{"account_id": a, "hits": n}
+                             for a, n in heapq.nlargest(top, self.hits.items(), key=lambda item: item[1])],
+        }
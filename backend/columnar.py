@@ -0,0 +1,235 @@
+import json
+import os
+
+import numpy as np
+
+# pandas is imported where frames are built, so the serving process can use exists()/mtime()
+# and the memory-mapped columns without loading it.
+
+# On-disk layout: a directory with meta.json plus one raw binary file per column (and per
+# dictionary). Every file can be opened with np.memmap, so readers only touch the columns
+# they project and never parse text.
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+NUMERIC_COLUMNS = {'amount': 'float64', 'lat': 'float64', 'lng': 'float64', 'is_fraud': 'int8'}
+TIMESTAMP_COLUMNS = ('timestamp',)          # int64 microseconds since epoch
+ID_WIDTH = 36                               # UUID string length
+# Dictionary-encoded ID columns -> name of the dictionary they share
+DICT_COLUMNS = {'sender_id': 'accounts', 'receiver_id': 'accounts', 'device_id': 'devices'}
+BYTES_COLUMNS = ('txn_id',)                 # unique per row, stored as fixed-width bytes
+DICT_BUCKET_VALUES = 1 << 19                # IDs per bucket when dictionary-encoding on close()
+
+
+def exists(path):
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def mtime(path):
+    return os.path.getmtime(os.path.join(path, META_FILE))
+
+
+class ColumnarWriter:
+    """
+    Streams DataFrame chunks into the columnar layout. ID columns are written as
+    fixed-width bytes while streaming and dictionary-encoded into int32 codes on close(),
+    in buckets of bucket_values IDs so memory stays flat.
+    `categories` maps low-cardinality string columns (e.g. city) to their known values.
+    """
+
+    def __init__(self, path, categories=None, bucket_values=DICT_BUCKET_VALUES):
+        self.path = path
+        self.bucket_values = bucket_values
+        self.categories = {name: list(values) for name, values in (categories or {}).items()}
+        self.rows = 0
+        os.makedirs(path, exist_ok=True)
+        # Invalidate any previous dataset until close() writes fresh metadata
+        if exists(path):
+            os.remove(os.path.join(path, META_FILE))
+        self._files = {}
+
+    def _write(self, name, array):
+        f = self._files.get(name)
+        if f is None:
+            f = self._files[name] = open(os.path.join(self.path, f'{name}.bin'), 'wb')
+        np.ascontiguousarray(array).tofile(f)
+
+    def append(self, df):
+        import pandas as pd
+        for name, dtype in NUMERIC_COLUMNS.items():
+            self._write(name, df[name].to_numpy(dtype=dtype))
+        for name in TIMESTAMP_COLUMNS:
+            self._write(name, df[name].to_numpy().astype('datetime64[us]').view(np.int64))
+        for name in BYTES_COLUMNS + tuple(DICT_COLUMNS):
+            self._write(f'{name}.raw' if name in DICT_COLUMNS else name,
+                        df[name].to_numpy().astype(f'S{ID_WIDTH}'))
+        for name, values in self.categories.items():
+            codes = pd.Categorical(df[name], categories=values).codes.astype(np.int8)
+            self._write(name, codes)
+        self.rows += len(df)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+        columns = {}
+        for name, dtype in NUMERIC_COLUMNS.items():
+            columns[name] = {'kind': 'numeric', 'dtype': dtype}
+        for name in TIMESTAMP_COLUMNS:
+            columns[name] = {'kind': 'timestamp', 'dtype': 'int64'}
+        for name in BYTES_COLUMNS:
+            columns[name] = {'kind': 'bytes', 'dtype': f'S{ID_WIDTH}'}
+        for name, values in self.categories.items():
+            columns[name] = {'kind': 'category', 'dtype': 'int8', 'categories': values}
+
+        dictionaries = {}
+        for dictionary in sorted(set(DICT_COLUMNS.values())):
+            members = [name for name, d in DICT_COLUMNS.items() if d == dictionary]
+            size = self._encode(dictionary, members)
+            dictionaries[dictionary] = {'dtype': f'S{ID_WIDTH}', 'size': size}
+            for name in members:
+                columns[name] = {'kind': 'dict', 'dtype': 'int32', 'dictionary': dictionary}
+                if self.rows:
+                    os.remove(os.path.join(self.path, f'{name}.raw.bin'))
+
+        meta = {'version': FORMAT_VERSION, 'rows': self.rows, 'columns': columns, 'dictionaries': dictionaries}
+        tmp = os.path.join(self.path, META_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, META_FILE))  # Publish atomically
+
+    def _raw_chunks(self, name, size):
+        """Yields (start row, values) over a raw ID column, read (not mapped) size rows at a time."""
+        with open(os.path.join(self.path, f'{name}.raw.bin'), 'rb') as f:
+            for start in range(0, self.rows, size):
+                yield start, np.fromfile(f, dtype=f'S{ID_WIDTH}', count=size)
+
+    def _encode(self, dictionary, members):
+        """
+        Dictionary-encodes the raw member columns out of core. Values are hash-partitioned
+        into bucket files of about bucket_values entries, and each bucket is deduplicated on
+        its own, so peak memory is one bucket whatever the row count (the generator's IDs are
+        nearly all distinct, so an in-memory dictionary would grow with the rows). Codes are
+        scattered into memory-mapped output files. Returns the dictionary size.
+        """
+        total = self.rows * len(members)
+        if total == 0:
+            for name in (dictionary, *members):
+                open(os.path.join(self.path, f'{name}.bin'), 'wb').close()
+            return 0
+        buckets = max(1, -(-total // self.bucket_values))
+        paths = [os.path.join(self.path, f'{dictionary}.bucket{b}') for b in range(buckets)]
+        files = [(open(p + '.values', 'wb'), open(p + '.positions', 'wb')) for p in paths]
+        try:
+            for i, name in enumerate(members):
+                for start, values in self._raw_chunks(name, self.bucket_values):
+                    positions = np.arange(start, start + len(values), dtype=np.int64) + i * self.rows
+                    bucket = _hash(values) % buckets
+                    order = np.argsort(bucket, kind='stable')
+                    bounds = np.searchsorted(bucket[order], np.arange(buckets + 1))
+                    for b in range(buckets):
+                        part = order[bounds[b]:bounds[b + 1]]
+                        values[part].tofile(files[b][0])
+                        positions[part].tofile(files[b][1])
+        finally:
+            for f_values, f_positions in files:
+                f_values.close()
+                f_positions.close()
+
+        outputs = [np.memmap(os.path.join(self.path, f'{name}.bin'), dtype=np.int32, mode='w+',
+                             shape=(self.rows,)) for name in members]
+        size = 0
+        with open(os.path.join(self.path, f'{dictionary}.bin'), 'wb') as f_dictionary:
+            for p in paths:
+                values = np.fromfile(p + '.values', dtype=f'S{ID_WIDTH}')
+                positions = np.fromfile(p + '.positions', dtype=np.int64)
+                os.remove(p + '.values')
+                os.remove(p + '.positions')
+                uniques, inverse = np.unique(values, return_inverse=True)
+                uniques.tofile(f_dictionary)
+                codes = inverse.astype(np.int32).ravel() + size
+                member, row = np.divmod(positions, self.rows)
+                for i, output in enumerate(outputs):
+                    mask = member == i
+                    output[row[mask]] = codes[mask]
+                size += len(uniques)
+        for output in outputs:
+            output.flush()
+        return size
+
+
+def _hash(values):
+    """Cheap vectorized uint32 hash of fixed-width byte strings (FNV-style over 4-byte words)."""
+    words = np.frombuffer(values.tobytes(), dtype='<u4').reshape(len(values), -1)
+    h = np.full(len(values), 0x811C9DC5, dtype=np.uint32)
+    for j in range(words.shape[1]):
+        h ^= words[:, j]
+        h *= np.uint32(0x01000193)
+    return h
+
+
+class ColumnarTable:
+    """Read side: memory-mapped column access with projection."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta['rows']
+        self.columns = self.meta['columns']
+
+    def __len__(self):
+        return self.rows
+
+    def _map(self, name, dtype, count):
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f'{name}.bin'), dtype=dtype, mode='r', shape=(count,))
+
+    def raw(self, name):
+        """Column as stored (codes for dictionary/category columns), memory-mapped."""
+        return self._map(name, self.columns[name]['dtype'], self.rows)
+
+    def dictionary(self, name):
+        info = self.meta['dictionaries'][name]
+        return self._map(name, info['dtype'], info['size'])
+
+    def column(self, name, decode=True):
+        """
+        Column values. Numeric columns are zero-copy memmaps; timestamps are a
+        datetime64[us] view; ID and category columns are decoded to strings if `decode`.
+        """
+        spec = self.columns[name]
+        data = self.raw(name)
+        kind = spec['kind']
+        if kind == 'timestamp':
+            return data.view('datetime64[us]')
+        if not decode or kind == 'numeric':
+            return data
+        if kind == 'dict':
+            return self.dictionary(spec['dictionary'])[data].astype(str)
+        if kind == 'bytes':
+            return data.astype(str)
+        if kind == 'category':
+            return np.asarray(spec['categories'])[data]
+        raise ValueError(f"Unknown column kind {kind!r}")
+
+    def to_frame(self, columns=None, decode=True):
+        import pandas as pd
+        columns = columns or list(self.columns)
+        return pd.DataFrame({name: self.column(name, decode) for name in columns}, columns=columns)
+
+
+def load_frame(path, csv_path=None, columns=None, decode=True):
+    """
+    Reads `columns` from the columnar dataset at `path`, falling back to the CSV at
+    `csv_path` for data generated before the columnar format. Timestamps come back as datetimes.
+    """
+    import pandas as pd
+    if exists(path):
+        return ColumnarTable(path).to_frame(columns, decode)
+    df = pd.read_csv(csv_path, usecols=columns)
+    if 'timestamp' in df:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Saved form: a directory with one .npy per array plus meta.json, so load() can memory-map
+# the node tables and every process on a host shares the same page-cache pages.
+META_FILE = 'meta.json'
+
+
+def artifact_mtime(path):
+    """mtime of a saved CompiledForest, or None if there isn't one."""
+    try:
+        return os.path.getmtime(os.path.join(path, META_FILE))
+    except OSError:
+        return None
+
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous NumPy arrays.
+    All trees share one node table (feature, threshold, left, right, leaf value), and
+    scoring walks every tree for every row at once with array indexing, skipping
+    sklearn's input validation, feature-name checks and joblib dispatch.
+    """
+
+    ARRAYS = ('roots', 'feature', 'threshold', 'left', 'right', 'value')
+
+    def __init__(self, roots, feature, threshold, left, right, value, max_depth, columns=None):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.max_depth = int(max_depth)
+        self.columns = list(columns) if columns is not None else None  # feature names, in order
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, model, positive_class=1):
+        """Flattens a fitted RandomForestClassifier. Leaf value = P(positive_class) per tree."""
+        class_idx = list(model.classes_).index(positive_class)
+        roots, feature, threshold, left, right, value = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in model.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left < 0
+            roots.append(offset)
+            # Leaves keep -1 children; their feature is pinned to 0 so indexing stays valid
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1)
+            totals[totals == 0] = 1.0
+            value.append(counts[:, class_idx] / totals)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        return cls(
+            roots=np.asarray(roots, dtype=np.int64),
+            feature=np.concatenate(feature).astype(np.int64),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            left=np.concatenate(left).astype(np.int64),
+            right=np.concatenate(right).astype(np.int64),
+            value=np.concatenate(value).astype(np.float64),
+            max_depth=max_depth,
+            columns=getattr(model, 'feature_names_in_', None),
+        )
+
+    def predict_proba(self, X):
+        """Returns P(fraud) for each row of X (a single row or a 2-D batch)."""
+        X = np.asarray(X, dtype=np.float32)  # sklearn trees compare on float32 inputs
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        n = X.shape[0]
+        node = np.repeat(self.roots[np.newaxis, :], n, axis=0)
+        rows = np.arange(n)[:, np.newaxis]
+
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            is_leaf = left < 0
+            if is_leaf.all():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(is_leaf, node, np.where(go_left, left, self.right[node]))
+
+        # Accumulate tree by tree, in estimator order, like RandomForestClassifier
+        leaf_values = self.value[node]
+        total = np.zeros(n)
+        for t in range(self.n_trees):
+            total += leaf_values[:, t]
+        return total / self.n_trees
+
+    def save(self, path):
+        """Writes the arrays into a fresh directory and swaps it into place; meta.json is written last."""
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in self.ARRAYS:
+            np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(tmp, META_FILE), 'w') as f:
+            json.dump({'max_depth': self.max_depth, 'columns': self.columns}, f)
+        # Processes still mapping the old files keep their pages until they reload
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Loads a saved forest; with mmap the arrays are read-only views of the page cache."""
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        arrays = {}
+        for name in cls.ARRAYS:
+            array = np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            # Plain ndarray view over the mapping: no copy, no np.memmap overhead when indexing
+            arrays[name] = array.view(np.ndarray)
+        return cls(max_depth=meta['max_depth'], columns=meta.get('columns'), **arrays)
+
+
+def probe_rows(compiled, n_features, n=512, seed=0):
+    """Random rows built from the forest's own split thresholds, so both sides of many splits are hit."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n, n_features))
+    internal = compiled.left >= 0
+    for f in range(n_features):
+        thresholds = compiled.threshold[internal & (compiled.feature == f)]
+        if len(thresholds):
+            X[:, f] = rng.choice(thresholds, n) + rng.choice([-1e-3, 1e-3], n)
+    return X
+
+
+def check_parity(model, compiled, X, atol=1e-12):
+    """
+    Compares compiled scores with sklearn's predict_proba on X.
+    Returns the max absolute difference; raises AssertionError if it exceeds atol.
+    """
+    expected = model.predict_proba(X)[:, list(model.classes_).index(1)]
+    actual = compiled.predict_proba(np.asarray(X))
+    diff = float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+    if diff > atol:
+        raise AssertionError(f"Compiled forest diverges from sklearn: max abs diff {diff:.3g}")
+    return diff
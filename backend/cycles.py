@@ -0,0 +1,112 @@
+import heapq
+from operator import itemgetter
+
+_TS = itemgetter(1)
+
+
+def recent_neighbours(pairs, start_ts, max_fanout):
+    """
+    The newest max_fanout (neighbour, ts) pairs with ts >= start_ts, newest first. Old
+    edges are skipped before the cap, so a hub's stale history can't crowd out its recent
+    transfers.
+    """
+    return heapq.nlargest(max_fanout, (pair for pair in pairs if pair[1] >= start_ts), key=_TS)
+
+
+def _expand(adjacency, frontier, seen, other, start_ts, max_fanout, budget):
+    """
+    Expands one BFS level. Returns (next_frontier, meetings, visits) where meetings are
+    nodes reached on this side that the other side has already seen.
+    """
+    next_frontier = []
+    meetings = []
+    visits = 0
+    for node in frontier:
+        # Cap per-node fan-out so dense hubs cost the same as ordinary accounts
+        for nbr, ts in recent_neighbours(adjacency[node], start_ts, max_fanout):
+            visits += 1
+            if visits > budget:
+                return next_frontier, meetings, visits
+            if nbr in seen:
+                continue
+            seen[nbr] = node
+            next_frontier.append(nbr)
+            if nbr in other:
+                meetings.append(nbr)
+    return next_frontier, meetings, visits
+
+
+def _path(fwd, bwd, meet):
+    """Reconstructs the node path v -> ... -> meet -> ... -> u."""
+    head = []
+    node = meet
+    while node is not None:
+        head.append(node)
+        node = fwd[node]
+    head.reverse()
+    node = bwd[meet]
+    while node is not None:
+        head.append(node)
+        node = bwd[node]
+    return head
+
+
+def find_cycle(graph, u, v, now_ts, window_seconds, min_hops=3, max_hops=5,
+               max_fanout=64, max_visits=2048):
+    """
+    Looks for a cycle closed by the edge u->v, i.e. a path v -> ... -> u of
+    (min_hops - 1) to (max_hops - 1) edges whose edges all fall inside the time window.
+    Uses bidirectional bounded BFS (successors from v, predecessors from u) that follows
+    only each node's newest max_fanout in-window edges, with a total edge-visit budget, so
+    cost is bounded on dense hubs.
+    `graph` is a TransferGraph (or anything with has_node and succ / pred mappings of
+    node -> iterable of (neighbour, epoch ts)). Returns the cycle as a node list starting at u, or None.
+    """
+    if u == v or not graph.has_node(u) or not graph.has_node(v):
+        return None
+    search = cycle_search(u, v, now_ts, window_seconds, min_hops, max_hops, max_fanout, max_visits)
+    try:
+        side, _ = next(search)
+        while True:
+            side, _ = search.send(graph.succ if side == 'succ' else graph.pred)
+    except StopIteration as done:
+        return done.value
+
+
+def cycle_search(u, v, now_ts, window_seconds, min_hops=3, max_hops=5,
+                 max_fanout=64, max_visits=2048):
+    """
+    The find_cycle search as a generator, for callers whose adjacency lives elsewhere
+    (e.g. in shard processes). Yields ('succ' | 'pred', frontier) and expects a mapping
+    node -> iterable of (neighbour, epoch ts) covering the frontier to be sent back; only the
+    newest max_fanout neighbours at or after now_ts - window_seconds are read, so the sender
+    may trim with recent_neighbours(). Returns the cycle (or None).
+    """
+    start_ts = now_ts - window_seconds
+    min_path, max_path = min_hops - 1, max_hops - 1
+    fwd, bwd = {v: None}, {u: None}    # node -> next hop back towards v / on towards u
+    fwd_depth, bwd_depth = 0, 0
+    fwd_frontier, bwd_frontier = [v], [u]
+    budget = max_visits
+
+    while fwd_frontier and bwd_frontier and fwd_depth + bwd_depth < max_path and budget > 0:
+        # Grow the smaller side first
+        if len(fwd_frontier) <= len(bwd_frontier):
+            adjacency = yield 'succ', fwd_frontier
+            fwd_frontier, meetings, visits = _expand(adjacency, fwd_frontier, fwd, bwd,
+                                                     start_ts, max_fanout, budget)
+            fwd_depth += 1
+        else:
+            adjacency = yield 'pred', bwd_frontier
+            bwd_frontier, meetings, visits = _expand(adjacency, bwd_frontier, bwd, fwd,
+                                                     start_ts, max_fanout, budget)
+            bwd_depth += 1
+        budget -= visits
+
+        for meet in meetings:
+            path = _path(fwd, bwd, meet)
+            hops = len(path) - 1
+            # Discard short loops (e.g. v->u) and paths that revisit a node
+            if min_path <= hops <= max_path and len(set(path)) == len(path):
+                return [u] + path[:-1]
+    return None
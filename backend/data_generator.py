@@ -1,18 +1,22 @@
-import pandas as pd
-import numpy as np
-from faker import Faker
-import random
-from datetime import datetime, timedelta
+import argparse
 import os
+import time
+
+import numpy as np
+import pandas as pd
 
-# Initialize Faker
-fake = Faker('en_IN')
+from backend.columnar import ColumnarWriter
 
 # Constants
 TOTAL_ROWS = 50000
-NORMAL_ROWS = 45000
-MULE_ROWS = 4000
-CIRCULAR_ROWS = 1000
+# Scenario mix (fractions of TOTAL_ROWS): 45,000 normal / 4,000 mule / 1,000 circular by default
+SCENARIO_MIX = {'normal': 0.90, 'mule': 0.08, 'circular': 0.02}
+CHUNK_ROWS = 100000
+OUTPUT_PATH = 'backend/data/historical_data.csv'
+# Memory-mappable columnar copy read by training, replay and /hotspots
+COLUMNAR_PATH = 'backend/data/historical'
+OUTPUT_FORMATS = ('columnar', 'csv', 'both')
+HISTORY_DAYS = 30
 
 # City Configuration
 CITIES = {
@@ -24,178 +28,210 @@ CITIES = {
     'Lucknow': {'lat': 26.8467, 'lng': 80.9462, 'radius': 20},
     'Indore': {'lat': 22.7196, 'lng': 75.8577, 'radius': 15}
 }
+CITY_NAMES = np.array(list(CITIES.keys()))
+CITY_LAT = np.array([c['lat'] for c in CITIES.values()])
+CITY_LNG = np.array([c['lng'] for c in CITIES.values()])
+CITY_RADIUS = np.array([c['radius'] for c in CITIES.values()])
+
+COLUMNS = ['txn_id', 'sender_id', 'receiver_id', 'amount', 'timestamp',
+           'lat', 'lng', 'device_id', 'is_fraud', 'city']
+
+_HEX = np.frombuffer(b'0123456789abcdef', dtype='S1')
+# Positions of hex digits in the 36-char UUID string (the rest are dashes)
+_UUID_HEX_POS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+
+def random_uuids(rng, n):
+    """n random version-4 UUID strings, built with array ops instead of one call per ID."""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40  # version 4
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80  # RFC 4122 variant
+    digits = np.empty((n, 32), dtype='S1')
+    digits[:, 0::2] = _HEX[raw >> 4]
+    digits[:, 1::2] = _HEX[raw & 0x0F]
+    chars = np.full((n, 36), b'-', dtype='S1')
+    chars[:, _UUID_HEX_POS] = digits
+    return chars.view('S36').ravel().astype(str)
+
+
+def generate_locations(rng, city_idx):
+    """
+    Random lat/lng around each city using a Gaussian distribution.
+    sigma = radius / 3 ensures ~99% of points are within radius.
+    1 degree lat ~= 111 km, 1 degree lng ~= 111 km * cos(lat).
+    """
+    sigma_km = CITY_RADIUS[city_idx] / 3
+    center_lat = CITY_LAT[city_idx]
+    lat = center_lat + rng.normal(0, sigma_km) / 111
+    lng = CITY_LNG[city_idx] + rng.normal(0, sigma_km) / (111 * np.cos(np.radians(center_lat)))
+    return lat, lng
+
+
+def _random_times(rng, n, start_us, span_us):
+    return start_us + rng.integers(0, span_us, n)
+
+
+def _frame(txn_id, sender, receiver, amount, ts_us, lat, lng, device, is_fraud, city_idx):
+    return pd.DataFrame({
+        'txn_id': txn_id,
+        'sender_id': sender,
+        'receiver_id': receiver,
+        'amount': amount,
+        'timestamp': ts_us.astype('datetime64[us]'),
+        'lat': lat,
+        'lng': lng,
+        'device_id': device,
+        'is_fraud': is_fraud,
+        'city': CITY_NAMES[city_idx],
+    }, columns=COLUMNS)
+
+
+def normal_rows(rng, n, start_us, span_us):
+    """Scenario A: Normal Behavior. Independent random accounts across all cities."""
+    city = rng.integers(0, len(CITY_NAMES), n)
+    lat, lng = generate_locations(rng, city)
+    return _frame(random_uuids(rng, n), random_uuids(rng, n), random_uuids(rng, n),
+                  rng.uniform(50, 5000, n).round(2), _random_times(rng, n, start_us, span_us),
+                  lat, lng, random_uuids(rng, n), np.zeros(n, dtype=np.int8), city)
+
+
+def mule_rows(rng, batches, start_us, span_us):
+    """
+    Scenario B: Mule Fan-Out Attack.
+    One sender -> 10 receivers within 2 minutes, same device and location for the batch.
+    """
+    n = batches * 10
+    city = rng.integers(0, len(CITY_NAMES), batches)
+    lat, lng = generate_locations(rng, city)
+    base_time = _random_times(rng, batches, start_us, span_us)
+    offsets = rng.integers(0, 121, n) * 1_000_000
+    return _frame(random_uuids(rng, n), np.repeat(random_uuids(rng, batches), 10), random_uuids(rng, n),
+                  np.full(n, 49999.00), np.repeat(base_time, 10) + offsets,
+                  np.repeat(lat, 10), np.repeat(lng, 10), np.repeat(random_uuids(rng, batches), 10),
+                  np.ones(n, dtype=np.int8), np.repeat(city, 10))
 
-# Helper function to generate random lat/lng within radius using Gaussian distribution
-def generate_location(city_name):
-    city = CITIES.get(city_name)
-    if not city:
-        # Default to Delhi if not found
-        city = CITIES['Delhi']
-        
-    center_lat = city['lat']
-    center_lng = city['lng']
-    radius_km = city['radius']
-    
-    # 1 degree lat ~= 111 km
-    # 1 degree lng ~= 111 km * cos(lat)
-    
-    # Use Gaussian distribution for clustering around the center
-    # sigma = radius / 3 ensures ~99% of points are within radius
-    sigma_km = radius_km / 3
-    
-    lat_offset_km = np.random.normal(0, sigma_km)
-    lng_offset_km = np.random.normal(0, sigma_km)
-    
-    new_lat = center_lat + (lat_offset_km / 111)
-    new_lng = center_lng + (lng_offset_km / (111 * np.cos(np.radians(center_lat))))
-    
-    return new_lat, new_lng
-
-def generate_data():
+
+def circular_rows(rng, cycles, extra, start_us, span_us):
+    """
+    Scenario C: Circular Trading. A -> B -> C -> A with one amount per ring,
+    B -> C 10-60 min and C -> A 70-120 min after A -> B.
+    `extra` single high-value rows fill any remainder that doesn't make a full ring.
+    """
+    n = cycles * 3
+    city = rng.integers(0, len(CITY_NAMES), cycles)
+    base_lat, base_lng = generate_locations(rng, city)
+    users = random_uuids(rng, n).reshape(cycles, 3)
+    senders = users.ravel()
+    receivers = users[:, [1, 2, 0]].ravel()
+    cycle_time = _random_times(rng, cycles, start_us, span_us)
+    minute = 60 * 1_000_000
+    times = np.stack([cycle_time,
+                      cycle_time + rng.integers(10, 61, cycles) * minute,
+                      cycle_time + rng.integers(70, 121, cycles) * minute], axis=1).ravel()
+    rings = _frame(random_uuids(rng, n), senders, receivers,
+                   np.repeat(rng.uniform(100000, 500000, cycles).round(2), 3), times,
+                   np.repeat(base_lat, 3) + rng.normal(0, 0.01, n),
+                   np.repeat(base_lng, 3) + rng.normal(0, 0.01, n),
+                   random_uuids(rng, n), np.ones(n, dtype=np.int8), np.repeat(city, 3))
+    if not extra:
+        return rings
+
+    extra_city = rng.integers(0, len(CITY_NAMES), extra)
+    lat, lng = generate_locations(rng, extra_city)
+    fill = _frame(random_uuids(rng, extra), random_uuids(rng, extra), random_uuids(rng, extra),
+                  np.full(extra, 150000.00), _random_times(rng, extra, start_us, span_us),
+                  lat, lng, random_uuids(rng, extra), np.ones(extra, dtype=np.int8), extra_city)
+    return pd.concat([rings, fill], ignore_index=True)
+
+
+def scenario_counts(total_rows, mix):
+    """Rows per scenario: mule rows come in batches of 10, circular in rings of 3 plus remainder."""
+    mule = int(total_rows * mix['mule']) // 10 * 10
+    circular = int(total_rows * mix['circular'])
+    normal = total_rows - mule - circular
+    return normal, mule // 10, circular // 3, circular % 3
+
+
+def _split(total, parts):
+    """Splits total into `parts` near-equal integer shares."""
+    base, rem = divmod(total, parts)
+    return [base + (1 if i < rem else 0) for i in range(parts)]
+
+
+def generate_chunks(total_rows=TOTAL_ROWS, mix=None, chunk_rows=CHUNK_ROWS, seed=None, end_time=None):
+    """
+    Yields DataFrames of about chunk_rows rows each. Every chunk carries its share of each
+    scenario, so memory stays flat no matter how many rows are generated overall.
+    """
+    mix = dict(SCENARIO_MIX, **(mix or {}))
+    rng = np.random.default_rng(seed)
+    normal, mule_batches, cycles, extra = scenario_counts(total_rows, mix)
+    parts = max(1, -(-total_rows // chunk_rows))
+
+    end_us = int((end_time or time.time()) * 1_000_000)
+    span_us = HISTORY_DAYS * 24 * 3600 * 1_000_000
+    start_us = end_us - span_us
+
+    for i, (n_normal, n_mule, n_cycles) in enumerate(zip(_split(normal, parts),
+                                                         _split(mule_batches, parts),
+                                                         _split(cycles, parts))):
+        frames = [normal_rows(rng, n_normal, start_us, span_us),
+                  mule_rows(rng, n_mule, start_us, span_us),
+                  circular_rows(rng, n_cycles, extra if i == parts - 1 else 0, start_us, span_us)]
+        yield pd.concat(frames, ignore_index=True)
+
+
+def generate_data(total_rows=TOTAL_ROWS, mix=None, chunk_rows=CHUNK_ROWS, seed=None, output_path=OUTPUT_PATH,
+                  end_time=None, columnar_path=COLUMNAR_PATH, output_format='columnar'):
     print("Starting data generation...")
-    data = []
-    
-    # --- Scenario A: Normal Behavior (45,000 rows) ---
-    print(f"Generating {NORMAL_ROWS} normal transactions...")
-    city_names = list(CITIES.keys())
-    
-    for _ in range(NORMAL_ROWS):
-        # Pick a random city for this transaction
-        city = random.choice(city_names)
-        lat, lng = generate_location(city)
-        
-        data.append({
-            'txn_id': fake.uuid4(),
-            'sender_id': fake.uuid4(),
-            'receiver_id': fake.uuid4(),
-            'amount': round(random.uniform(50, 5000), 2),
-            'timestamp': fake.date_time_between(start_date='-30d', end_date='now'),
-            'lat': lat,
-            'lng': lng,
-            'device_id': fake.uuid4(),
-            'is_fraud': 0,
-            'city': city
-        })
-
-    # --- Scenario B: Mule Fan-Out Attack (4,000 rows) ---
-    # Logic: One sender -> 10 receivers, same time window, same device/location for receivers
-    print(f"Generating {MULE_ROWS} Mule Fan-Out transactions...")
-    mule_batches = MULE_ROWS // 10
-    
-    for _ in range(mule_batches):
-        sender_id = fake.uuid4()
-        base_time = fake.date_time_between(start_date='-30d', end_date='now')
-        
-        # The "Tell": Same device and location for all receivers (or very close)
-        fraud_device_id = fake.uuid4()
-        
-        # Pick a random city for this fraud batch
-        fraud_city = random.choice(city_names)
-        fraud_lat, fraud_lng = generate_location(fraud_city)
-        
-        for _ in range(10):
-            data.append({
-                'txn_id': fake.uuid4(),
-                'sender_id': sender_id,
-                'receiver_id': fake.uuid4(),
-                'amount': 49999.00, # Exact amount
-                'timestamp': base_time + timedelta(seconds=random.randint(0, 120)), # Within 2 mins
-                'lat': fraud_lat,
-                'lng': fraud_lng,
-                'device_id': fraud_device_id,
-                'is_fraud': 1,
-                'city': fraud_city
-            })
-
-    # --- Scenario C: Circular Trading (1,000 rows) ---
-    # Logic: A -> B -> C -> A
-    print(f"Generating {CIRCULAR_ROWS} Circular Trading transactions...")
-    
-    cycles = CIRCULAR_ROWS // 3
-    remainder = CIRCULAR_ROWS % 3
-    
-    for _ in range(cycles):
-        user_a = fake.uuid4()
-        user_b = fake.uuid4()
-        user_c = fake.uuid4()
-        
-        cycle_amount = round(random.uniform(100000, 500000), 2)
-        cycle_time = fake.date_time_between(start_date='-30d', end_date='now')
-        
-        # Pick a random city for this ring
-        ring_city = random.choice(city_names)
-        base_lat, base_lng = generate_location(ring_city)
-        
-        # A -> B
-        data.append({
-            'txn_id': fake.uuid4(),
-            'sender_id': user_a,
-            'receiver_id': user_b,
-            'amount': cycle_amount,
-            'timestamp': cycle_time,
-            'lat': base_lat + np.random.normal(0, 0.01),
-            'lng': base_lng + np.random.normal(0, 0.01),
-            'device_id': fake.uuid4(),
-            'is_fraud': 1,
-            'city': ring_city
-        })
-        
-        # B -> C
-        data.append({
-            'txn_id': fake.uuid4(),
-            'sender_id': user_b,
-            'receiver_id': user_c,
-            'amount': cycle_amount,
-            'timestamp': cycle_time + timedelta(minutes=random.randint(10, 60)),
-            'lat': base_lat + np.random.normal(0, 0.01),
-            'lng': base_lng + np.random.normal(0, 0.01),
-            'device_id': fake.uuid4(),
-            'is_fraud': 1,
-            'city': ring_city
-        })
-        
-        # C -> A
-        data.append({
-            'txn_id': fake.uuid4(),
-            'sender_id': user_c,
-            'receiver_id': user_a,
-            'amount': cycle_amount,
-            'timestamp': cycle_time + timedelta(minutes=random.randint(70, 120)),
-            'lat': base_lat + np.random.normal(0, 0.01),
-            'lng': base_lng + np.random.normal(0, 0.01),
-            'device_id': fake.uuid4(),
-            'is_fraud': 1,
-            'city': ring_city
-        })
-
-    # Fill remainder if any (should be 1 row if 1000 total)
-    for _ in range(remainder):
-         rem_city = random.choice(city_names)
-         rem_lat, rem_lng = generate_location(rem_city)
-         data.append({
-            'txn_id': fake.uuid4(),
-            'sender_id': fake.uuid4(),
-            'receiver_id': fake.uuid4(),
-            'amount': 150000.00,
-            'timestamp': fake.date_time_between(start_date='-30d', end_date='now'),
-            'lat': rem_lat,
-            'lng': rem_lng,
-            'device_id': fake.uuid4(),
-            'is_fraud': 1,
-            'city': rem_city
-        })
-
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
+    normal, mule_batches, cycles, extra = scenario_counts(total_rows, dict(SCENARIO_MIX, **(mix or {})))
+    print(f"Generating {normal} normal, {mule_batches * 10} Mule Fan-Out and "
+          f"{cycles * 3 + extra} Circular Trading transactions...")
+
+    write_csv = output_format in ('csv', 'both')
+    writer = ColumnarWriter(columnar_path, categories={'city': CITY_NAMES}) \
+        if output_format in ('columnar', 'both') else None
+
     # Ensure directory exists
-    os.makedirs('backend/data', exist_ok=True)
-    
-    # Save to CSV
-    output_path = 'backend/data/historical_data.csv'
-    df.to_csv(output_path, index=False)
-    
-    print(f"Data Generation Complete: {len(df)} rows.")
+    if write_csv:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    # Stream chunks to disk
+    rows = 0
+    for i, chunk in enumerate(generate_chunks(total_rows, mix, chunk_rows, seed, end_time)):
+        if write_csv:
+            chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        if writer is not None:
+            writer.append(chunk)
+        rows += len(chunk)
+        print(f"  wrote {rows}/{total_rows} rows")
+
+    if writer is not None:
+        print("Dictionary-encoding IDs...")
+        writer.close()
+        print(f"Columnar data written to {columnar_path}")
+    if write_csv:
+        print(f"CSV data written to {output_path}")
+    print(f"Data Generation Complete: {rows} rows.")
+
 
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(description="Generate synthetic UPI transaction history.")
+    parser.add_argument('--rows', type=int, default=TOTAL_ROWS, help='total rows to generate')
+    parser.add_argument('--mule', type=float, default=SCENARIO_MIX['mule'], help='fraction of mule fan-out rows')
+    parser.add_argument('--circular', type=float, default=SCENARIO_MIX['circular'],
+                        help='fraction of circular trading rows')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rows generated and written per chunk')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible output')
+    parser.add_argument('--end-date', default=None,
+                        help='ISO date the history ends at (default: now); fix it with --seed for identical output')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='columnar',
+                        help='columnar (memory-mappable, read by training/replay/hotspots), csv, or both')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='CSV output path')
+    parser.add_argument('--columnar-output', default=COLUMNAR_PATH, help='columnar output directory')
+    args = parser.parse_args()
+
+    end_time = pd.Timestamp(args.end_date).timestamp() if args.end_date else None
+    generate_data(args.rows, {'mule': args.mule, 'circular': args.circular},
+                  args.chunk_rows, args.seed, args.output, end_time,
+                  args.columnar_output, args.format)
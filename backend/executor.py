@@ -0,0 +1,113 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+SCORING_MODES = ('inline', 'thread', 'process')
+
+# Models loaded by this process-pool worker, keyed by LoadedModel.spec. Room for the
+# active and a shadow model, plus the previous active one while a swap drains.
+_worker_models = OrderedDict()
+WORKER_MODEL_CACHE = 3
+
+
+def _worker_model(spec):
+    model = _worker_models.get(spec)
+    if model is None:
+        from backend.model_registry import LoadedModel
+        # Compiled models are memory-mapped: workers share the parent's page-cache pages
+        model = _worker_models[spec] = LoadedModel.from_spec(spec)
+        while len(_worker_models) > WORKER_MODEL_CACHE:
+            _worker_models.popitem(last=False)
+    else:
+        _worker_models.move_to_end(spec)
+    return model
+
+
+def _init_worker(spec):
+    """Process-pool initializer: preloads the model so each task only ships feature rows."""
+    if spec is not None:
+        _worker_model(spec)
+
+
+def _timed(score, rows):
+    start = time.perf_counter()
+    scores = score(rows)
+    return scores, time.perf_counter() - start
+
+
+def _score_in_worker(spec, rows):
+    return _timed(_worker_model(spec).score, rows)
+
+
+class ScoringExecutor:
+    """
+    Runs the CPU-bound inference stage inline, on a thread pool, or on a process pool.
+    Detection state is never handed to the pool: it is updated only on the event loop
+    (single writer), and workers receive plain feature rows. Each call names the model to
+    score with, so models can be swapped without restarting the pool.
+    """
+
+    def __init__(self, mode='inline', workers=None):
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode {mode!r}, expected one of {SCORING_MODES}")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+
+    def start(self, spec=None):
+        """spec: LoadedModel.spec for process workers to preload (others load on first use)."""
+        self.shutdown()
+        if self.mode == 'thread':
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='scoring')
+        elif self.mode == 'process':
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(spec,),
+            )
+
+    async def score(self, rows, model):
+        """Scores rows with a LoadedModel. Returns (scores, seconds spent scoring, excluding queueing)."""
+        if self._pool is None:
+            return _timed(model.score, rows)
+        loop = asyncio.get_running_loop()
+        if self.mode == 'process':
+            return await loop.run_in_executor(self._pool, _score_in_worker, model.spec, rows)
+        return await loop.run_in_executor(self._pool, _timed, model.score, rows)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag as the overshoot of a periodic asyncio.sleep."""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.samples = 0
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            self.last = lag
+            self.max = max(self.max, lag)
+            self.total += lag
+            self.samples += 1
+
+    def stats(self):
+        return {
+            "last_ms": self.last * 1000,
+            "max_ms": self.max * 1000,
+            "mean_ms": (self.total / self.samples * 1000) if self.samples else 0.0,
+        }
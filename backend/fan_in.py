@@ -0,0 +1,48 @@
+import time
+
+from backend.velocity import VelocityStore
+
+
+class FanInIndex:
+    """
+    Time-ordered incoming transfers per receiver for mule fan-in detection.
+    Every transfer is kept (repeat sender->receiver transfers included) as a parsed
+    epoch time, so "count in the last N seconds" is a bisect instead of a walk over
+    the receiver's in-edges.
+    Each receiver's entries expire relative to the transfer being added, and idle receivers
+    against a watermark held to the clock plus max_skew, as in VelocityStore.
+    """
+
+    def __init__(self, window_seconds, horizon_seconds=None, max_skew=None, clock=time.time):
+        self.window = window_seconds
+        # Keep at least the detection window; a longer horizon allows ad-hoc queries.
+        horizon = max(window_seconds, horizon_seconds or 0)
+        self._store = VelocityStore({'fan_in': window_seconds, 'horizon': horizon},
+                                    max_skew=max_skew, clock=clock)
+
+    def add(self, receiver_id, ts):
+        """Records a transfer into receiver at epoch time ts. Returns the count in the window."""
+        return self._store.observe(receiver_id, ts)['fan_in']
+
+    def count(self, receiver_id, ts, window_seconds=None):
+        """Number of transfers into receiver in (ts - window, ts]."""
+        return self._store.count(receiver_id, ts, window_seconds or self.window)
+
+    def keys(self):
+        return self._store.keys()
+
+    def times(self, receiver_id):
+        return self._store.times(receiver_id)
+
+    def restore(self, receiver_id, times):
+        self._store.restore(receiver_id, times)
+
+    def clear(self):
+        self._store.clear()
+
+    @property
+    def num_receivers(self):
+        return self._store.num_senders
+
+    def __len__(self):
+        return len(self._store)
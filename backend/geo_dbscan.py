@@ -0,0 +1,156 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import BallTree
+
+# Finest grid tile size in degrees (~2.2 km). Each tile is processed with a halo of eps around
+# it, so neighbour-query memory follows the densest tile rather than the total number of
+# points (a few per-point index and label arrays still span every point).
+TILE_DEG = 0.02
+# Sparse data gets coarser tiles (fewer, larger neighbour queries) up to about this many points
+MAX_TILE_POINTS = 20_000
+# Slack on the halo so rounding never drops a neighbour at exactly eps
+HALO_SLACK = 1.01
+
+
+def _auto_tile_deg(lats, lngs):
+    """Coarsens TILE_DEG by the largest factor that keeps the densest tile under MAX_TILE_POINTS."""
+    _, tiles = _tile_index(lats, lngs, TILE_DEG)
+    densest = max(stop - start for start, stop in tiles.values())
+    return TILE_DEG * max(1, int(np.sqrt(MAX_TILE_POINTS / densest)))
+
+
+def _tile_index(lats, lngs, tile_deg):
+    """Groups points by grid tile. Returns (order, {(ix, iy): (start, stop)}) over `order`."""
+    ix = np.floor(lats / tile_deg).astype(np.int64)
+    iy = np.floor(lngs / tile_deg).astype(np.int64)
+    span = int(np.ceil(360 / tile_deg)) + 1
+    keys = ix * (2 * span + 1) + iy
+    order = np.argsort(keys, kind='stable')
+    bounds = np.flatnonzero(np.diff(keys[order])) + 1
+    starts = np.concatenate([[0], bounds]).tolist()
+    stops = np.concatenate([bounds, [len(order)]]).tolist()
+    first = order[starts]
+    tiles = {(x, y): (start, stop) for x, y, start, stop in zip(ix[first].tolist(), iy[first].tolist(), starts, stops)}
+    return order, tiles
+
+
+class _Grid:
+    def __init__(self, lats, lngs, eps, tile_deg):
+        self.lats, self.lngs = lats, lngs
+        self.tile_deg = tile_deg
+        self.margin_lat = np.degrees(eps) * HALO_SLACK
+        self.order, self.tiles = _tile_index(lats, lngs, tile_deg)
+
+    def rows(self, tile):
+        start, stop = self.tiles[tile]
+        return self.order[start:stop]
+
+    def halo(self, tile):
+        """Points in other tiles within the eps box around `tile`."""
+        x, y = tile
+        lat_lo, lat_hi = x * self.tile_deg - self.margin_lat, (x + 1) * self.tile_deg + self.margin_lat
+        # A degree of longitude shrinks with cos(lat); size the box for the tile's widest-apart edge
+        max_lat = min(89.0, max(abs(lat_lo), abs(lat_hi)))
+        margin_lng = self.margin_lat / np.cos(np.radians(max_lat))
+        lng_lo, lng_hi = y * self.tile_deg - margin_lng, (y + 1) * self.tile_deg + margin_lng
+        ring_x = int(np.ceil(self.margin_lat / self.tile_deg))
+        ring_y = int(np.ceil(margin_lng / self.tile_deg))
+
+        parts = []
+        for dx in range(-ring_x, ring_x + 1):
+            for dy in range(-ring_y, ring_y + 1):
+                if (dx or dy) and (x + dx, y + dy) in self.tiles:
+                    parts.append(self.rows((x + dx, y + dy)))
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(parts)
+        lat, lng = self.lats[rows], self.lngs[rows]
+        return rows[(lat >= lat_lo) & (lat <= lat_hi) & (lng >= lng_lo) & (lng <= lng_hi)]
+
+    def points(self, rows):
+        return np.radians(np.column_stack([self.lats[rows], self.lngs[rows]]))
+
+
+def grid_dbscan(lats, lngs, eps, min_samples, ts=None, tile_deg=None):
+    """
+    Haversine DBSCAN (eps in radians) computed tile by tile over a lat/lng grid, giving the
+    same clusters as a single global DBSCAN without its all-pairs neighbour lists.
+      1. Core points: neighbour counts within eps, querying each tile against tile + halo.
+      2. Core points within eps are connected per tile; components that share a halo core
+         point are merged across tiles.
+      3. Border points join the cluster of their nearest core point within eps (the rule
+         serving uses); everything else is noise.
+    Clusters are numbered from 1 in order of their first core point by (ts, row), which is
+    DBSCAN's own numbering when rows are in time order; noise is 0.
+    tile_deg defaults to the coarsest multiple of TILE_DEG that keeps tiles under MAX_TILE_POINTS.
+    Returns (labels, core_rows).
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    n = len(lats)
+    labels = np.zeros(n, dtype=np.int64)
+    if n == 0:
+        return labels, np.zeros(0, dtype=np.int64)
+    grid = _Grid(lats, lngs, eps, tile_deg or _auto_tile_deg(lats, lngs))
+
+    # 1. Core points
+    core = np.zeros(n, dtype=bool)
+    for tile in grid.tiles:
+        rows = grid.rows(tile)
+        tree = BallTree(grid.points(np.concatenate([rows, grid.halo(tile)])), metric='haversine')
+        core[rows] = tree.query_radius(grid.points(rows), eps, count_only=True) >= min_samples
+
+    # 2. Per-tile components of core points, linked through halo core points
+    owner = np.full(n, -1, dtype=np.int64)    # component of each core point within its own tile
+    nearest = np.full(n, -1, dtype=np.int64)  # nearest core point within eps of each border point
+    link_rows, link_comps = [], []
+    n_comps = 0
+    for tile in grid.tiles:
+        rows = grid.rows(tile)
+        halo = grid.halo(tile)
+        tile_cores, halo_cores = rows[core[rows]], halo[core[halo]]
+        candidates = np.concatenate([tile_cores, halo_cores])
+        if len(candidates) == 0:
+            continue
+        tree = BallTree(grid.points(candidates), metric='haversine')
+
+        if len(tile_cores):
+            neighbours = tree.query_radius(grid.points(tile_cores), eps)
+            src = np.repeat(np.arange(len(tile_cores)), [len(nb) for nb in neighbours])
+            dst = np.concatenate(neighbours)
+            size = len(candidates)
+            count, comp = connected_components(coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)),
+                                                          shape=(size, size)), directed=False)
+            owner[tile_cores] = n_comps + comp[:len(tile_cores)]
+            link_rows.append(halo_cores)
+            link_comps.append(n_comps + comp[len(tile_cores):])
+            n_comps += count
+
+        border = rows[~core[rows]]
+        if len(border):
+            dist, idx = tree.query(grid.points(border), k=1)
+            hit = dist[:, 0] <= eps
+            nearest[border[hit]] = candidates[idx[hit, 0]]
+
+    core_rows = np.flatnonzero(core)
+    if len(core_rows) == 0:
+        return labels, core_rows
+
+    # Merge components across tiles
+    src = owner[np.concatenate(link_rows)]
+    dst = np.concatenate(link_comps)
+    _, cluster = connected_components(coo_matrix((np.ones(len(src), dtype=np.int8), (src, dst)),
+                                                 shape=(n_comps, n_comps)), directed=False)
+    core_cluster = cluster[owner[core_rows]]
+
+    # DBSCAN numbering: by each cluster's first core point in (ts, row) order
+    first = np.arange(len(core_rows)) if ts is None else np.lexsort((core_rows, np.asarray(ts)[core_rows]))
+    clusters, first_seen = np.unique(core_cluster[first], return_index=True)
+    number = np.zeros(cluster.max() + 1, dtype=np.int64)
+    number[clusters[np.argsort(first_seen)]] = np.arange(1, len(clusters) + 1)
+
+    labels[core_rows] = number[core_cluster]
+    border = np.flatnonzero(nearest >= 0)
+    labels[border] = labels[nearest[border]]
+    return labels, core_rows
@@ -0,0 +1,36 @@
+import numpy as np
+
+KMS_PER_RADIAN = 6371.0088
+
+
+class GeoClusterIndex:
+    """
+    Serving-time DBSCAN cluster lookup.
+    Training persists the DBSCAN core points (radians) and their cluster IDs; a point is
+    assigned the cluster of its nearest core point within eps, which is how DBSCAN labels
+    border points. Anything further away is noise (0).
+    """
+
+    def __init__(self, core_points, labels, eps):
+        # Imported here: sklearn is the slowest import on the serving path and only needed once clusters exist
+        from sklearn.neighbors import BallTree
+
+        self.labels = np.asarray(labels)
+        self.eps = float(eps)
+        self.tree = BallTree(np.asarray(core_points), metric='haversine') if len(self.labels) else None
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """Builds the index from the dict saved by train_model.save_model."""
+        return cls(artifact['core_points'], artifact['labels'], artifact['eps'])
+
+    def lookup_many(self, lats, lngs):
+        lats = np.asarray(lats, dtype=np.float64)
+        if self.tree is None or len(lats) == 0:
+            return np.zeros(len(lats), dtype=np.int64)
+        points = np.radians(np.column_stack([lats, np.asarray(lngs, dtype=np.float64)]))
+        dist, idx = self.tree.query(points, k=1)
+        return np.where(dist[:, 0] <= self.eps, self.labels[idx[:, 0]], 0)
+
+    def lookup(self, lat, lng):
+        return int(self.lookup_many([lat], [lng])[0])
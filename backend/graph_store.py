@@ -0,0 +1,419 @@
+import heapq
+import uuid
+from array import array
+
+NIL = -1
+NODE_TYPES = ('', 'sender', 'receiver')
+TXN_ID_BYTES = 16  # Canonical UUID strings are packed into their 16 raw bytes
+
+
+class AccountInterner:
+    """Maps account IDs to dense int codes and back. Codes of released accounts are reused."""
+
+    def __init__(self):
+        self.codes = {}
+        self.ids = []      # code -> account ID (None while the code is free)
+        self._free = []
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, account_id):
+        return account_id in self.codes
+
+    def code(self, account_id):
+        """The account's code, or None if it isn't interned."""
+        return self.codes.get(account_id)
+
+    def intern(self, account_id):
+        code = self.codes.get(account_id)
+        if code is None:
+            if self._free:
+                code = self._free.pop()
+                self.ids[code] = account_id
+            else:
+                code = len(self.ids)
+                self.ids.append(account_id)
+            self.codes[account_id] = code
+        return code
+
+    def release(self, code):
+        del self.codes[self.ids[code]]
+        self.ids[code] = None
+        self._free.append(code)
+
+    def clear(self):
+        self.codes.clear()
+        self.ids.clear()
+        self._free.clear()
+
+
+class _Adjacency:
+    """graph.succ / graph.pred: account ID -> iterator of (neighbour ID, epoch ts), in insertion order."""
+
+    def __init__(self, graph, outgoing):
+        self._graph = graph
+        self._outgoing = outgoing
+
+    def __contains__(self, account_id):
+        return account_id in self._graph.accounts
+
+    def __getitem__(self, account_id):
+        return self._graph.neighbours(account_id, self._outgoing)
+
+
+class TransferGraph:
+    """
+    Directed transfer graph over interned account IDs, held in typed arrays instead of
+    networkx dicts. Edge columns are indexed by slot: endpoint codes, epoch time, amount and
+    the transaction ID (16 packed bytes; other formats go to a side table). Each account's
+    out- and in-edges are singly linked lists threaded through the edge columns, so adjacency
+    iterates in insertion order like a networkx DiGraph, and a later transfer between the
+    same pair overwrites the edge in place (latest wins). Freed slots and account codes are
+    reused, so memory tracks the live graph.
+    """
+
+    def __init__(self):
+        self.accounts = AccountInterner()
+        # Node columns, by account code
+        self._type = array('b')
+        self._out_head = array('i')
+        self._out_tail = array('i')
+        self._in_head = array('i')
+        self._in_tail = array('i')
+        # Edge columns, by slot (_src is NIL for free slots)
+        self._src = array('i')
+        self._dst = array('i')
+        self._ts = array('d')
+        self._amount = array('d')
+        self._txn = bytearray()
+        self._out_next = array('i')  # Also chains free slots
+        self._in_next = array('i')
+        self._txn_other = {}         # slot -> txn_id that isn't a canonical UUID
+        self._free_slot = NIL
+        self._edges = 0
+        self.succ = _Adjacency(self, outgoing=True)
+        self.pred = _Adjacency(self, outgoing=False)
+
+    # --- Size ---
+    def __contains__(self, account_id):
+        return account_id in self.accounts
+
+    def has_node(self, account_id):
+        return account_id in self.accounts
+
+    def number_of_nodes(self):
+        return len(self.accounts)
+
+    def number_of_edges(self):
+        return self._edges
+
+    @property
+    def edge_capacity(self):
+        """Number of edge slots (live or free); bounds edges(start, stop)."""
+        return len(self._src)
+
+    @property
+    def node_capacity(self):
+        return len(self._type)
+
+    def nbytes(self):
+        """Bytes held by the node and edge columns (excludes the interning dict and ID strings)."""
+        columns = (self._type, self._out_head, self._out_tail, self._in_head, self._in_tail,
+                   self._src, self._dst, self._ts, self._amount, self._out_next, self._in_next)
+        return sum(c.itemsize * len(c) for c in columns) + len(self._txn)
+
+    # --- Writes ---
+    def add_node(self, account_id, type=None):
+        """Interns the account (optionally setting its 'sender'/'receiver' type). Returns its code."""
+        code = self.accounts.intern(account_id)
+        if code == len(self._type):
+            self._type.append(0)
+            for column in (self._out_head, self._out_tail, self._in_head, self._in_tail):
+                column.append(NIL)
+        if type:
+            self._type[code] = NODE_TYPES.index(type)
+        return code
+
+    def add_edge(self, u, v, ts, amount, txn_id):
+        """Writes the transfer u -> v, overwriting an existing u -> v edge. Returns its slot."""
+        cu = self.add_node(u)
+        cv = self.add_node(v)
+        slot = self._find(cu, cv)
+        if slot != NIL:
+            self._ts[slot] = ts
+            self._amount[slot] = amount
+            self._set_txn(slot, txn_id)
+            return slot
+
+        slot = self._free_slot
+        if slot != NIL:
+            self._free_slot = self._out_next[slot]
+            self._src[slot], self._dst[slot] = cu, cv
+            self._ts[slot], self._amount[slot] = ts, amount
+            self._out_next[slot] = self._in_next[slot] = NIL
+        else:
+            slot = len(self._src)
+            self._src.append(cu)
+            self._dst.append(cv)
+            self._ts.append(ts)
+            self._amount.append(amount)
+            self._txn.extend(bytes(TXN_ID_BYTES))
+            self._out_next.append(NIL)
+            self._in_next.append(NIL)
+        self._set_txn(slot, txn_id)
+
+        tail = self._out_tail[cu]
+        if tail == NIL:
+            self._out_head[cu] = slot
+        else:
+            self._out_next[tail] = slot
+        self._out_tail[cu] = slot
+        tail = self._in_tail[cv]
+        if tail == NIL:
+            self._in_head[cv] = slot
+        else:
+            self._in_next[tail] = slot
+        self._in_tail[cv] = slot
+        self._edges += 1
+        return slot
+
+    def _set_txn(self, slot, txn_id):
+        self._txn_other.pop(slot, None)
+        try:
+            packed = uuid.UUID(txn_id)
+        except ValueError:
+            packed = None
+        start = slot * TXN_ID_BYTES
+        if packed is not None and str(packed) == txn_id:
+            self._txn[start:start + TXN_ID_BYTES] = packed.bytes
+        else:
+            self._txn[start:start + TXN_ID_BYTES] = bytes(TXN_ID_BYTES)
+            self._txn_other[slot] = txn_id
+
+    def remove_edge(self, u, v):
+        cu, cv = self.accounts.code(u), self.accounts.code(v)
+        slot = NIL if cu is None or cv is None else self._find(cu, cv)
+        if slot == NIL:
+            raise KeyError((u, v))
+        return self.remove_edge_at(slot)
+
+    def remove_edge_at(self, slot):
+        """
+        Removes the edge in `slot`, then any endpoint left without edges.
+        Returns the number of accounts removed.
+        """
+        cu, cv = self._src[slot], self._dst[slot]
+        self._unlink(slot, cu, self._out_head, self._out_tail, self._out_next)
+        self._unlink(slot, cv, self._in_head, self._in_tail, self._in_next)
+        self._src[slot] = self._dst[slot] = NIL
+        self._txn_other.pop(slot, None)
+        self._out_next[slot] = self._free_slot
+        self._free_slot = slot
+        self._edges -= 1
+        dropped = self._drop_if_orphan(cu)
+        if cv != cu:
+            dropped += self._drop_if_orphan(cv)
+        return dropped
+
+    @staticmethod
+    def _unlink(slot, code, head, tail, next_):
+        # Retention removes the oldest edges, which sit near the front of their lists
+        prev, s = NIL, head[code]
+        while s != slot:
+            prev, s = s, next_[s]
+        if prev == NIL:
+            head[code] = next_[slot]
+        else:
+            next_[prev] = next_[slot]
+        if tail[code] == slot:
+            tail[code] = prev
+
+    def _drop_if_orphan(self, code):
+        if self._out_head[code] != NIL or self._in_head[code] != NIL:
+            return 0
+        self._type[code] = 0
+        self.accounts.release(code)
+        return 1
+
+    def clear(self):
+        self.accounts.clear()
+        for column in (self._type, self._out_head, self._out_tail, self._in_head, self._in_tail,
+                       self._src, self._dst, self._ts, self._amount, self._out_next, self._in_next):
+            del column[:]
+        self._txn.clear()
+        self._txn_other.clear()
+        self._free_slot = NIL
+        self._edges = 0
+
+    # --- Reads ---
+    def _find(self, cu, cv):
+        """Slot of the edge cu -> cv or NIL. Walks u's out-list and v's in-list in step, so
+        the cost is bounded by the smaller degree (a hub receiver is cheap to write into)."""
+        a, b = self._out_head[cu], self._in_head[cv]
+        dst, src, out_next, in_next = self._dst, self._src, self._out_next, self._in_next
+        while a != NIL and b != NIL:
+            if dst[a] == cv:
+                return a
+            if src[b] == cu:
+                return b
+            a, b = out_next[a], in_next[b]
+        return NIL
+
+    def edge_live(self, slot):
+        return self._src[slot] != NIL
+
+    def edge_ts(self, slot):
+        return self._ts[slot]
+
+    def txn_id(self, slot):
+        other = self._txn_other.get(slot)
+        if other is not None:
+            return other
+        start = slot * TXN_ID_BYTES
+        return str(uuid.UUID(bytes=bytes(self._txn[start:start + TXN_ID_BYTES])))
+
+    def has_edge(self, u, v):
+        cu, cv = self.accounts.code(u), self.accounts.code(v)
+        return cu is not None and cv is not None and self._find(cu, cv) != NIL
+
+    def get_edge_data(self, u, v):
+        """{'ts', 'amount', 'txn_id'} of the edge u -> v, or None."""
+        cu, cv = self.accounts.code(u), self.accounts.code(v)
+        slot = NIL if cu is None or cv is None else self._find(cu, cv)
+        if slot == NIL:
+            return None
+        return {'ts': self._ts[slot], 'amount': self._amount[slot], 'txn_id': self.txn_id(slot)}
+
+    def node_type(self, account_id):
+        return NODE_TYPES[self._type[self.accounts.codes[account_id]]]
+
+    def _slots(self, code, outgoing):
+        s = (self._out_head if outgoing else self._in_head)[code]
+        next_ = self._out_next if outgoing else self._in_next
+        while s != NIL:
+            yield s
+            s = next_[s]
+
+    def neighbours(self, account_id, outgoing=True):
+        """Yields (neighbour ID, epoch ts) over the account's out- (or in-) edges."""
+        code = self.accounts.code(account_id)
+        if code is None:
+            return
+        ids, ts, other = self.accounts.ids, self._ts, self._dst if outgoing else self._src
+        for s in self._slots(code, outgoing):
+            yield ids[other[s]], ts[s]
+
+    def out_edges(self, account_id):
+        """Yields (u, v, ts, amount, txn_id) for the account's outgoing edges."""
+        return self._edges_of(account_id, True)
+
+    def in_edges(self, account_id):
+        return self._edges_of(account_id, False)
+
+    def _edges_of(self, account_id, outgoing):
+        code = self.accounts.code(account_id)
+        if code is None:
+            return
+        for s in list(self._slots(code, outgoing)):
+            yield self._edge(s)
+
+    def _edge(self, slot):
+        ids = self.accounts.ids
+        return ids[self._src[slot]], ids[self._dst[slot]], self._ts[slot], self._amount[slot], self.txn_id(slot)
+
+    def nodes(self, start=0, stop=None):
+        """Yields (account ID, type) for accounts with codes in [start, stop)."""
+        ids, types = self.accounts.ids, self._type
+        for code in range(start, min(len(ids), len(ids) if stop is None else stop)):
+            if ids[code] is not None:
+                yield ids[code], NODE_TYPES[types[code]]
+
+    def edges(self, start=0, stop=None):
+        """Yields (u, v, ts, amount, txn_id) for live edges in slots [start, stop)."""
+        src = self._src
+        for slot in range(start, min(len(src), len(src) if stop is None else stop)):
+            if src[slot] != NIL:
+                yield self._edge(slot)
+
+    def ego_network(self, account_id, hops, since=None, max_fanout=25, max_nodes=200, max_visits=20000):
+        """
+        The account's neighbourhood up to `hops` edges away in either direction, over edges
+        with ts >= since. Each expanded account contributes at most max_fanout of its newest
+        qualifying edges per direction, and the walk stops at max_nodes accounts or after
+        reading max_visits edges. Returns (nodes [(id, type, hop)], edges [(u, v, ts, amount,
+        txn_id)], truncated); truncated is set if any cap cut the result short.
+        """
+        walk = self.ego_walk(account_id, hops, since, max_fanout, max_nodes, max_visits)
+        try:
+            while True:
+                next(walk)
+        except StopIteration as done:
+            return done.value
+
+    def ego_walk(self, account_id, hops, since=None, max_fanout=25, max_nodes=200, max_visits=20000,
+                 chunk=1000):
+        """
+        ego_network as a generator that yields after each expanded account once `chunk` edges
+        have been read since the last yield, so an event-loop caller can let writes run in
+        between. The walk keeps account IDs and copied edges rather than codes and slots, so
+        those writes are safe; the result is then fuzzy, like a snapshot capture.
+        Returns the ego_network result.
+        """
+        if account_id not in self.accounts:
+            return [], [], False
+        ts, src, dst, types = self._ts, self._src, self._dst, self._type
+        ids = self.accounts.ids
+        nodes = {account_id: (account_id, self.node_type(account_id), 0)}
+        edges = {}  # (u, v) -> edge; an edge can be reached from both ends
+        frontier = [account_id]
+        visits, last_yield, truncated = 0, 0, False
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                if visits - last_yield >= chunk:
+                    last_yield = visits
+                    yield
+                code = self.accounts.code(node)
+                if code is None:
+                    continue  # Evicted while the walk was paused
+                for outgoing in (True, False):
+                    candidates = []
+                    for s in self._slots(code, outgoing):
+                        visits += 1
+                        if visits > max_visits:
+                            truncated = True
+                            break
+                        if since is None or ts[s] >= since:
+                            candidates.append(s)
+                    if len(candidates) > max_fanout:
+                        truncated = True
+                        candidates = heapq.nlargest(max_fanout, candidates, key=ts.__getitem__)
+                    for s in candidates:
+                        other = ids[dst[s] if outgoing else src[s]]
+                        if other not in nodes:
+                            if len(nodes) >= max_nodes:
+                                truncated = True
+                                continue
+                            nodes[other] = (other, NODE_TYPES[types[self.accounts.codes[other]]], hop)
+                            next_frontier.append(other)
+                        pair = (node, other) if outgoing else (other, node)
+                        if pair not in edges:
+                            edges[pair] = self._edge(s)
+                    if visits > max_visits:
+                        break
+                if visits > max_visits:
+                    break
+            frontier = next_frontier
+            if visits > max_visits or not frontier:
+                break
+        return list(nodes.values()), list(edges.values()), truncated
+
+    def to_networkx(self):
+        """Copies the graph into a networkx DiGraph (node 'type', edge 'ts'/'amount'/'txn_id') for analysis."""
+        import networkx as nx
+        graph = nx.DiGraph()
+        graph.add_nodes_from((account_id, {'type': kind} if kind else {}) for account_id, kind in self.nodes())
+        graph.add_edges_from((u, v, {'ts': ts, 'amount': amount, 'txn_id': txn_id})
+                             for u, v, ts, amount, txn_id in self.edges())
+        return graph
@@ -0,0 +1,115 @@
+import math
+import os
+
+import numpy as np
+
+from backend import columnar
+
+# Finest grid resolution in degrees (~1.1 km); coarser zoom levels aggregate these cells
+BASE_CELL_DEG = 0.01
+
+
+def cell_size_for_zoom(zoom):
+    """Grid cell size in degrees for a map zoom level (about 8 cells per map tile)."""
+    return max(BASE_CELL_DEG, 360.0 / (2 ** zoom) / 8)
+
+
+class HotspotGrid:
+    """
+    Fraud hotspots pre-aggregated into lat/lng grid cells.
+    Historical points are loaded once per data-file change (by mtime); live alerts are
+    folded in incrementally. Coarser per-zoom grids are built lazily and kept up to date.
+    Each cell holds [count, sum_lat, sum_lng] so its centroid can be served.
+    """
+
+    def __init__(self, path, columnar_path=None):
+        self.path = path
+        self.columnar_path = columnar_path
+        self._mtime = None
+        self._historical = {}
+        self._live = {}
+        self._zoom_grids = {}  # cell size -> {cell: [count, sum_lat, sum_lng]}
+
+    def changed_mtime(self):
+        """Returns the data file's mtime if it changed since the last load, else None."""
+        try:
+            if self._columnar():
+                mtime = columnar.mtime(self.columnar_path)
+            else:
+                mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        return None if mtime == self._mtime else mtime
+
+    def load_historical(self):
+        """Reads fraud points from the data file into base cells. Safe to run off the event loop."""
+        if self._columnar():
+            # Zero-copy: only the three mapped columns are paged in
+            table = columnar.ColumnarTable(self.columnar_path)
+            fraud = table.raw('is_fraud') == 1
+            return self._aggregate(np.asarray(table.raw('lat')[fraud]), np.asarray(table.raw('lng')[fraud]))
+        import pandas as pd
+        df = pd.read_csv(self.path, usecols=['lat', 'lng', 'is_fraud'])
+        fraud = df[df['is_fraud'] == 1]
+        return self._aggregate(fraud['lat'].to_numpy(), fraud['lng'].to_numpy())
+
+    def _columnar(self):
+        return self.columnar_path is not None and columnar.exists(self.columnar_path)
+
+    def set_historical(self, cells, mtime):
+        self._historical = cells
+        self._mtime = mtime
+        self._zoom_grids.clear()
+
+    @staticmethod
+    def _aggregate(lats, lngs):
+        cells = {}
+        if len(lats) == 0:
+            return cells
+        keys = np.stack([np.floor(lats / BASE_CELL_DEG), np.floor(lngs / BASE_CELL_DEG)], axis=1).astype(np.int64)
+        uniq, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        sum_lat = np.bincount(inverse, weights=lats)
+        sum_lng = np.bincount(inverse, weights=lngs)
+        for (ix, iy), c, sl, sg in zip(uniq.tolist(), counts.tolist(), sum_lat.tolist(), sum_lng.tolist()):
+            cells[(ix, iy)] = [c, sl, sg]
+        return cells
+
+    @staticmethod
+    def _add_point(cells, key, lat, lng, count=1):
+        cell = cells.get(key)
+        if cell is None:
+            cells[key] = [count, lat * count, lng * count]
+        else:
+            cell[0] += count
+            cell[1] += lat * count
+            cell[2] += lng * count
+
+    def add(self, lat, lng):
+        """Folds a live alert into the base grid and every cached zoom grid."""
+        self._add_point(self._live, (math.floor(lat / BASE_CELL_DEG), math.floor(lng / BASE_CELL_DEG)), lat, lng)
+        for size, cells in self._zoom_grids.items():
+            self._add_point(cells, (math.floor(lat / size), math.floor(lng / size)), lat, lng)
+
+    def _grid(self, size):
+        cells = self._zoom_grids.get(size)
+        if cells is None:
+            cells = {}
+            for source in (self._historical, self._live):
+                for count, sum_lat, sum_lng in source.values():
+                    lat, lng = sum_lat / count, sum_lng / count
+                    self._add_point(cells, (math.floor(lat / size), math.floor(lng / size)), lat, lng, count)
+            self._zoom_grids[size] = cells
+        return cells
+
+    def query(self, min_lat, min_lng, max_lat, max_lng, zoom, limit=None):
+        """Cells inside the bounding box at the given zoom, largest counts first."""
+        size = cell_size_for_zoom(zoom)
+        lo_x, hi_x = math.floor(min_lat / size), math.floor(max_lat / size)
+        lo_y, hi_y = math.floor(min_lng / size), math.floor(max_lng / size)
+        result = []
+        for (ix, iy), (count, sum_lat, sum_lng) in self._grid(size).items():
+            if lo_x <= ix <= hi_x and lo_y <= iy <= hi_y:
+                result.append({"lat": sum_lat / count, "lng": sum_lng / count, "count": count})
+        result.sort(key=lambda c: c["count"], reverse=True)
+        return result[:limit] if limit else result
@@ -1,29 +1,218 @@
+import time
+IMPORT_START = time.perf_counter()  # reported by /ready
+
 import asyncio
+import gc
 import json
+import math
 import os
-import pandas as pd
+import threading
+from contextlib import contextmanager
 import numpy as np
-import networkx as nx
-import joblib
 import socketio
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from datetime import datetime, timedelta
-from sklearn.cluster import DBSCAN
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, ValidationError
+from datetime import datetime
+# pandas, joblib and sklearn are imported lazily: the compiled model path needs none of them
+from backend.velocity import VelocityStore
+from backend.fan_in import FanInIndex
+from backend.graph_store import TransferGraph
+from backend.neighborhood import NeighborhoodCache
+from backend.retention import GraphRetention
+from backend.cycles import find_cycle
+from backend.batching import MicroBatcher
+from backend.model_registry import (ShadowComparison, compiled_path_for, geo_clusters_path_for,
+                                    load_model as load_model_files)
+from backend.executor import ScoringExecutor, LoopLagMonitor
+from backend import columnar
+from backend.hotspots import HotspotGrid
+from backend.replay import ReplayEngine
+from backend.metrics import Registry
+from backend.persistence import WriteAheadLog, Snapshot, capture, write_snapshot
+from backend.sharding import ShardRouter
+from backend.profiler import SamplingProfiler
+from backend.alerts import AlertBroadcaster
+from backend.blocklist import Blocklist
 
 # --- Configuration ---
 MODEL_PATH = 'backend/models/fraud_model.pkl'
 COLUMNS_PATH = 'backend/models/model_columns.pkl'
+# Flattened array form of MODEL_PATH (directory of .npy files, memory-mapped at load so
+# every worker on the host shares its pages), rebuilt whenever the pickle is newer
+COMPILED_MODEL_PATH = 'backend/models/fraud_model_compiled'
+USE_COMPILED_MODEL = True
+# Hot reload: the model files are polled every MODEL_WATCH_INTERVAL seconds (0 disables) and a
+# changed model is loaded, warmed up and swapped in between requests ('active'), or scored
+# alongside the active one for comparison ('shadow') until promoted via /admin/model/promote.
+MODEL_WATCH_INTERVAL = 5.0
+MODEL_RELOAD_TARGET = 'active'
+# /admin/model/reload only loads pickles from under this directory
+MODEL_DIR = 'backend/models'
+# A transaction is flagged when its highest risk factor exceeds this
+FRAUD_THRESHOLD = 0.8
+# DBSCAN core points saved by train_model.py for serving-time cluster lookup. Without them
+# every transaction would score with geo_cluster_id 0 (train/serve skew), so a model that uses
+# that feature is refused without its clusters, unless this is set to False. Other models'
+# clusters are looked up next to them (candidate.pkl -> candidate_geo_clusters.pkl).
+GEO_CLUSTERS_PATH = 'backend/models/geo_clusters.pkl'
+GEO_CLUSTERS_REQUIRED = True
 DATA_PATH = 'backend/data/historical_data.csv'
+# Memory-mapped columnar copy written by data_generator.py (preferred over the CSV)
+COLUMNAR_DATA_PATH = 'backend/data/historical'
+# Velocity feature windows (feature name -> seconds). The model uses velocity_1h;
+# the others are tracked at no extra cost for future features.
+VELOCITY_WINDOWS = {
+    'velocity_10m': 10 * 60,
+    'velocity_1h': 60 * 60,
+    'velocity_24h': 24 * 60 * 60,
+}
+# Mule fan-in: flag receiver with more than FAN_IN_THRESHOLD incoming transfers in the window
+FAN_IN_WINDOW_MINUTES = 10
+FAN_IN_THRESHOLD = 5
+# FRAUD_GRAPH retention: edges older than the horizon are expired, and the oldest edges
+# are evicted while the graph is over either cap. Orphaned nodes are dropped.
+GRAPH_RETENTION_HOURS = 24
+GRAPH_MAX_EDGES = 500000
+GRAPH_MAX_NODES = 1000000
+GRAPH_EVICTION_BUDGET = 16         # evictions amortized into each update_graph call
+GRAPH_EVICTION_INTERVAL = 1.0      # seconds between background eviction passes
+# Transaction times more than this far ahead of the server clock are clamped to it, so one
+# far-future timestamp cannot move the graph / velocity / fan-in windows' 'now' forward for good
+MAX_CLOCK_SKEW_SECONDS = 300
+# Circular trading: cycles of CYCLE_MIN_HOPS..CYCLE_MAX_HOPS closed by the new edge,
+# with every edge inside the window. Fan-out and visit caps bound the search per transaction.
+CYCLE_MIN_HOPS = 3
+CYCLE_MAX_HOPS = 5
+CYCLE_WINDOW_HOURS = 3
+CYCLE_MAX_FANOUT = 64
+CYCLE_MAX_VISITS = 2048
+# GET /graph/{account_id}: k-hop ego network for the investigation panel. The walk is capped
+# per hop (newest GRAPH_API_MAX_FANOUT edges per direction) and overall; responses are LRU-cached
+# until a transfer touches one of their accounts, or for GRAPH_API_CACHE_TTL seconds.
+GRAPH_API_MAX_HOPS = 3
+GRAPH_API_MAX_FANOUT = 25
+GRAPH_API_MAX_NODES = 200
+GRAPH_API_MAX_VISITS = 20000       # edges read per walk
+GRAPH_API_WALK_CHUNK = 1000        # edges read between yields to the event loop
+GRAPH_API_CACHE_SIZE = 256
+GRAPH_API_CACHE_TTL = 30.0
+# Micro-batching: concurrent /predict calls arriving within the wait window are scored
+# together in one predict_proba call (up to BATCH_MAX_SIZE rows)
+BATCH_SCORING = True
+BATCH_MAX_SIZE = 256
+BATCH_MAX_WAIT_MS = 2.0
+# Where inference runs: 'inline' (event loop), 'thread' or 'process' pool.
+# Graph/velocity state is only ever updated on the event loop; pools get feature rows.
+SCORING_MODE = 'thread'
+SCORING_WORKERS = 2
+LOOP_LAG_INTERVAL = 0.1            # seconds between event-loop lag probes
+HOTSPOT_LIMIT = 500                # max cells returned by /hotspots
+WARMUP_ROWS = 64                   # dummy rows scored per worker before reporting ready
+# Detection state persistence: a compact snapshot of graph + velocity + fan-in state, plus a
+# write-ahead log of transactions applied since. Startup loads the snapshot and replays the log.
+STATE_PERSISTENCE = True
+SNAPSHOT_PATH = 'backend/state/snapshot.npz'
+WAL_DIR = 'backend/state/wal'
+SNAPSHOT_INTERVAL = 300            # seconds between snapshots...
+SNAPSHOT_MAX_WAL_RECORDS = 200000  # ...or sooner once this many records are logged (bounds replay time)
+WAL_FLUSH_INTERVAL = 0.05          # seconds between WAL group commits (data loss window on a crash)
+WAL_FSYNC = True
+SNAPSHOT_CHUNK = 1000              # entries copied per event-loop slice while capturing a snapshot
+# Partitioned state: with STATE_SHARDS > 0 the graph / velocity / fan-in state lives in that many
+# shard processes keyed by account hash (python -m backend.sharding), and this process only
+# routes and scores, so uvicorn can run several workers. 0 keeps state in this process.
+STATE_SHARDS = int(os.environ.get('KAVACH_STATE_SHARDS', '0'))
+SHARD_SOCKET_DIR = os.environ.get('KAVACH_SHARD_SOCKET_DIR', 'backend/state/shards')
+SHARD_CONNECT_TIMEOUT = 30.0
+# Alert fan-out: flagged transactions go into a bounded queue (oldest dropped when full) that is
+# flushed to dashboards as 'alerts_batch' frames every ALERT_FLUSH_INTERVAL seconds. Clients may
+# subscribe to a map viewport (joining ALERT_REGION_DEG grid-cell rooms). Each client buffers at
+# most ALERT_CLIENT_BUFFER alerts and has ALERT_MAX_IN_FLIGHT unacked frames before it falls behind.
+ALERT_FLUSH_INTERVAL = 0.1
+ALERT_QUEUE_SIZE = 10000
+ALERT_CLIENT_BUFFER = 1000
+ALERT_MAX_BATCH = 500              # alerts per frame
+ALERT_MAX_IN_FLIGHT = 2
+ALERT_ACK_TIMEOUT = 10.0           # seconds before an unacked frame is written off
+ALERT_REGION_DEG = 2.0
+ALERT_MAX_REGIONS = 2048           # larger viewports just receive every alert
+# Socket.IO runs over WebSocket only. With several uvicorn workers, a long-polling session's
+# requests would land on different workers (unknown sid); a WebSocket stays on the worker that
+# accepted it. Alerts from every worker reach every dashboard through shard 0 (AlertLog).
+SOCKETIO_TRANSPORTS = ['websocket']
+# Frozen accounts: transactions touching one are declined before any state update or scoring.
+# /freeze changes are journaled to BLOCKLIST_PATH (re-read every BLOCKLIST_SYNC_INTERVAL seconds so
+# all web workers agree); BLOCKLIST_SEED_PATH, one account ID per line, is bulk-loaded at startup.
+BLOCKLIST_PATH = 'backend/state/frozen_accounts.log'
+BLOCKLIST_SEED_PATH = 'backend/data/frozen_accounts.txt'
+BLOCKLIST_SYNC_INTERVAL = 1.0
+REPLAY_COLUMNS = ['txn_id', 'sender_id', 'receiver_id', 'amount', 'timestamp', 'lat', 'lng', 'device_id']
 
 # --- Global State ---
-FRAUD_GRAPH = nx.DiGraph()
-model = None
-model_columns = None
-# Store recent transactions for velocity calculation (in-memory simplified approach for demo)
+# Transfer graph over interned account IDs in typed arrays (FRAUD_GRAPH.to_networkx() for analysis)
+FRAUD_GRAPH = TransferGraph()
+GRAPH_RETENTION = GraphRetention(FRAUD_GRAPH, GRAPH_RETENTION_HOURS * 3600,
+                                 max_edges=GRAPH_MAX_EDGES, max_nodes=GRAPH_MAX_NODES,
+                                 step_budget=GRAPH_EVICTION_BUDGET, max_skew=MAX_CLOCK_SKEW_SECONDS)
+# Cached /graph responses, invalidated per account by update_graph
+NEIGHBORHOODS = NeighborhoodCache(GRAPH_API_CACHE_SIZE, GRAPH_API_CACHE_TTL)
+# Models serving live traffic, each with its own geo clusters. Each request uses the
+# ACTIVE_MODEL it started with, so a swap is a single assignment between requests.
+ACTIVE_MODEL = None
+SHADOW_MODEL = None
+SHADOW_COMPARISON = None
+MODEL_RELOAD_LOCK = asyncio.Lock()
+# Per-sender sliding windows for velocity calculation (in-memory simplified approach for demo)
 # In production, use Redis or a time-series DB.
-recent_transactions = [] 
+VELOCITY_STORE = VelocityStore(VELOCITY_WINDOWS, max_skew=MAX_CLOCK_SKEW_SECONDS)
+# Historical + live fraud locations aggregated into grid cells for /hotspots
+HOTSPOTS = HotspotGrid(DATA_PATH, COLUMNAR_DATA_PATH)
+# Incoming transfer times per receiver for fan-in checks
+FAN_IN_INDEX = FanInIndex(FAN_IN_WINDOW_MINUTES * 60, max_skew=MAX_CLOCK_SKEW_SECONDS)
+# Log of applied transactions since the last snapshot (enabled once recovery finishes)
+WAL = WriteAheadLog(WAL_DIR, fsync=WAL_FSYNC)
+PERSISTENCE_STATS = {"recovery": None, "last_snapshot": None}
+# Connection to the state shards when STATE_SHARDS > 0 (set up at startup)
+SHARDS = None
+BLOCKLIST = Blocklist(BLOCKLIST_PATH, BLOCKLIST_SEED_PATH)
+
+# --- Metrics ---
+METRICS = Registry()
+STAGE_LATENCY = METRICS.histogram('kavach_stage_seconds', 'Latency of each predict pipeline stage.', label='stage')
+REQUESTS = METRICS.counter('kavach_requests_total', 'Scoring requests by endpoint.', label='endpoint')
+ALERTS = METRICS.counter('kavach_alerts_total', 'Transactions flagged as fraud.')
+ERRORS = METRICS.counter('kavach_errors_total', 'Errors by kind.', label='kind')
+BLOCKED = METRICS.counter('kavach_blocked_total', 'Transactions declined because an account is frozen.', label='side')
+METRICS.gauge('kavach_frozen_accounts', 'Accounts on the blocklist.', lambda: len(BLOCKLIST))
+METRICS.gauge('kavach_graph_nodes', 'Nodes in FRAUD_GRAPH.', lambda: FRAUD_GRAPH.number_of_nodes())
+METRICS.gauge('kavach_graph_edges', 'Edges in FRAUD_GRAPH.', lambda: FRAUD_GRAPH.number_of_edges())
+METRICS.gauge('kavach_velocity_events', 'Buffered velocity events.', lambda: len(VELOCITY_STORE))
+METRICS.gauge('kavach_fan_in_events', 'Buffered fan-in events.', lambda: len(FAN_IN_INDEX))
+METRICS.gauge('kavach_wal_records', 'Transactions logged since the last snapshot.', lambda: WAL.records)
+MODEL_LATENCY = METRICS.histogram('kavach_model_seconds', 'Model scoring time per batch (excludes queueing).',
+                                  label='model')
+ALERTS_DROPPED = METRICS.counter('kavach_alerts_dropped_total',
+                                 'Alerts dropped before delivery (queue full or client behind).', label='reason')
+METRICS.gauge('kavach_alert_queue_depth', 'Alerts waiting for the next broadcast.', lambda: len(ALERT_BROADCASTER.queue))
+METRICS.gauge('kavach_alert_client_backlog', 'Alerts buffered for slow clients.',
+              lambda: ALERT_BROADCASTER.stats()['client_backlog'])
+METRICS.gauge('kavach_event_loop_lag_seconds', 'Last measured event-loop lag.', lambda: LOOP_LAG.last)
+PROFILER = SamplingProfiler()
+
+# --- Startup ---
+# Seconds spent in each startup phase, reported by /ready
+STARTUP_TIMINGS = {}
+READY = False
+
+@contextmanager
+def startup_phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[name] = time.perf_counter() - start
 
 # --- FastAPI Setup ---
 app = FastAPI(title="KAVACH_TITANIUM Backend")
@@ -38,9 +227,34 @@ app.add_middleware(
 )
 
 # Socket.IO Setup
-# Enable logger for debugging
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', logger=True, engineio_logger=True)
+# Packet logging stays off: at alert-burst rates it costs more than the emits themselves
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*', transports=SOCKETIO_TRANSPORTS,
+                           logger=False, engineio_logger=False)
 socket_app = socketio.ASGIApp(sio, app)
+ALERT_BROADCASTER = AlertBroadcaster(sio.emit, interval=ALERT_FLUSH_INTERVAL, queue_size=ALERT_QUEUE_SIZE,
+                                     client_buffer=ALERT_CLIENT_BUFFER, max_batch=ALERT_MAX_BATCH,
+                                     max_in_flight=ALERT_MAX_IN_FLIGHT, ack_timeout=ALERT_ACK_TIMEOUT,
+                                     region_deg=ALERT_REGION_DEG, max_regions=ALERT_MAX_REGIONS,
+                                     on_drop=lambda reason, count: ALERTS_DROPPED.inc(reason, count))
+
+@sio.event
+async def connect(sid, environ):
+    ALERT_BROADCASTER.connect(sid)
+
+@sio.event
+async def disconnect(sid, *args):
+    ALERT_BROADCASTER.disconnect(sid)
+
+@sio.event
+async def subscribe(sid, viewport=None):
+    """Limits a dashboard's alerts to a map viewport {min_lat, min_lng, max_lat, max_lng} (null = all)."""
+    viewport = viewport or {}
+    try:
+        bounds = [viewport.get(k) for k in ('min_lat', 'min_lng', 'max_lat', 'max_lng')]
+        bounds = [None if b is None else float(b) for b in bounds]
+    except (AttributeError, TypeError, ValueError):
+        return {"regions": 0, "error": "invalid viewport"}
+    return {"regions": ALERT_BROADCASTER.subscribe(sid, *bounds)}
 
 # --- Data Models ---
 class Transaction(BaseModel):
@@ -55,237 +269,1005 @@ class Transaction(BaseModel):
 
 # --- Helper Functions ---
 def load_model():
-    global model, model_columns
-    if os.path.exists(MODEL_PATH) and os.path.exists(COLUMNS_PATH):
-        print("Loading model and columns...")
-        model = joblib.load(MODEL_PATH)
-        model_columns = joblib.load(COLUMNS_PATH)
+    """Loads the model files into ACTIVE_MODEL (see model_registry.load_model)."""
+    global ACTIVE_MODEL
+    print("Loading model and columns...")
+    model = load_model_files(MODEL_PATH, COLUMNS_PATH, COMPILED_MODEL_PATH if USE_COMPILED_MODEL else None,
+                             GEO_CLUSTERS_PATH)
+    check_geo_clusters(model, GEO_CLUSTERS_PATH)
+    ACTIVE_MODEL = model
+    if ACTIVE_MODEL is not None:
         print("Model loaded successfully.")
     else:
         print("Model files not found. Please run Task 2 first.")
 
-def update_graph(txn: Transaction):
-    """Updates the directed graph with the new transaction."""
-    FRAUD_GRAPH.add_node(txn.sender_id, type='sender')
-    FRAUD_GRAPH.add_node(txn.receiver_id, type='receiver')
-    
-    # Add edge with timestamp attribute
-    FRAUD_GRAPH.add_edge(txn.sender_id, txn.receiver_id, 
-                         amount=txn.amount, 
-                         timestamp=txn.timestamp,
-                         txn_id=txn.txn_id)
+def check_geo_clusters(model, geo_clusters_path):
+    """Refuses a model that scores on geo_cluster_id without the clusters it was trained with."""
+    if model is None or 'geo_cluster_id' not in model.columns:
+        return
+    if model.geo_index is not None:
+        print(f"Geo cluster index loaded ({len(model.geo_index.labels)} core points).")
+    elif GEO_CLUSTERS_REQUIRED:
+        raise RuntimeError(f"{geo_clusters_path} not found, but the model uses geo_cluster_id. Re-run "
+                           f"`python -m backend.train_model` (it writes the model and its clusters together), "
+                           f"or set GEO_CLUSTERS_REQUIRED = False to score with geo_cluster_id 0.")
+    else:
+        print("Geo clusters not found; geo_cluster_id will be 0. Re-run train_model.py.")
+
+def load_blocklist():
+    BLOCKLIST.load()
+    # Fold redundant freeze/unfreeze lines away; only while this is the journal's only writer
+    if not STATE_SHARDS and BLOCKLIST.journal_lines > 2 * len(BLOCKLIST) + 1000:
+        BLOCKLIST.compact()
+    print(f"Blocklist loaded ({len(BLOCKLIST)} frozen accounts).")
+
+def model_ready() -> bool:
+    return ACTIVE_MODEL is not None
+
+def reset_state():
+    """Clears all in-memory detection state (graph, fan-in, velocity)."""
+    FRAUD_GRAPH.clear()
+    GRAPH_RETENTION.clear()
+    NEIGHBORHOODS.clear()
+    FAN_IN_INDEX.clear()
+    VELOCITY_STORE.clear()
+
+def add_transfer(sender_id, receiver_id, amount, ts, txn_id):
+    """Writes a transfer onto FRAUD_GRAPH and registers the edge for retention."""
+    FRAUD_GRAPH.add_node(sender_id, type='sender')
+    FRAUD_GRAPH.add_node(receiver_id, type='receiver')
+
+    # Add edge with epoch time (latest transfer wins on the graph edge;
+    # every transfer is kept in FAN_IN_INDEX)
+    slot = FRAUD_GRAPH.add_edge(sender_id, receiver_id, ts, amount, txn_id)
+    GRAPH_RETENTION.track(slot, ts)
+
+def update_graph(txn: Transaction, current_time: datetime):
+    """Updates the directed graph and the fan-in index with the new transaction."""
+    ts = current_time.timestamp()
+    add_transfer(txn.sender_id, txn.receiver_id, txn.amount, ts, txn.txn_id)
+    FAN_IN_INDEX.add(txn.receiver_id, ts)
+    NEIGHBORHOODS.invalidate(txn.sender_id)
+    NEIGHBORHOODS.invalidate(txn.receiver_id)
+
+    # Amortized eviction keeps graph memory bounded without a full sweep
+    GRAPH_RETENTION.step()
+
+def restore_snapshot(snapshot: Snapshot) -> dict:
+    """
+    Loads a snapshot into the (empty) detection state. Returns {store: {key: seq}}, the log
+    position each velocity / fan-in key was copied at.
+    """
+    GRAPH_RETENTION.track_many((ts, FRAUD_GRAPH.add_edge(sender_id, receiver_id, ts, amount, txn_id))
+                               for sender_id, receiver_id, amount, ts, txn_id in snapshot.edges())
+    # Types only for accounts that still have edges (the node list is copied before the edges)
+    for node, kind in snapshot.nodes():
+        if kind and node in FRAUD_GRAPH:
+            FRAUD_GRAPH.add_node(node, kind)
+    seqs = {}
+    for name, store in (('velocity', VELOCITY_STORE), ('fan_in', FAN_IN_INDEX)):
+        seqs[name] = {}
+        for key, times, seq in snapshot.window(name):
+            store.restore(key, times)
+            seqs[name][key] = seq
+    return seqs
+
+def recover_state():
+    """
+    Rebuilds detection state from the last snapshot plus the write-ahead log tail, then starts
+    logging. Graph edges are last-write-wins, so every record after the snapshot's start is
+    replayed onto it; window counts only take records newer than the point each key was copied.
+    """
+    start = time.perf_counter()
+    # Restoring allocates millions of long-lived dicts; cyclic GC passes over them only add time
+    gc.disable()
+    try:
+        _recover_state(start)
+    finally:
+        gc.enable()
+
+def _recover_state(start):
+    snapshot_seq, seqs, snapshot_edges = 0, {'velocity': {}, 'fan_in': {}}, 0
+    if os.path.exists(SNAPSHOT_PATH):
+        try:
+            snapshot = Snapshot(SNAPSHOT_PATH)
+            seqs = restore_snapshot(snapshot)
+            snapshot_seq, snapshot_edges = snapshot.start_seq, snapshot.num_edges
+        except Exception as e:
+            ERRORS.inc('snapshot_load')
+            print(f"Snapshot load failed, replaying the log only: {e}")
+            reset_state()
+    loaded = time.perf_counter()
+
+    last_seq, replayed = snapshot_seq, 0
+    velocity_seqs, fan_in_seqs = seqs['velocity'], seqs['fan_in']
+    for seq, sender_id, receiver_id, txn_id, timestamp, ts, amount in WAL.read(snapshot_seq):
+        add_transfer(sender_id, receiver_id, amount, ts, txn_id)
+        if seq > fan_in_seqs.get(receiver_id, snapshot_seq):
+            FAN_IN_INDEX.add(receiver_id, ts)
+        if seq > velocity_seqs.get(sender_id, snapshot_seq):
+            VELOCITY_STORE.observe(sender_id, ts)
+        last_seq, replayed = seq, replayed + 1
+    WAL.open(last_seq)
+
+    PERSISTENCE_STATS["recovery"] = {
+        "snapshot_seq": snapshot_seq,
+        "snapshot_edges": snapshot_edges,
+        "replayed_records": replayed,
+        "snapshot_seconds": round(loaded - start, 4),
+        "replay_seconds": round(time.perf_counter() - loaded, 4),
+    }
+    print(f"Recovered state: {snapshot_edges} edges from snapshot, {replayed} log records replayed "
+          f"in {time.perf_counter() - start:.2f}s.")
 
 def check_graph_risk(receiver_id: str, current_time: datetime) -> float:
     """
     Checks for 'Mule Fan-Out' / Star Topology.
-    High risk if receiver has > 5 incoming transactions in the last 10 minutes.
+    High risk if receiver has > FAN_IN_THRESHOLD incoming transactions in the last
+    FAN_IN_WINDOW_MINUTES minutes.
     """
-    if not FRAUD_GRAPH.has_node(receiver_id):
-        return 0.0
-    
-    in_edges = FRAUD_GRAPH.in_edges(receiver_id, data=True)
-    recent_count = 0
-    
-    # 10 minute window
-    window_start = current_time - timedelta(minutes=10)
-    
-    for u, v, data in in_edges:
-        # Parse timestamp from edge data if it's a string
-        edge_time = data['timestamp']
-        if isinstance(edge_time, str):
-             try:
-                edge_time = datetime.fromisoformat(edge_time)
-             except ValueError:
-                continue # Skip if format is weird
-        
-        if edge_time >= window_start:
-            recent_count += 1
-            
-    if recent_count > 5:
+    return fan_in_risk(FAN_IN_INDEX.count(receiver_id, current_time.timestamp()))
+
+def fan_in_risk(recent_count: int) -> float:
+    if recent_count > FAN_IN_THRESHOLD:
+        return 1.0
+    return 0.0
+
+def check_cycle_risk(txn: Transaction, current_time: datetime) -> float:
+    """
+    Checks for 'Circular Trading' (A -> B -> C -> A) closed by this transaction.
+    Only searches paths receiver -> ... -> sender, so cost is bounded per insert.
+    """
+    cycle = find_cycle(FRAUD_GRAPH, txn.sender_id, txn.receiver_id,
+                       current_time.timestamp(), CYCLE_WINDOW_HOURS * 3600,
+                       min_hops=CYCLE_MIN_HOPS, max_hops=CYCLE_MAX_HOPS,
+                       max_fanout=CYCLE_MAX_FANOUT, max_visits=CYCLE_MAX_VISITS)
+    if cycle:
         return 1.0
     return 0.0
 
 def get_velocity_1h(sender_id: str, current_time: datetime) -> int:
     """Calculates number of transactions for sender in last 1 hour."""
-    # Filter global recent_transactions list
-    # Clean up old transactions periodically in a real app
-    count = 0
-    window_start = current_time - timedelta(hours=1)
-    
-    for t in recent_transactions:
-        if t['sender_id'] == sender_id:
-            t_time = t['timestamp']
-            if isinstance(t_time, str):
-                 try:
-                    t_time = datetime.fromisoformat(t_time)
-                 except ValueError:
-                    continue
-            
-            if t_time >= window_start:
-                count += 1
-    return count
-
-def get_geo_cluster(lat, lng):
-    # Simplified: In a real-time stream, we can't re-run DBSCAN on 50k points every request.
-    # For this demo, we'll assign a dummy cluster or use a simple distance check against known centroids if we had them.
-    # OR, we can just return 0 (noise) for now as re-clustering is expensive.
-    # Alternatively, we can re-implement the exact logic if we kept the fitted DBSCAN, but DBSCAN isn't really 'predictive' for new points easily without re-fitting or using a radius search.
-    # Let's assume 0 for simplicity in single-point prediction, or simulate it.
-    # Better approach for demo: Just use 0. The model is robust enough.
-    return 0
+    return VELOCITY_STORE.count(sender_id, current_time.timestamp(), VELOCITY_WINDOWS['velocity_1h'])
+
+def update_velocity(txn: Transaction, current_time: datetime) -> dict:
+    """Records the transaction and returns its velocity counts (including itself) per window."""
+    return VELOCITY_STORE.observe(txn.sender_id, current_time.timestamp())
+
+def build_feature_row(txn: Transaction, current_time: datetime, velocity_1h: int, model) -> list:
+    """Builds one model input row, ordered to match model.columns."""
+    features = {
+        'amount': txn.amount,
+        'amount_log': np.log1p(txn.amount),
+        'hour_of_day': current_time.hour,
+        'velocity_1h': velocity_1h,
+        'geo_cluster_id': model.geo_cluster(txn.lat, txn.lng),
+        'lat': txn.lat,
+        'lng': txn.lng
+    }
+    # Fill missing columns with 0 if any (shouldn't be for this set)
+    return [features.get(col, 0) for col in model.columns]
+
+def build_feature_matrix(txns, times, velocity_1h, model) -> np.ndarray:
+    """Builds the model input matrix for many transactions in one pass, ordered as model.columns."""
+    amount = np.fromiter((t.amount for t in txns), dtype=np.float64, count=len(txns))
+    lat = np.fromiter((t.lat for t in txns), dtype=np.float64, count=len(txns))
+    lng = np.fromiter((t.lng for t in txns), dtype=np.float64, count=len(txns))
+    columns = {
+        'amount': amount,
+        'amount_log': np.log1p(amount),
+        'hour_of_day': np.fromiter((t.hour for t in times), dtype=np.float64, count=len(times)),
+        'velocity_1h': np.asarray(velocity_1h, dtype=np.float64),
+        'geo_cluster_id': model.geo_clusters(lat, lng),
+        'lat': lat,
+        'lng': lng
+    }
+    zeros = np.zeros(len(txns))
+    return np.column_stack([columns.get(col, zeros) for col in model.columns])
+
+SCORING_EXECUTOR = ScoringExecutor(SCORING_MODE, SCORING_WORKERS)
+LOOP_LAG = LoopLagMonitor(LOOP_LAG_INTERVAL)
+
+async def score_rows_async(rows, model, role='active'):
+    """Scores rows with model on the configured executor, keeping inference off the event loop."""
+    with STAGE_LATENCY.time('predict_proba' if role == 'active' else 'shadow_predict_proba'):
+        scores, seconds = await SCORING_EXECUTOR.score(rows, model)
+    model.record(len(rows), seconds)
+    MODEL_LATENCY.observe(role, seconds)
+    return scores
+
+async def score_tagged_rows(items, role='active'):
+    """
+    MicroBatcher callback: items are (model, row) pairs. Rows are scored by the model they
+    were built for, so a batch straddling a model swap is split per model.
+    """
+    groups = {}
+    for i, (model, _) in enumerate(items):
+        groups.setdefault(model, []).append(i)
+    if len(groups) == 1:
+        model = items[0][0]
+        return await score_rows_async([row for _, row in items], model, role)
+    scores = np.empty(len(items))
+    results = await asyncio.gather(*(score_rows_async([items[i][1] for i in idx], model, role)
+                                     for model, idx in groups.items()))
+    for idx, result in zip(groups.values(), results):
+        scores[idx] = result
+    return scores
+
+SCORER = MicroBatcher(score_tagged_rows, max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+# Shadow rows are batched separately, so live requests never wait on the candidate model
+SHADOW_SCORER = MicroBatcher(lambda items: score_tagged_rows(items, 'shadow'),
+                             max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+SHADOW_TASKS = set()
+
+def run_shadow(score, active_scores):
+    """
+    Scores the same traffic with SHADOW_MODEL in the background and records how far it is
+    from the active model. score is a coroutine function taking the shadow model.
+    """
+    shadow, comparison = SHADOW_MODEL, SHADOW_COMPARISON
+    if shadow is None:
+        return
+
+    async def compare():
+        try:
+            comparison.add(active_scores, await score(shadow))
+        except Exception as e:
+            comparison.errors += 1
+            print(f"Shadow scoring error: {e}")
+
+    task = asyncio.ensure_future(compare())
+    SHADOW_TASKS.add(task)  # Keep a reference until done
+    task.add_done_callback(SHADOW_TASKS.discard)
 
 # --- Endpoints ---
 
+async def graph_retention_task():
+    """Drains expired graph edges in small chunks, yielding to the event loop between them."""
+    while True:
+        await asyncio.sleep(GRAPH_EVICTION_INTERVAL)
+        # Keep going while entries are due: a chunk of stale entries removes nothing
+        while GRAPH_RETENTION.due:
+            GRAPH_RETENTION.step(GRAPH_EVICTION_BUDGET * 16)
+            await asyncio.sleep(0)
+
+async def blocklist_sync_task():
+    """Picks up freezes and unfreezes journaled by other web workers."""
+    while True:
+        await asyncio.sleep(BLOCKLIST_SYNC_INTERVAL)
+        try:
+            BLOCKLIST.sync()
+        except Exception as e:
+            ERRORS.inc('blocklist_sync')
+            print(f"Blocklist sync failed: {e}")
+
+async def wal_flush_task():
+    """Group-commits logged transactions every WAL_FLUSH_INTERVAL."""
+    while True:
+        await asyncio.sleep(WAL_FLUSH_INTERVAL)
+        try:
+            await WAL.flush()
+        except OSError as e:
+            ERRORS.inc('wal_write')
+            print(f"WAL write failed: {e}")
+
+SNAPSHOT_LOCK = asyncio.Lock()
+
+async def snapshot_state():
+    """
+    Writes a snapshot without stopping the event loop: the log is rotated, state is copied in
+    chunks between requests, and encoding + writing run in a worker thread. Log segments the
+    snapshot covers are deleted once it's published.
+    """
+    async with SNAPSHOT_LOCK:
+        start = time.perf_counter()
+        start_seq = await WAL.rotate()
+        state = await capture(FRAUD_GRAPH, VELOCITY_STORE, FAN_IN_INDEX, lambda: WAL.seq, SNAPSHOT_CHUNK)
+        captured = time.perf_counter()
+        os.makedirs(os.path.dirname(SNAPSHOT_PATH), exist_ok=True)
+        size = await asyncio.to_thread(write_snapshot, SNAPSHOT_PATH, start_seq, state)
+        WAL.drop_segments(start_seq)
+        PERSISTENCE_STATS["last_snapshot"] = {
+            "seq": start_seq,
+            "edges": len(state['edges']['src']),
+            "bytes": size,
+            "capture_seconds": round(captured - start, 4),
+            "write_seconds": round(time.perf_counter() - captured, 4),
+            "at": datetime.now().isoformat(),
+        }
+
+async def snapshot_task():
+    """Snapshots every SNAPSHOT_INTERVAL, or early once the log reaches SNAPSHOT_MAX_WAL_RECORDS."""
+    last = time.monotonic()
+    while True:
+        await asyncio.sleep(1.0)
+        if WAL.records < SNAPSHOT_MAX_WAL_RECORDS and time.monotonic() - last < SNAPSHOT_INTERVAL:
+            continue
+        last = time.monotonic()
+        if not WAL.records:
+            continue
+        try:
+            await snapshot_state()
+        except Exception as e:
+            ERRORS.inc('snapshot_write')
+            print(f"Snapshot failed: {e}")
+
+async def warm_up(model=None):
+    """
+    Scores dummy rows on every worker before reporting ready (or before a reloaded model is
+    swapped in), so the first real requests don't pay for page faults on the mapped model,
+    pool spawn or lazy imports.
+    """
+    model = model or ACTIVE_MODEL
+    if model is None:
+        return
+    model.geo_clusters(np.zeros(1), np.zeros(1))
+    rows = np.zeros((WARMUP_ROWS, len(model.columns)))
+    workers = SCORING_EXECUTOR.workers if SCORING_EXECUTOR.mode != 'inline' else 1
+    await asyncio.gather(*(SCORING_EXECUTOR.score(rows, model) for _ in range(workers)))
+
+async def reload_model(model_path=None, columns_path=None, target='active', geo_clusters_path=None):
+    """
+    Loads a model and its geo clusters in a worker thread, warms it up and then either swaps it
+    in as the active model or installs it as the shadow. In-flight requests finish on the model
+    (and clusters) they started with.
+    """
+    global ACTIVE_MODEL, SHADOW_MODEL, SHADOW_COMPARISON
+    if target not in ('active', 'shadow'):
+        raise ValueError(f"Unknown reload target {target!r}, expected 'active' or 'shadow'")
+    model_path, columns_path = model_path or MODEL_PATH, columns_path or COLUMNS_PATH
+    if geo_clusters_path is None:
+        geo_clusters_path = GEO_CLUSTERS_PATH if model_path == MODEL_PATH else geo_clusters_path_for(model_path)
+    async with MODEL_RELOAD_LOCK:
+        compiled_path = None
+        if USE_COMPILED_MODEL:
+            compiled_path = COMPILED_MODEL_PATH if model_path == MODEL_PATH else compiled_path_for(model_path)
+        # Cluster numbering differs between training runs, so each model carries its own
+        candidate = await asyncio.to_thread(load_model_files, model_path, columns_path, compiled_path,
+                                            geo_clusters_path)
+        if candidate is None:
+            raise FileNotFoundError(f"Model files not found: {model_path}, {columns_path}")
+        check_geo_clusters(candidate, geo_clusters_path)
+        await warm_up(candidate)
+        if target == 'shadow':
+            SHADOW_MODEL, SHADOW_COMPARISON = candidate, ShadowComparison(FRAUD_THRESHOLD)
+        else:
+            ACTIVE_MODEL = candidate
+        print(f"Model reloaded from {model_path} as {target} ({candidate.kind}).")
+        return candidate
+
+def model_files_version():
+    """mtime of the watched model files (and geo clusters, if any), or None while either model file is missing."""
+    try:
+        return max(os.path.getmtime(MODEL_PATH), os.path.getmtime(COLUMNS_PATH),
+                   os.path.getmtime(GEO_CLUSTERS_PATH) if os.path.exists(GEO_CLUSTERS_PATH) else 0.0)
+    except OSError:
+        return None
+
+async def model_watch_task():
+    """
+    Reloads the model when its files change. A change is only picked up once the files have
+    stayed the same for a whole interval, so a model still being written is never loaded.
+    """
+    seen = model_files_version()
+    pending = None
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        version = model_files_version()
+        if version is None or version == seen:
+            pending = None
+            continue
+        if version != pending:
+            pending = version  # Changed since last poll: wait for it to settle
+            continue
+        seen, pending = version, None
+        try:
+            await reload_model(target=MODEL_RELOAD_TARGET)
+        except Exception as e:
+            ERRORS.inc('model_reload')
+            print(f"Model reload failed, keeping the current model: {e}")
+
+def shard_config() -> dict:
+    """State settings sent to the shards, so this module stays the single source of them."""
+    # An edge is stored on both endpoints' shards, so each holds about 2/STATE_SHARDS of the graph
+    share = min(1.0, 2.0 / STATE_SHARDS)
+    return {
+        'retention_seconds': GRAPH_RETENTION_HOURS * 3600,
+        'max_edges': int(GRAPH_MAX_EDGES * share),
+        'max_nodes': int(GRAPH_MAX_NODES * share),
+        'step_budget': GRAPH_EVICTION_BUDGET,
+        'max_skew': MAX_CLOCK_SKEW_SECONDS,
+        'velocity_windows': VELOCITY_WINDOWS,
+        'fan_in_window': FAN_IN_WINDOW_MINUTES * 60,
+        'alert_log_size': ALERT_QUEUE_SIZE,
+    }
+
+async def connect_shards():
+    global SHARDS
+    router = ShardRouter(STATE_SHARDS, SHARD_SOCKET_DIR)
+    await router.connect(shard_config(), timeout=SHARD_CONNECT_TIMEOUT)
+    SHARDS = router
+    # Each worker delivers every worker's alerts to its own dashboards
+    ALERT_BROADCASTER.relay = router.exchange_alerts
+    print(f"Connected to {STATE_SHARDS} state shards.")
+
 @app.on_event("startup")
 async def startup_event():
-    load_model()
+    global READY
+    STARTUP_TIMINGS['imports'] = IMPORT_DONE - IMPORT_START
+    start = time.perf_counter()
+    with startup_phase('load_model'):
+        load_model()
+    with startup_phase('load_blocklist'):
+        load_blocklist()
+    with startup_phase('start_executor'):
+        SCORING_EXECUTOR.start(ACTIVE_MODEL.spec if ACTIVE_MODEL is not None else None)
+    if STATE_SHARDS:
+        # State lives in the shards (in memory only; persistence covers the single-process mode)
+        with startup_phase('connect_shards'):
+            await connect_shards()
+    elif STATE_PERSISTENCE:
+        with startup_phase('recover_state'):
+            recover_state()
+        asyncio.create_task(wal_flush_task())
+        asyncio.create_task(snapshot_task())
+    with startup_phase('warm_up'):
+        await warm_up()
+    asyncio.create_task(graph_retention_task())
+    if MODEL_WATCH_INTERVAL:
+        asyncio.create_task(model_watch_task())
+    asyncio.create_task(LOOP_LAG.run())
+    asyncio.create_task(ALERT_BROADCASTER.run())
+    if BLOCKLIST_SYNC_INTERVAL:
+        asyncio.create_task(blocklist_sync_task())
+    STARTUP_TIMINGS['startup_event'] = time.perf_counter() - start
+    READY = True
+    print(f"Ready in {STARTUP_TIMINGS['imports'] + STARTUP_TIMINGS['startup_event']:.2f}s "
+          f"({', '.join(f'{k} {v:.2f}s' for k, v in STARTUP_TIMINGS.items())}).")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if WAL.enabled:
+        # A final snapshot leaves an empty log tail, so the next start skips replay
+        try:
+            await snapshot_state()
+        except Exception as e:
+            print(f"Shutdown snapshot failed: {e}")
+            await WAL.flush()
+        WAL.close()
+    if SHARDS is not None:
+        SHARDS.close()
+    SCORING_EXECUTOR.shutdown()
+
+def parse_timestamp(timestamp: str) -> datetime:
+    """
+    Parses an ISO 8601 transaction time (ValueError if it isn't one). Times more than
+    MAX_CLOCK_SKEW_SECONDS ahead of the server clock are clamped to that bound.
+    """
+    current_time = datetime.fromisoformat(timestamp)
+    limit = time.time() + MAX_CLOCK_SKEW_SECONDS
+    if current_time.timestamp() > limit:
+        ERRORS.inc('future_timestamp')
+        current_time = datetime.fromtimestamp(limit, current_time.tzinfo)
+    return current_time
+
+def apply_transaction(txn: Transaction, current_time: datetime):
+    """
+    Applies a transaction to the detection state (graph, fan-in, velocity) and returns
+    (graph_risk, cycle_risk, velocity_1h). Must be called in transaction order.
+    """
+    WAL.append(txn.sender_id, txn.receiver_id, txn.txn_id, txn.timestamp, current_time.timestamp(), txn.amount)
+    with STAGE_LATENCY.time('update_graph'):
+        update_graph(txn, current_time)
+    with STAGE_LATENCY.time('check_graph_risk'):
+        graph_risk = check_graph_risk(txn.receiver_id, current_time)
+    with STAGE_LATENCY.time('check_cycle_risk'):
+        cycle_risk = check_cycle_risk(txn, current_time)
+
+    # Velocity (includes current transaction)
+    with STAGE_LATENCY.time('velocity'):
+        velocity = update_velocity(txn, current_time)
+    return graph_risk, cycle_risk, velocity['velocity_1h']
+
+async def apply_transaction_async(txn: Transaction, current_time: datetime):
+    """apply_transaction, on the owning state shards when STATE_SHARDS is set."""
+    if SHARDS is None:
+        return apply_transaction(txn, current_time)
+    ts = current_time.timestamp()
+    with STAGE_LATENCY.time('shard_apply'):
+        velocity, fan_in_count = await SHARDS.apply(txn.sender_id, txn.receiver_id, txn.amount,
+                                                    txn.timestamp, ts, txn.txn_id)
+    with STAGE_LATENCY.time('check_cycle_risk'):
+        cycle = await SHARDS.find_cycle(txn.sender_id, txn.receiver_id, ts, CYCLE_WINDOW_HOURS * 3600,
+                                        min_hops=CYCLE_MIN_HOPS, max_hops=CYCLE_MAX_HOPS,
+                                        max_fanout=CYCLE_MAX_FANOUT, max_visits=CYCLE_MAX_VISITS)
+    return fan_in_risk(fan_in_count), 1.0 if cycle else 0.0, velocity['velocity_1h']
+
+def build_result(txn: Transaction, graph_risk, cycle_risk, ai_risk, velocity_1h) -> dict:
+    final_risk = max(graph_risk, cycle_risk, ai_risk)
+    is_fraud = bool(final_risk > FRAUD_THRESHOLD)
+    
+    return {
+        "txn_id": txn.txn_id,
+        "sender_id": txn.sender_id,
+        "receiver_id": txn.receiver_id,
+        "risk_score": float(final_risk),
+        "is_fraud": is_fraud,
+        "lat": txn.lat,
+        "lng": txn.lng,
+        "factors": {
+            "graph_risk": float(graph_risk),
+            "cycle_risk": float(cycle_risk),
+            "ai_risk": float(ai_risk),
+            "velocity_1h": int(velocity_1h)
+        }
+    }
+
+def blocked_result(txn: Transaction, side: str) -> dict:
+    """Decision for a transaction touching a frozen account (no state update or scoring)."""
+    BLOCKED.inc(side)
+    return {
+        "txn_id": txn.txn_id,
+        "sender_id": txn.sender_id,
+        "receiver_id": txn.receiver_id,
+        "risk_score": 1.0,
+        "is_fraud": True,
+        "lat": txn.lat,
+        "lng": txn.lng,
+        "blocked": side,
+        "factors": {
+            "graph_risk": 0.0,
+            "cycle_risk": 0.0,
+            "ai_risk": 0.0,
+            "velocity_1h": 0
+        }
+    }
+
+def parse_batch_body(body: bytes, content_type: str) -> list:
+    """Parses a JSON array or NDJSON body into Transactions."""
+    text = body.decode('utf-8').strip()
+    if 'ndjson' in content_type or not text.startswith('['):
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        records = json.loads(text)
+    return [Transaction(**record) for record in records]
 
 @app.post("/predict")
 async def predict(txn: Transaction):
-    global recent_transactions
-    
+    REQUESTS.inc('predict')
+    with STAGE_LATENCY.time('total'):
+        return await _predict(txn)
+
+async def _predict(txn: Transaction):
+    # 0. Frozen accounts are declined before any state, feature or model work
+    side = BLOCKLIST.match(txn.sender_id, txn.receiver_id)
+    if side is not None:
+        return blocked_result(txn, side)
+
     # Parse timestamp
     try:
-        current_time = datetime.fromisoformat(txn.timestamp)
-    except ValueError:
-        # Handle cases where timestamp might be just a date or different format
-        current_time = datetime.now()
+        current_time = parse_timestamp(txn.timestamp)
+    except ValueError as e:
+        ERRORS.inc('bad_request')
+        raise HTTPException(status_code=400, detail=f"Invalid timestamp: {e}")
 
     # 1. Update Graph & Check Graph Risk
-    update_graph(txn)
-    graph_risk = check_graph_risk(txn.receiver_id, current_time)
+    graph_risk, cycle_risk, velocity_1h = await apply_transaction_async(txn, current_time)
     
     # 2. AI Prediction
     ai_risk = 0.0
-    if model and model_columns:
+    model = ACTIVE_MODEL
+    if model is not None:
         # Feature Engineering for single row
-        # Velocity
-        velocity_1h = get_velocity_1h(txn.sender_id, current_time) + 1 # Include current
-        
-        # Update recent transactions for next time
-        recent_transactions.append(txn.dict())
-        # Keep list size manageable (optional optimization)
-        if len(recent_transactions) > 10000:
-            recent_transactions.pop(0)
-
-        # Prepare DataFrame
-        input_data = {
-            'amount': [txn.amount],
-            'amount_log': [np.log1p(txn.amount)],
-            'hour_of_day': [current_time.hour],
-            'velocity_1h': [velocity_1h],
-            'geo_cluster_id': [get_geo_cluster(txn.lat, txn.lng)],
-            'lat': [txn.lat],
-            'lng': [txn.lng]
-        }
+        with STAGE_LATENCY.time('features'):
+            row = build_feature_row(txn, current_time, velocity_1h, model)
         
-        df_input = pd.DataFrame(input_data)
-        
-        # Ensure columns match training
-        # Reorder columns to match model_columns
-        # Fill missing columns with 0 if any (shouldn't be for this set)
-        df_input = df_input.reindex(columns=model_columns, fill_value=0)
-        
-        # Predict
+        # Predict. Graph and velocity updates above already ran in arrival order;
+        # only inference is coalesced with concurrent requests.
         try:
-            # predict_proba returns [prob_class_0, prob_class_1]
-            ai_risk = model.predict_proba(df_input)[0][1]
+            with STAGE_LATENCY.time('inference'):
+                if BATCH_SCORING:
+                    ai_risk = await SCORER.submit((model, row))
+                else:
+                    ai_risk = (await score_rows_async([row], model))[0]
         except Exception as e:
+            ERRORS.inc('prediction')
             print(f"Prediction error: {e}")
             ai_risk = 0.0
+        else:
+            if SHADOW_MODEL is not None:
+                async def score_shadow(shadow):
+                    shadow_row = build_feature_row(txn, current_time, velocity_1h, shadow)
+                    if BATCH_SCORING:
+                        return [await SHADOW_SCORER.submit((shadow, shadow_row))]
+                    return await score_rows_async([shadow_row], shadow, 'shadow')
+                run_shadow(score_shadow, [ai_risk])
 
     # 3. Final Decision
-    final_risk = max(graph_risk, ai_risk)
-    is_fraud = bool(final_risk > 0.8)
-    
-    result = {
-        "txn_id": txn.txn_id,
-        "risk_score": float(final_risk),
-        "is_fraud": is_fraud,
-        "lat": txn.lat,
-        "lng": txn.lng,
-        "factors": {
-            "graph_risk": float(graph_risk),
-            "ai_risk": float(ai_risk)
-        }
-    }
+    result = build_result(txn, graph_risk, cycle_risk, ai_risk, velocity_1h)
     
     # 4. Alert Trigger
-    if is_fraud:
-        print(f"🚨 ALERT: High Risk Transaction detected! Score: {final_risk:.2f}")
-        await sio.emit('new_alert', result)
+    if result["is_fraud"]:
+        ALERTS.inc()
+        HOTSPOTS.add(txn.lat, txn.lng)
+        print(f"🚨 ALERT: High Risk Transaction detected! Score: {result['risk_score']:.2f}")
+        ALERT_BROADCASTER.publish(result)
         
     return result
 
-@app.get("/hotspots")
-async def get_hotspots():
-    # Return lat/lng of recent high risk transactions
-    # We can filter recent_transactions or keep a separate list of alerts
-    # For demo, let's return a random subset of high-risk nodes from graph if we tracked risk there
-    # Or just return static hotspots from the generated data for visualization
-    
-    # Let's read the historical data and return known fraud locations for the heatmap
-    # This is "God Mode" intelligence
-    if os.path.exists(DATA_PATH):
-        df = pd.read_csv(DATA_PATH)
-        fraud_df = df[df['is_fraud'] == 1]
-        # Return top 100 to avoid overwhelming map
-        hotspots = fraud_df[['lat', 'lng']].head(100).to_dict(orient='records')
-        return hotspots
-    return []
-
-async def simulation_task():
-    print("Starting simulation...")
-    if not os.path.exists(DATA_PATH):
-        print("Data not found.")
-        return
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Scores a JSON array or NDJSON body of transactions.
+    Transactions touching frozen accounts are declined up front; the rest have their state
+    updated in timestamp order, and features built column-wise and scored with a single
+    predict_proba call. Results are returned in request order.
+    """
+    REQUESTS.inc('predict_batch')
+    try:
+        txns = parse_batch_body(await request.body(), request.headers.get('content-type', ''))
+        times = [parse_timestamp(txn.timestamp) for txn in txns]
+    except (ValueError, TypeError, ValidationError) as e:
+        ERRORS.inc('bad_request')
+        raise HTTPException(status_code=400, detail=f"Invalid batch: {e}")
 
-    df = pd.read_csv(DATA_PATH)
-    # Sort by timestamp to simulate real-time flow? 
-    # Or just shuffle to make it interesting? 
-    # Let's shuffle to mix fraud and normal
-    df = df.sample(frac=1).reset_index(drop=True)
-    
-    print(f"Simulating {len(df)} transactions...")
-    
-    for index, row in df.iterrows():
-        txn_data = {
-            "txn_id": row['txn_id'],
-            "sender_id": row['sender_id'],
-            "receiver_id": row['receiver_id'],
-            "amount": row['amount'],
-            "timestamp": str(row['timestamp']),
-            "lat": row['lat'],
-            "lng": row['lng'],
-            "device_id": row['device_id']
-        }
-        
-        # Call predict logic internally
-        # We can't call the endpoint directly easily from within the app instance without httpx
-        # So we just invoke the logic or use a helper
-        # But `predict` is an async function, we can await it.
-        # We need to convert dict to Pydantic model
+    sides = [BLOCKLIST.match(txn.sender_id, txn.receiver_id) for txn in txns]
+    if not any(sides):
+        return await score_batch(txns, times)
+    results = [None if side is None else blocked_result(txn, side) for txn, side in zip(txns, sides)]
+    live = [i for i, side in enumerate(sides) if side is None]
+    for i, result in zip(live, await score_batch([txns[i] for i in live], [times[i] for i in live])):
+        results[i] = result
+    return results
+
+async def score_batch(txns, times) -> list:
+    """The /predict/batch pipeline for transactions that passed the blocklist."""
+    if not txns:
+        return []
+
+    n = len(txns)
+    graph_risk = np.zeros(n)
+    cycle_risk = np.zeros(n)
+    velocity_1h = np.zeros(n)
+
+    # 1. Graph & velocity updates in timestamp order (stable for equal times)
+    order = sorted(range(n), key=times.__getitem__)
+    if SHARDS is None:
+        applied = [apply_transaction(txns[i], times[i]) for i in order]
+    else:
+        # Pipelined: requests are queued in order, so each shard still applies them in timestamp order
+        applied = await asyncio.gather(*(apply_transaction_async(txns[i], times[i]) for i in order))
+    for i, (graph, cycle, velocity) in zip(order, applied):
+        graph_risk[i], cycle_risk[i], velocity_1h[i] = graph, cycle, velocity
+
+    # 2. AI Prediction over the whole batch
+    ai_risk = np.zeros(n)
+    model = ACTIVE_MODEL
+    if model is not None:
+        with STAGE_LATENCY.time('batch_features'):
+            X = build_feature_matrix(txns, times, velocity_1h, model)
         try:
-            txn_obj = Transaction(**txn_data)
-            await predict(txn_obj)
+            with STAGE_LATENCY.time('batch_inference'):
+                ai_risk = await score_rows_async(X, model)
         except Exception as e:
-            print(f"Simulation error: {e}")
-            
-        await asyncio.sleep(0.1) # Fast simulation (10 txn/sec)
+            ERRORS.inc('prediction')
+            print(f"Prediction error: {e}")
+        else:
+            if SHADOW_MODEL is not None:
+                async def score_shadow(shadow):
+                    X_shadow = build_feature_matrix(txns, times, velocity_1h, shadow)
+                    return await score_rows_async(X_shadow, shadow, 'shadow')
+                run_shadow(score_shadow, ai_risk)
+
+    # 3. Final Decision
+    results = [build_result(txns[i], graph_risk[i], cycle_risk[i], ai_risk[i], velocity_1h[i])
+               for i in range(n)]
+
+    # 4. Alert Trigger (coalesced into broadcaster frames)
+    alerts = [r for r in results if r["is_fraud"]]
+    for alert in alerts:
+        HOTSPOTS.add(alert["lat"], alert["lng"])
+    if alerts:
+        ALERTS.inc(amount=len(alerts))
+        print(f"🚨 ALERT: {len(alerts)} High Risk Transactions detected in batch of {n}!")
+        ALERT_BROADCASTER.publish_many(alerts)
+
+    return results
+
+@app.get("/hotspots")
+async def get_hotspots(min_lat: float = -90.0, min_lng: float = -180.0,
+                       max_lat: float = 90.0, max_lng: float = 180.0,
+                       zoom: int = 5, limit: int = HOTSPOT_LIMIT):
+    # Known fraud locations from the historical data plus live alerts, aggregated into
+    # grid cells for the requested viewport and zoom level.
+    # This is "God Mode" intelligence
+    mtime = HOTSPOTS.changed_mtime()
+    if mtime is not None:
+        # Only re-read when the file changes, and never on the event loop
+        cells = await asyncio.to_thread(HOTSPOTS.load_historical)
+        HOTSPOTS.set_historical(cells, mtime)
+    return HOTSPOTS.query(min_lat, min_lng, max_lat, max_lng, zoom, limit)
+
+# Historical replay / load generator driving predict()
+SIMULATION = ReplayEngine(predict)
+
+def load_replay_data(shuffle: bool, by_event_time: bool):
+    """
+    Loads the historical data as plain column lists for replay.
+    Returns (make_item, count, offsets) where offsets are seconds since the first row.
+    """
+    df = columnar.load_frame(COLUMNAR_DATA_PATH, DATA_PATH, REPLAY_COLUMNS)
+    times = df['timestamp']
+    if by_event_time:
+        # Event-time replay follows the real gaps between transactions
+        order = np.argsort(times.to_numpy(), kind='stable')
+    elif shuffle:
+        # Shuffle to mix fraud and normal
+        order = np.random.permutation(len(df))
+    else:
+        order = np.arange(len(df))
+    df = df.iloc[order]
+    epochs = times.iloc[order].to_numpy().astype('datetime64[ns]').astype(np.int64) / 1e9
+    offsets = epochs - epochs[0] if len(epochs) else epochs
+
+    columns = {col: df[col].tolist() for col in REPLAY_COLUMNS}
+    columns['timestamp'] = [str(t) for t in columns['timestamp']]
+
+    def make_item(i):
+        return Transaction(**{col: values[i] for col, values in columns.items()})
+    return make_item, len(df), offsets
 
 @app.post("/sim/start")
-async def start_simulation(background_tasks: BackgroundTasks):
-    background_tasks.add_task(simulation_task)
-    return {"message": "Simulation started in background."}
+async def start_simulation(mode: str = 'rate', rate: float = 10.0, speedup: float = 60.0,
+                           producers: int = 1, shuffle: bool = True):
+    """
+    Replays historical transactions through /predict.
+    mode: 'rate' (fixed txn/s), 'event_time' (timestamp gaps / speedup) or 'max'.
+    """
+    if SIMULATION.running:
+        raise HTTPException(status_code=409, detail="Simulation already running.")
+    if not columnar.exists(COLUMNAR_DATA_PATH) and not os.path.exists(DATA_PATH):
+        raise HTTPException(status_code=404, detail="Data not found.")
+
+    # Parse off the event loop; only column lists are kept
+    make_item, count, offsets = await asyncio.to_thread(load_replay_data, shuffle, mode == 'event_time')
+    try:
+        SIMULATION.start(make_item, count, mode=mode, rate=rate, speedup=speedup,
+                         producers=producers, offsets=offsets)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    print(f"Simulating {count} transactions ({mode})...")
+    return {"message": "Simulation started in background.", "transactions": count}
+
+@app.post("/sim/stop")
+async def stop_simulation():
+    SIMULATION.stop()
+    return {"message": "Simulation stopping."}
+
+@app.get("/sim/status")
+async def simulation_status():
+    return SIMULATION.report or SIMULATION.status()
 
 @app.post("/freeze/{account_id}")
 async def freeze_account(account_id: str):
     print(f"❄️ FREEZING ACCOUNT: {account_id}")
     # In a real system, this would call the bank API
+    try:
+        line = BLOCKLIST.freeze(account_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if line is not None:
+        NEIGHBORHOODS.invalidate(account_id)  # Cached /graph responses show frozen flags
+        await asyncio.to_thread(BLOCKLIST.append, line)
     return {"status": "success", "message": f"Account {account_id} frozen successfully."}
 
+@app.delete("/freeze/{account_id}")
+async def unfreeze_account(account_id: str):
+    line = BLOCKLIST.unfreeze(account_id)
+    if line is None:
+        raise HTTPException(status_code=404, detail=f"Account {account_id} is not frozen.")
+    print(f"Unfreezing account: {account_id}")
+    NEIGHBORHOODS.invalidate(account_id)
+    await asyncio.to_thread(BLOCKLIST.append, line)
+    return {"status": "success", "message": f"Account {account_id} unfrozen."}
+
+@app.get("/freeze/{account_id}")
+async def freeze_status(account_id: str):
+    """Whether the account is frozen, since when, and how many transactions it has had declined."""
+    return {
+        "account_id": account_id,
+        "frozen": account_id in BLOCKLIST,
+        "frozen_at": BLOCKLIST.frozen.get(account_id),
+        "hits": BLOCKLIST.hits.get(account_id, 0),
+    }
+
+WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_window(window: str) -> float:
+    """'900', '900s', '15m', '3h' or '1d' -> seconds."""
+    unit = WINDOW_UNITS.get(window[-1:].lower())
+    seconds = float(window[:-1] if unit else window) * (unit or 1)
+    if not (seconds > 0 and math.isfinite(seconds)):
+        raise ValueError(f"window must be positive and finite: {window!r}")
+    return seconds
+
+@app.get("/graph/{account_id}")
+async def get_neighborhood(account_id: str, hops: int = 2, window: str = None):
+    """
+    The account's k-hop transfer network (edges in either direction inside the time window,
+    measured back from the newest transfer seen). Nodes are {id, type, hop, frozen}; edges
+    are [source index, target index, ts, amount, txn_id] into the nodes list.
+    """
+    if SHARDS is not None:
+        raise HTTPException(status_code=501, detail="Graph queries are not available with state shards.")
+    if not 1 <= hops <= GRAPH_API_MAX_HOPS:
+        raise HTTPException(status_code=400, detail=f"hops must be between 1 and {GRAPH_API_MAX_HOPS}.")
+    try:
+        window_seconds = parse_window(window) if window else GRAPH_RETENTION_HOURS * 3600.0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid window: {e}")
+
+    key = (account_id, hops, window_seconds)
+    cached = NEIGHBORHOODS.get(key)
+    if cached is not None:
+        return cached
+    if account_id not in FRAUD_GRAPH:
+        raise HTTPException(status_code=404, detail=f"Account {account_id} has no transfers in the graph.")
+
+    as_of = GRAPH_RETENTION.watermark
+    # The walk yields to the event loop every GRAPH_API_WALK_CHUNK edges, so /predict keeps
+    # flowing; transfers applied meanwhile make it fuzzy and keep it out of the cache
+    token = NEIGHBORHOODS.begin()
+    walk = FRAUD_GRAPH.ego_walk(
+        account_id, hops, since=as_of - window_seconds if as_of is not None else None,
+        max_fanout=GRAPH_API_MAX_FANOUT, max_nodes=GRAPH_API_MAX_NODES, max_visits=GRAPH_API_MAX_VISITS,
+        chunk=GRAPH_API_WALK_CHUNK)
+    with STAGE_LATENCY.time('graph_walk'):
+        try:
+            while True:
+                next(walk)
+                await asyncio.sleep(0)
+        except StopIteration as done:
+            nodes, edges, truncated = done.value
+        except BaseException:
+            NEIGHBORHOODS.cancel(token)  # e.g. the request was cancelled mid-walk
+            raise
+    index = {node_id: i for i, (node_id, _, _) in enumerate(nodes)}
+    result = {
+        "account_id": account_id,
+        "hops": hops,
+        "window_seconds": window_seconds,
+        "as_of": datetime.fromtimestamp(as_of).isoformat() if as_of is not None else None,
+        "truncated": truncated,
+        "nodes": [{"id": node_id, "type": kind, "hop": hop, "frozen": node_id in BLOCKLIST}
+                  for node_id, kind, hop in nodes],
+        "edges": [[index[u], index[v], ts, amount, txn_id] for u, v, ts, amount, txn_id in edges],
+    }
+    NEIGHBORHOODS.put(key, result, index, token)
+    return result
+
+@app.get("/stats")
+async def get_stats():
+    if SHARDS is not None:
+        return {
+            "shards": await SHARDS.stats(),
+            "scoring": dict(SCORER.stats(), mode=SCORING_EXECUTOR.mode),
+            "event_loop_lag": LOOP_LAG.stats(),
+            "alerts": ALERT_BROADCASTER.stats(),
+            "blocklist": BLOCKLIST.stats(),
+        }
+    return {
+        "graph": GRAPH_RETENTION.stats(),
+        "velocity": {"senders": VELOCITY_STORE.num_senders, "events": len(VELOCITY_STORE)},
+        "fan_in": {"receivers": FAN_IN_INDEX.num_receivers, "events": len(FAN_IN_INDEX)},
+        "scoring": dict(SCORER.stats(), mode=SCORING_EXECUTOR.mode),
+        "event_loop_lag": LOOP_LAG.stats(),
+        "alerts": ALERT_BROADCASTER.stats(),
+        "blocklist": BLOCKLIST.stats(),
+        "neighborhood_cache": NEIGHBORHOODS.stats(),
+        "persistence": dict(PERSISTENCE_STATS, enabled=WAL.enabled, wal_seq=WAL.seq,
+                            wal_records=WAL.records, wal_pending=WAL.pending,
+                            wal_bytes_written=WAL.bytes_written),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of pipeline latency, counters and state gauges."""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/debug/profiler/start")
+async def start_profiler(interval_ms: float = 5.0):
+    # Samples the event loop thread (this handler runs on it)
+    try:
+        PROFILER.start(interval_ms, threading.get_ident())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "running", "interval_ms": interval_ms}
+
+@app.post("/debug/profiler/stop")
+async def stop_profiler():
+    PROFILER.stop()
+    return {"status": "stopped", "samples": PROFILER.total}
+
+@app.get("/debug/profiler", response_class=PlainTextResponse)
+async def get_profile(top: int = 50):
+    """Collapsed stacks (flame graph input) from the last or current profiling session."""
+    return PROFILER.collapsed(top)
+
+def admin_model_path(path: str) -> str:
+    """Rejects paths outside MODEL_DIR: loading a pickle runs arbitrary code."""
+    root = os.path.realpath(MODEL_DIR)
+    if os.path.commonpath([root, os.path.realpath(path)]) != root:
+        raise HTTPException(status_code=400, detail=f"Model files must be under {MODEL_DIR}.")
+    return path
+
+@app.get("/admin/model")
+async def model_status():
+    return {
+        "active": ACTIVE_MODEL.stats() if ACTIVE_MODEL is not None else None,
+        "shadow": SHADOW_MODEL.stats() if SHADOW_MODEL is not None else None,
+        "comparison": SHADOW_COMPARISON.stats() if SHADOW_MODEL is not None else None,
+        "reloading": MODEL_RELOAD_LOCK.locked(),
+    }
+
+@app.post("/admin/model/reload")
+async def reload_model_endpoint(shadow: bool = False, model_path: str = None, columns_path: str = None,
+                                geo_clusters_path: str = None):
+    """
+    Loads and warms up a model without pausing traffic, then swaps it in (or, with shadow=true,
+    scores live traffic with it alongside the active model until promoted). The model's geo
+    clusters default to <model>_geo_clusters.pkl (geo_clusters.pkl for the default model).
+    """
+    if MODEL_RELOAD_LOCK.locked():
+        raise HTTPException(status_code=409, detail="A model reload is already in progress.")
+    model_path = admin_model_path(model_path or MODEL_PATH)
+    columns_path = admin_model_path(columns_path or COLUMNS_PATH)
+    if geo_clusters_path is not None:
+        geo_clusters_path = admin_model_path(geo_clusters_path)
+    try:
+        await reload_model(model_path, columns_path, 'shadow' if shadow else 'active', geo_clusters_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        ERRORS.inc('model_reload')
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {e}")
+    return await model_status()
+
+@app.post("/admin/model/promote")
+async def promote_shadow():
+    """Makes the shadow model (with the geo clusters it was loaded with) the active one."""
+    global ACTIVE_MODEL, SHADOW_MODEL, SHADOW_COMPARISON
+    if SHADOW_MODEL is None:
+        raise HTTPException(status_code=404, detail="No shadow model loaded.")
+    comparison = SHADOW_COMPARISON.stats()
+    ACTIVE_MODEL, SHADOW_MODEL, SHADOW_COMPARISON = SHADOW_MODEL, None, None
+    print(f"Shadow model promoted ({ACTIVE_MODEL.model_path}).")
+    return {"active": ACTIVE_MODEL.stats(), "comparison": comparison}
+
+@app.delete("/admin/model/shadow")
+async def drop_shadow():
+    global SHADOW_MODEL, SHADOW_COMPARISON
+    if SHADOW_MODEL is None:
+        raise HTTPException(status_code=404, detail="No shadow model loaded.")
+    comparison = SHADOW_COMPARISON.stats()
+    SHADOW_MODEL, SHADOW_COMPARISON = None, None
+    return {"comparison": comparison}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the model is loaded and warmed up, then the startup breakdown."""
+    if not READY:
+        raise HTTPException(status_code=503, detail="Starting up.")
+    return {
+        "ready": True,
+        "model": ACTIVE_MODEL.kind if ACTIVE_MODEL is not None else None,
+        "startup_seconds": STARTUP_TIMINGS,
+    }
+
 @app.get("/")
 async def root():
     return {"message": "KAVACH_TITANIUM Backend is running."}
 
+IMPORT_DONE = time.perf_counter()
+
 # To run: uvicorn backend.main:socket_app --reload
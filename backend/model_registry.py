@@ -0,0 +1,199 @@
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from backend.compiled_forest import CompiledForest, artifact_mtime, check_parity, probe_rows
+from backend.geo_index import GeoClusterIndex
+
+# joblib, pandas and sklearn are imported only when a pickle has to be read or compiled
+
+
+def load_pickle(path):
+    import joblib
+    return joblib.load(path)
+
+
+def compiled_path_for(model_path):
+    """Where the compiled form of a model pickle lives (fraud_model.pkl -> fraud_model_compiled)."""
+    return os.path.splitext(model_path)[0] + '_compiled'
+
+
+def geo_clusters_path_for(model_path):
+    """Where the DBSCAN clusters trained with a model live (candidate.pkl -> candidate_geo_clusters.pkl)."""
+    return os.path.splitext(model_path)[0] + '_geo_clusters.pkl'
+
+
+def load_geo_index(path):
+    """GeoClusterIndex over the clusters saved with a model, or None if the file doesn't exist."""
+    if not path or not os.path.exists(path):
+        return None
+    return GeoClusterIndex.from_artifact(load_pickle(path))
+
+
+class LoadedModel:
+    """
+    One model version as served: a memory-mapped CompiledForest or the sklearn model, plus
+    its feature columns and the geo clusters it was trained on. Requests hold on to the instance
+    they started with, so swapping the active model never mixes one model's columns or cluster
+    labels with another's scores.
+    Also accumulates the model's own scoring cost (time spent scoring, excluding queueing).
+    """
+
+    def __init__(self, columns, compiled=None, sklearn_model=None, model_path=None, columns_path=None,
+                 compiled_path=None, geo_index=None, geo_clusters_path=None):
+        self.columns = list(columns)
+        self.compiled = compiled
+        self.sklearn_model = sklearn_model
+        self.model_path = model_path
+        self.columns_path = columns_path
+        self.compiled_path = compiled_path if compiled is not None else None
+        self.geo_index = geo_index
+        self.geo_clusters_path = geo_clusters_path if geo_index is not None else None
+        self.version = os.path.getmtime(model_path) if model_path and os.path.exists(model_path) else None
+        self.loaded_at = time.time()
+        self.batches = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    @property
+    def kind(self):
+        return "compiled-mmap" if self.compiled is not None else "sklearn"
+
+    @property
+    def spec(self):
+        """Hashable description process-pool workers load the same model from (see from_spec)."""
+        return (self.compiled_path, self.model_path, self.columns_path, self.version)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Loads exactly what spec describes, without compiling (the parent already did)."""
+        compiled_path, model_path, columns_path, _ = spec
+        if compiled_path:
+            compiled = CompiledForest.load(compiled_path)
+            return cls(compiled.columns or load_pickle(columns_path), compiled=compiled, model_path=model_path,
+                       columns_path=columns_path, compiled_path=compiled_path)
+        return cls(load_pickle(columns_path), sklearn_model=load_pickle(model_path), model_path=model_path,
+                   columns_path=columns_path)
+
+    def geo_clusters(self, lats, lngs):
+        """geo_cluster_id for each point, from this model's training clusters (0 without them)."""
+        if self.geo_index is None:
+            return np.zeros(len(lats))
+        return self.geo_index.lookup_many(lats, lngs)
+
+    def geo_cluster(self, lat, lng):
+        if self.geo_index is None:
+            return 0
+        return self.geo_index.lookup(lat, lng)
+
+    def score(self, rows):
+        """P(fraud) for each feature row (ordered as self.columns)."""
+        if self.compiled is not None:
+            return self.compiled.predict_proba(rows)
+        import pandas as pd
+        df_input = pd.DataFrame(rows, columns=self.columns)
+        # predict_proba returns [prob_class_0, prob_class_1]
+        return self.sklearn_model.predict_proba(df_input)[:, 1]
+
+    def record(self, rows, seconds):
+        self.batches += 1
+        self.rows += rows
+        self.seconds += seconds
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "model_path": self.model_path,
+            "geo_clusters_path": self.geo_clusters_path,
+            "version": datetime.fromtimestamp(self.version).isoformat() if self.version else None,
+            "loaded_at": datetime.fromtimestamp(self.loaded_at).isoformat(),
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_ms": (self.seconds / self.batches * 1000) if self.batches else 0.0,
+            "mean_row_us": (self.seconds / self.rows * 1e6) if self.rows else 0.0,
+        }
+
+
+def load_compiled(model_path, columns_path, compiled_path):
+    """Memory-maps the flattened forest, compiling (and parity-checking) it if missing or stale."""
+    try:
+        mtime = artifact_mtime(compiled_path)
+        if mtime is not None and mtime >= os.path.getmtime(model_path):
+            return CompiledForest.load(compiled_path)
+
+        import pandas as pd
+        print("Compiling model to flat arrays...")
+        sklearn_model = load_pickle(model_path)
+        columns = load_pickle(columns_path)
+        compiled = CompiledForest.from_sklearn(sklearn_model)
+        compiled.columns = list(columns)
+        probe = pd.DataFrame(probe_rows(compiled, len(columns)), columns=columns)
+        diff = check_parity(sklearn_model, compiled, probe)
+        compiled.save(compiled_path)
+        print(f"Compiled {compiled.n_trees} trees (max parity diff {diff:.3g}).")
+        return CompiledForest.load(compiled_path)
+    except Exception as e:
+        print(f"Model compile failed, falling back to sklearn: {e}")
+        return None
+
+
+def load_model(model_path, columns_path, compiled_path=None, geo_clusters_path=None):
+    """
+    Loads a model. A compiled forest newer than the pickle is memory-mapped directly, so the
+    sklearn forest is only unpickled to (re)build it or when compiling fails.
+    compiled_path=None always serves the sklearn model. The geo clusters saved with the model
+    are loaded from geo_clusters_path when it exists. Returns a LoadedModel, or None if the
+    model files don't exist.
+    """
+    if not (os.path.exists(model_path) and os.path.exists(columns_path)):
+        return None
+    geo_index = load_geo_index(geo_clusters_path)
+    compiled = load_compiled(model_path, columns_path, compiled_path) if compiled_path else None
+    if compiled is not None:
+        return LoadedModel(compiled.columns or load_pickle(columns_path), compiled=compiled, model_path=model_path,
+                           columns_path=columns_path, compiled_path=compiled_path, geo_index=geo_index,
+                           geo_clusters_path=geo_clusters_path)
+    return LoadedModel(load_pickle(columns_path), sklearn_model=load_pickle(model_path), model_path=model_path,
+                       columns_path=columns_path, geo_index=geo_index, geo_clusters_path=geo_clusters_path)
+
+
+class ShadowComparison:
+    """Running comparison of a shadow model's scores with the active model's on the same traffic."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.count = 0
+        self.abs_diff_total = 0.0
+        self.max_abs_diff = 0.0
+        self.active_flags = 0
+        self.shadow_flags = 0
+        self.disagreements = 0
+        self.errors = 0
+
+    def add(self, active, shadow):
+        """Records scores for the same transactions from both models."""
+        active = np.asarray(active, dtype=np.float64)
+        shadow = np.asarray(shadow, dtype=np.float64)
+        diff = np.abs(active - shadow)
+        active_flag = active > self.threshold
+        shadow_flag = shadow > self.threshold
+        self.count += len(diff)
+        self.abs_diff_total += float(diff.sum())
+        self.max_abs_diff = max(self.max_abs_diff, float(diff.max()) if len(diff) else 0.0)
+        self.active_flags += int(active_flag.sum())
+        self.shadow_flags += int(shadow_flag.sum())
+        self.disagreements += int((active_flag != shadow_flag).sum())
+
+    def stats(self):
+        return {
+            "compared": self.count,
+            "mean_abs_diff": (self.abs_diff_total / self.count) if self.count else 0.0,
+            "max_abs_diff": self.max_abs_diff,
+            "active_flagged": self.active_flags,
+            "shadow_flagged": self.shadow_flags,
+            "decision_disagreements": self.disagreements,
+            "disagreement_rate": (self.disagreements / self.count) if self.count else 0.0,
+            "errors": self.errors,
+        }
@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+
+
+class NeighborhoodCache:
+    """
+    LRU cache of /graph responses. Every entry is indexed by the accounts it contains, so
+    a transfer touching any of them drops it (invalidate()); entries also expire after
+    `ttl` seconds, which covers retention evictions and the time window moving on.
+    A value built across awaits takes a begin() token first, and put() discards it if one
+    of its accounts was invalidated in the meantime.
+    """
+
+    def __init__(self, maxsize=256, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, accounts)
+        self._by_account = {}          # account -> keys of entries containing it
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._building = {}            # begin() token -> accounts invalidated since (None = all stale)
+        self._tokens = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def begin(self):
+        """Starts recording invalidations for a value about to be built. Returns a token for put() or cancel()."""
+        self._tokens += 1
+        self._building[self._tokens] = set()
+        return self._tokens
+
+    def cancel(self, token):
+        self._building.pop(token, None)
+
+    def put(self, key, value, accounts, token=None):
+        accounts = tuple(accounts)
+        if token is not None:
+            touched = self._building.pop(token, None)
+            if touched is None or not touched.isdisjoint(accounts):
+                return  # Stale before it was finished
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, accounts)
+        for account_id in accounts:
+            self._by_account.setdefault(account_id, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, account_id):
+        """Drops every entry containing the account. O(1) when none does and nothing is being built."""
+        for touched in self._building.values():
+            if touched is not None:
+                touched.add(account_id)
+        keys = self._by_account.get(account_id)
+        if keys:
+            for key in list(keys):
+                self._remove(key)
+                self.invalidations += 1
+
+    def _remove(self, key):
+        _, _, accounts = self._entries.pop(key)
+        for account_id in accounts:
+            keys = self._by_account.get(account_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_account[account_id]
+
+    def clear(self):
+        self._entries.clear()
+        self._by_account.clear()
+        for token in self._building:
+            self._building[token] = None  # Everything in flight is stale
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,257 @@
+import asyncio
+import glob
+import os
+import struct
+import time
+
+import numpy as np
+
+from backend.graph_store import NODE_TYPES
+
+# WAL record: seq, epoch ts, amount and the byte lengths of four UTF-8 strings
+# (sender, receiver, txn_id, original timestamp), followed by the strings themselves.
+_RECORD = struct.Struct('<QddIIII')
+WAL_GLOB = 'wal-*.log'
+# Graph / velocity entries copied per event-loop slice while taking a snapshot
+SNAPSHOT_CHUNK = 1000
+
+
+class WriteAheadLog:
+    """
+    Append-only log of transactions applied since the last snapshot.
+    append() only encodes into an in-memory buffer on the event loop; flush() hands the
+    buffer to a worker thread for the write (and fsync), so records are group-committed
+    every flush interval and disk latency never lands on the loop.
+    Segments are named after their first sequence number. rotate() starts a new segment,
+    so segments fully covered by a snapshot can be deleted.
+    """
+
+    def __init__(self, directory, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        self.seq = 0          # Last sequence number handed out
+        self.records = 0      # Records appended since the last rotate()
+        self.bytes_written = 0
+        self.enabled = False  # Nothing is logged until open() (i.e. after recovery)
+        self._segment = None
+        self._pending = []
+        self._lock = asyncio.Lock()
+
+    def _segment_path(self, first_seq):
+        return os.path.join(self.directory, f'wal-{first_seq:020d}.log')
+
+    def open(self, seq):
+        """Starts logging into a new segment; seq is the last sequence number already applied."""
+        os.makedirs(self.directory, exist_ok=True)
+        self.seq = seq
+        self._segment = self._segment_path(seq + 1)
+        self.enabled = True
+
+    def close(self):
+        self.enabled = False
+
+    def append(self, sender, receiver, txn_id, timestamp, ts, amount):
+        """Buffers one applied transaction. Returns its sequence number (None while disabled)."""
+        if not self.enabled:
+            return None
+        self.seq += 1
+        s, r, t, stamp = sender.encode(), receiver.encode(), txn_id.encode(), timestamp.encode()
+        self._pending.append(_RECORD.pack(self.seq, ts, amount, len(s), len(r), len(t), len(stamp)) + s + r + t + stamp)
+        self.records += 1
+        return self.seq
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    async def flush(self):
+        """Writes buffered records off the event loop."""
+        async with self._lock:
+            if not self._pending:
+                return
+            data, self._pending = b''.join(self._pending), []
+            await asyncio.to_thread(self._write, self._segment, data)
+
+    async def rotate(self):
+        """
+        Flushes into the current segment and starts a new one.
+        Returns the last sequence number of the old segments.
+        """
+        async with self._lock:
+            data, self._pending = b''.join(self._pending), []
+            segment, seq = self._segment, self.seq
+            self._segment = self._segment_path(seq + 1)
+            self.records = 0
+            if data:
+                await asyncio.to_thread(self._write, segment, data)
+        return seq
+
+    def _write(self, path, data):
+        with open(path, 'ab') as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.bytes_written += len(data)
+
+    def segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, WAL_GLOB)))
+
+    def drop_segments(self, upto_seq):
+        """Deletes segments whose records all have seq <= upto_seq (i.e. are in a snapshot)."""
+        for path in self.segments():
+            first = int(os.path.basename(path)[4:-4])
+            if first <= upto_seq and path != self._segment:
+                os.remove(path)
+
+    def read(self, after_seq=0):
+        """
+        Yields (seq, sender, receiver, txn_id, timestamp, ts, amount) for logged records with
+        seq > after_seq, in order. A torn record at the end of a segment (crash mid-write) ends it.
+        """
+        for path in self.segments():
+            with open(path, 'rb') as f:
+                data = f.read()
+            pos = 0
+            while pos + _RECORD.size <= len(data):
+                seq, ts, amount, ls, lr, lt, lm = _RECORD.unpack_from(data, pos)
+                end = pos + _RECORD.size + ls + lr + lt + lm
+                if end > len(data):
+                    break
+                if seq > after_seq:
+                    p = pos + _RECORD.size
+                    sender = data[p:p + ls].decode()
+                    receiver = data[p + ls:p + ls + lr].decode()
+                    txn_id = data[p + ls + lr:p + ls + lr + lt].decode()
+                    timestamp = data[end - lm:end].decode()
+                    yield seq, sender, receiver, txn_id, timestamp, ts, amount
+                pos = end
+
+
+def _pack_strings(strings):
+    encoded = [s.encode() for s in strings]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), lengths
+
+
+def _unpack_strings(blob, lengths):
+    data = blob.tobytes()
+    ends = np.cumsum(lengths).tolist()
+    starts = [0] + ends[:-1]
+    return [data[s:e].decode() for s, e in zip(starts, ends)]
+
+
+async def capture(graph, velocity, fan_in, current_seq, chunk=SNAPSHOT_CHUNK):
+    """
+    Copies the detection state in chunks, yielding to the event loop between them.
+    The copy is fuzzy: transactions applied meanwhile may or may not be in it. Graph edges
+    are last-write-wins, so replaying the WAL from the snapshot's start seq fixes them up;
+    window counters are not idempotent, so each key records the seq it was copied at and
+    recovery only replays newer records into it.
+    """
+    nodes, node_types = [], []
+    for start in range(0, graph.node_capacity, chunk):
+        for u, kind in graph.nodes(start, start + chunk):
+            nodes.append(u)
+            node_types.append(kind)
+        await asyncio.sleep(0)
+    edges = {'src': [], 'dst': [], 'ts': [], 'amount': [], 'txn_id': []}
+    for start in range(0, graph.edge_capacity, chunk):
+        for u, v, ts, amount, txn_id in graph.edges(start, start + chunk):
+            edges['src'].append(u)
+            edges['dst'].append(v)
+            edges['ts'].append(ts)
+            edges['amount'].append(amount)
+            edges['txn_id'].append(txn_id)
+        await asyncio.sleep(0)
+
+    windows = {}
+    for name, store in (('velocity', velocity), ('fan_in', fan_in)):
+        keys, counts, times, seqs = [], [], [], []
+        key_list = store.keys()
+        for i in range(0, len(key_list), chunk):
+            seq = current_seq()
+            for key in key_list[i:i + chunk]:
+                key_times = store.times(key)
+                if key_times:
+                    keys.append(key)
+                    counts.append(len(key_times))
+                    times.extend(key_times)
+                    seqs.append(seq)
+            await asyncio.sleep(0)
+        windows[name] = {'keys': keys, 'counts': counts, 'times': times, 'seqs': seqs}
+    return {'nodes': nodes, 'node_types': node_types, 'edges': edges, 'windows': windows}
+
+
+def write_snapshot(path, start_seq, state):
+    """
+    Encodes a captured state into one uncompressed .npz (account IDs interned to int32 codes)
+    and publishes it atomically. Runs in a worker thread. Returns the file size in bytes.
+    """
+    codes = {}
+    intern = codes.setdefault
+    arrays = {
+        'start_seq': np.int64(start_seq),
+        'created': np.float64(time.time()),
+        'nodes': np.fromiter((intern(u, len(codes)) for u in state['nodes']), dtype=np.int32),
+        'node_types': np.fromiter((NODE_TYPES.index(t) if t in NODE_TYPES else 0 for t in state['node_types']),
+                                  dtype=np.int8),
+    }
+    edges = state['edges']
+    arrays['edge_src'] = np.fromiter((intern(u, len(codes)) for u in edges['src']), dtype=np.int32)
+    arrays['edge_dst'] = np.fromiter((intern(v, len(codes)) for v in edges['dst']), dtype=np.int32)
+    arrays['edge_ts'] = np.asarray(edges['ts'], dtype=np.float64)
+    arrays['edge_amount'] = np.asarray(edges['amount'], dtype=np.float64)
+    arrays['edge_txn_id'], arrays['edge_txn_id_len'] = _pack_strings(edges['txn_id'])
+    for name, window in state['windows'].items():
+        arrays[f'{name}_keys'] = np.fromiter((intern(k, len(codes)) for k in window['keys']), dtype=np.int32)
+        arrays[f'{name}_counts'] = np.asarray(window['counts'], dtype=np.int64)
+        arrays[f'{name}_times'] = np.asarray(window['times'], dtype=np.float64)
+        arrays[f'{name}_seqs'] = np.asarray(window['seqs'], dtype=np.int64)
+    arrays['accounts'], arrays['accounts_len'] = _pack_strings(codes)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+class Snapshot:
+    """Decoded snapshot. Iterate nodes(), edges() and window(name) to restore state."""
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self._arrays = {name: data[name] for name in data.files}
+        self.start_seq = int(self._arrays['start_seq'])
+        self.created = float(self._arrays['created'])
+        self.accounts = _unpack_strings(self._arrays['accounts'], self._arrays['accounts_len'])
+
+    @property
+    def num_edges(self):
+        return len(self._arrays['edge_src'])
+
+    def nodes(self):
+        accounts = self.accounts
+        for code, kind in zip(self._arrays['nodes'].tolist(), self._arrays['node_types'].tolist()):
+            yield accounts[code], NODE_TYPES[kind]
+
+    def edges(self):
+        """Yields (sender, receiver, amount, ts, txn_id)."""
+        a, accounts = self._arrays, self.accounts
+        txn_ids = _unpack_strings(a['edge_txn_id'], a['edge_txn_id_len'])
+        for src, dst, amount, ts, txn_id in zip(a['edge_src'].tolist(), a['edge_dst'].tolist(),
+                                                a['edge_amount'].tolist(), a['edge_ts'].tolist(), txn_ids):
+            yield accounts[src], accounts[dst], amount, ts, txn_id
+
+    def window(self, name):
+        """Yields (key, sorted times, seq copied at) for the 'velocity' or 'fan_in' store."""
+        a, accounts = self._arrays, self.accounts
+        times = a[f'{name}_times'].tolist()
+        pos = 0
+        for code, count, seq in zip(a[f'{name}_keys'].tolist(), a[f'{name}_counts'].tolist(),
+                                    a[f'{name}_seqs'].tolist()):
+            yield accounts[code], times[pos:pos + count], seq
+            pos += count
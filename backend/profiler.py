@@ -0,0 +1,65 @@
+import sys
+import threading
+from collections import Counter
+
+# Sampling interval bounds: shorter intervals make the sampler thread hog the GIL
+MIN_INTERVAL_MS = 1.0
+MAX_INTERVAL_MS = 1000.0
+
+
+class SamplingProfiler:
+    """
+    Low-overhead sampling profiler for one thread (normally the event loop).
+    A daemon thread snapshots the target thread's stack every interval and counts
+    collapsed stacks ("module:func;module:func ..."), the input format of flame graph tools.
+    Can be started and stopped at runtime.
+    """
+
+    def __init__(self, max_depth=48):
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.total = 0
+        self.interval = 0.005
+        self._thread = None
+        self._stop = threading.Event()
+        self._target = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=5.0, thread_id=None):
+        if not MIN_INTERVAL_MS <= interval_ms <= MAX_INTERVAL_MS:
+            raise ValueError(f"interval_ms must be between {MIN_INTERVAL_MS:g} and {MAX_INTERVAL_MS:g}")
+        if self.running:
+            return
+        self.samples.clear()
+        self.total = 0
+        self.interval = interval_ms / 1000.0
+        self._target = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+            self.total += 1
+
+    def collapsed(self, top=None):
+        """Collapsed stacks with sample counts, most frequent first."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common(top)) + "\n"
@@ -0,0 +1,164 @@
+import heapq
+import math
+import time
+from array import array
+
+# Heap entries pack (whole seconds, rounded up) << SLOT_BITS | edge slot into one int,
+# a fraction of the memory of a (ts, u, v) tuple per edge
+SLOT_BITS = 32
+SLOT_MASK = (1 << SLOT_BITS) - 1
+UNTRACKED = -1
+
+
+class GraphRetention:
+    """
+    TTL and size-cap eviction for a TransferGraph.
+    Edge slots are tracked in a min-heap by time, so each eviction costs O(log n). Work is done
+    in small bounded steps (see step()) so it can be amortized across inserts or run from
+    a background task without latency spikes. Times are kept at one-second resolution,
+    rounded up, so an edge may outlive the horizon by up to a second but never expires early.
+    Each slot keeps a single heap entry: overwriting an edge with a newer time pushes nothing,
+    and the entry is re-pushed at the edge's current time when it reaches the top. The heap
+    therefore tracks the live edges, not the transfers written inside the horizon.
+    With max_skew set, the watermark never moves past the clock plus max_skew seconds, so a
+    single far-future transfer cannot expire the whole graph and every transfer after it.
+    """
+
+    def __init__(self, graph, horizon_seconds, max_edges=None, max_nodes=None, step_budget=16,
+                 max_skew=None, clock=time.time):
+        self.graph = graph
+        self.horizon = horizon_seconds
+        self.max_edges = max_edges
+        self.max_nodes = max_nodes
+        self.step_budget = step_budget
+        self.max_skew = max_skew
+        self.clock = clock
+        self._heap = []  # Packed (ts, slot); stale only after out-of-order overwrites or outside removals
+        self._due = array('q')  # slot -> time of its heap entry, or UNTRACKED
+        self._watermark = None
+        self.expired_edges = 0
+        self.capped_edges = 0
+        self.evicted_nodes = 0
+
+    def track(self, slot, ts):
+        """Registers the (possibly overwritten) edge in `slot`, written at epoch time ts."""
+        if self._push(slot, math.ceil(ts)):
+            heapq.heappush(self._heap, self._due[slot] << SLOT_BITS | slot)
+        if self._watermark is None or ts > self._watermark:
+            self._advance(ts)
+
+    def track_many(self, entries):
+        """Registers many (ts, slot) edges at once, e.g. when a graph is restored."""
+        newest = self._watermark
+        heap = self._heap
+        for ts, slot in entries:
+            if self._push(slot, math.ceil(ts)):
+                heap.append(self._due[slot] << SLOT_BITS | slot)
+            if newest is None or ts > newest:
+                newest = ts
+        heapq.heapify(heap)
+        if newest is not None:
+            self._advance(newest)
+
+    def _advance(self, ts):
+        """Moves the watermark up to ts, but never past the clock plus max_skew."""
+        if self.max_skew is not None:
+            ts = min(ts, self.clock() + self.max_skew)
+        if self._watermark is None or ts > self._watermark:
+            self._watermark = ts
+
+    def _push(self, slot, due):
+        """Whether the slot needs a new heap entry at `due` (recording it if so)."""
+        dues = self._due
+        if slot < len(dues):
+            current = dues[slot]
+            # A later write is caught when the existing, earlier entry surfaces; only an
+            # out-of-order (older) write needs its own entry, which makes the old one stale
+            if current != UNTRACKED and current <= due:
+                return False
+            dues[slot] = due
+        else:
+            while len(dues) < slot:
+                dues.append(UNTRACKED)
+            dues.append(due)
+        return True
+
+    def _over_cap(self):
+        if self.max_edges is not None and self.graph.number_of_edges() > self.max_edges:
+            return True
+        if self.max_nodes is not None and self.graph.number_of_nodes() > self.max_nodes:
+            return True
+        return False
+
+    def step(self, budget=None):
+        """
+        Evicts at most `budget` heap entries: edges older than the horizon first,
+        then the oldest edges while the graph is over its size cap.
+        Returns the number of edges removed.
+        """
+        if self._watermark is None:
+            return 0
+        budget = self.step_budget if budget is None else budget
+        cutoff = self._watermark - self.horizon
+        removed = 0
+        heap, dues = self._heap, self._due
+        graph = self.graph
+        while budget > 0 and heap:
+            ts = heap[0] >> SLOT_BITS
+            expired = ts < cutoff
+            if not expired and not self._over_cap():
+                break
+            slot = heapq.heappop(heap) & SLOT_MASK
+            budget -= 1
+            if dues[slot] != ts:
+                continue  # Superseded by an earlier entry for the slot
+            if slot >= graph.edge_capacity or not graph.edge_live(slot):
+                dues[slot] = UNTRACKED  # Removed outside retention
+                continue
+            current = math.ceil(graph.edge_ts(slot))
+            if current > ts:
+                # Overwritten by a newer transfer: requeue at its time
+                dues[slot] = current
+                heapq.heappush(heap, current << SLOT_BITS | slot)
+                continue
+            dues[slot] = UNTRACKED
+            self.evicted_nodes += graph.remove_edge_at(slot)
+            removed += 1
+            if expired:
+                self.expired_edges += 1
+            else:
+                self.capped_edges += 1
+        return removed
+
+    @property
+    def watermark(self):
+        """Newest edge time seen, bounded by max_skew (the graph's notion of 'now'), or None before any edge."""
+        return self._watermark
+
+    @property
+    def due(self):
+        """Whether step() has work: the oldest entry is past the horizon or the graph is over its cap."""
+        if not self._heap or self._watermark is None:
+            return False
+        return (self._heap[0] >> SLOT_BITS) < self._watermark - self.horizon or self._over_cap()
+
+    @property
+    def backlog(self):
+        """Number of tracked entries still pending (includes stale ones)."""
+        return len(self._heap)
+
+    def clear(self):
+        self._heap.clear()
+        del self._due[:]
+        self._watermark = None
+
+    def stats(self):
+        return {
+            "nodes": self.graph.number_of_nodes(),
+            "edges": self.graph.number_of_edges(),
+            "column_bytes": self.graph.nbytes(),
+            "expired_edges": self.expired_edges,
+            "capped_edges": self.capped_edges,
+            "evicted_nodes": self.evicted_nodes,
+            "pending": self.backlog,
+        }
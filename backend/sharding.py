@@ -0,0 +1,397 @@
+"""
+Partitioned detection state.
+
+Graph, velocity and fan-in state is split across shard processes by a stable hash of the
+account ID, so any number of web workers can score traffic against the same state:
+  * velocity lives on the sender's shard, fan-in on the receiver's shard;
+  * an edge u->v is stored on the shards of both u and v, so each shard has complete
+    successors and predecessors for the accounts it owns;
+  * cycle detection runs the bounded BFS from cycles.py in the web worker, fetching each
+    frontier's adjacency from the owning shards.
+Web workers talk to shards over Unix domain sockets with pipelined, length-prefixed
+pickle frames; each shard is a single-threaded event loop, so it applies the requests
+it receives in order. Shard 0 also keeps the alert log that lets every worker deliver
+every worker's alerts to its own dashboards (Socket.IO is WebSocket-only, so a dashboard
+stays on one worker without sticky sessions).
+
+Run the shards, then point the web workers at them:
+    python -m backend.sharding --shards 4
+    KAVACH_STATE_SHARDS=4 uvicorn backend.main:socket_app --workers 4
+or both in one command:
+    python -m backend.sharding --shards 4 --web-workers 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import pickle
+import struct
+import subprocess
+import sys
+import zlib
+
+from backend.cycles import cycle_search, recent_neighbours
+from backend.alerts import AlertLog
+from backend.fan_in import FanInIndex
+from backend.graph_store import TransferGraph
+from backend.retention import GraphRetention
+from backend.velocity import VelocityStore
+
+SOCKET_DIR = 'backend/state/shards'
+RETENTION_INTERVAL = 1.0  # seconds between background eviction passes on a shard
+_FRAME = struct.Struct('<I')
+
+
+def shard_of(account_id, shards):
+    """Shard owning an account. crc32 rather than hash(), which differs between processes."""
+    return zlib.crc32(account_id.encode()) % shards
+
+
+def socket_path(directory, index):
+    return os.path.join(directory, f'shard-{index}.sock')
+
+
+def _frame(message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    return _FRAME.pack(len(data)) + data
+
+
+class _Frames:
+    """Reassembles length-prefixed frames from a byte stream."""
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        messages, pos = [], 0
+        while len(buf) - pos >= _FRAME.size:
+            (size,) = _FRAME.unpack_from(buf, pos)
+            if len(buf) - pos - _FRAME.size < size:
+                break
+            start = pos + _FRAME.size
+            messages.append(pickle.loads(buf[start:start + size]))
+            pos = start + size
+        del buf[:pos]
+        return messages
+
+
+class ShardState:
+    """Detection state for the accounts owned by one shard."""
+
+    def __init__(self, index, shards, config):
+        self.index = index
+        self.shards = shards
+        self.config = config
+        self.graph = TransferGraph()
+        self.retention = GraphRetention(self.graph, config['retention_seconds'],
+                                        max_edges=config['max_edges'], max_nodes=config['max_nodes'],
+                                        step_budget=config['step_budget'], max_skew=config['max_skew'])
+        self.velocity = VelocityStore(config['velocity_windows'], max_skew=config['max_skew'])
+        self.fan_in = FanInIndex(config['fan_in_window'], max_skew=config['max_skew'])
+        self.alerts = AlertLog(config['alert_log_size'])  # Used on shard 0 (see ShardRouter.exchange_alerts)
+
+    def apply(self, sender_id, receiver_id, amount, timestamp, ts, txn_id, as_sender, as_receiver):
+        """
+        Applies a transfer touching an owned account. Returns (velocity counts, fan-in count),
+        each None unless this shard owns that side.
+        """
+        graph = self.graph
+        graph.add_node(sender_id, type='sender')
+        graph.add_node(receiver_id, type='receiver')
+        self.retention.track(graph.add_edge(sender_id, receiver_id, ts, amount, txn_id), ts)
+        fan_in = self.fan_in.add(receiver_id, ts) if as_receiver else None
+        self.retention.step()
+        velocity = self.velocity.observe(sender_id, ts) if as_sender else None
+        return velocity, fan_in
+
+    def adjacency(self, side, nodes, max_fanout, start_ts):
+        """Newest max_fanout in-window (neighbour, ts) pairs of each node's successors or predecessors."""
+        adj = self.graph.succ if side == 'succ' else self.graph.pred
+        return {node: recent_neighbours(adj[node], start_ts, max_fanout) for node in nodes}
+
+    def exchange_alerts(self, alerts, seq):
+        return self.alerts.exchange(alerts, seq)
+
+    def clear(self):
+        self.graph.clear()
+        self.retention.clear()
+        self.velocity.clear()
+        self.fan_in.clear()
+
+    def stats(self):
+        return {
+            "shard": self.index,
+            "graph": self.retention.stats(),
+            "velocity": {"senders": self.velocity.num_senders, "events": len(self.velocity)},
+            "fan_in": {"receivers": self.fan_in.num_receivers, "events": len(self.fan_in)},
+        }
+
+
+class ShardServer:
+    """One shard process: serves ShardState operations to web workers."""
+
+    def __init__(self, index, shards, directory=SOCKET_DIR):
+        self.index = index
+        self.shards = shards
+        self.path = socket_path(directory, index)
+        self.state = None  # Created by the first web worker's hello, which carries the config
+
+    def handle(self, op, args):
+        if op == 'apply':
+            return self.state.apply(*args)
+        if op == 'adjacency':
+            return self.state.adjacency(*args)
+        if op == 'exchange_alerts':
+            return self.state.exchange_alerts(*args)
+        if op == 'hello':
+            shards, config = args
+            if shards != self.shards:
+                raise ValueError(f"web worker expects {shards} shards, this is shard {self.index} of {self.shards}")
+            if self.state is None:
+                self.state = ShardState(self.index, self.shards, config)
+            return self.index
+        if op == 'stats':
+            return self.state.stats()
+        if op == 'clear':
+            return self.state.clear()
+        raise ValueError(f"Unknown shard operation {op!r}")
+
+    async def _retention_task(self):
+        while True:
+            await asyncio.sleep(RETENTION_INTERVAL)
+            # Keep going while entries are due: a chunk of stale entries removes nothing
+            while self.state is not None and self.state.retention.due:
+                self.state.retention.step(self.state.config['step_budget'] * 16)
+                await asyncio.sleep(0)
+
+    async def serve(self):
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        loop = asyncio.get_running_loop()
+        server = await loop.create_unix_server(lambda: _ShardProtocol(self), self.path)
+        os.chmod(self.path, 0o600)  # Frames are pickles: only this user may connect
+        print(f"Shard {self.index}/{self.shards} listening on {self.path}")
+        retention = asyncio.create_task(self._retention_task())
+        try:
+            await server.serve_forever()
+        finally:
+            retention.cancel()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class _ShardProtocol(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self._frames = _Frames()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        # Everything that arrived together is answered with one write
+        replies = []
+        for req_id, op, args in self._frames.feed(data):
+            try:
+                replies.append(_frame((req_id, True, self.server.handle(op, args))))
+            except Exception as e:
+                replies.append(_frame((req_id, False, f"{type(e).__name__}: {e}")))
+        if replies:
+            self.transport.write(b''.join(replies))
+
+
+class ShardClient(asyncio.Protocol):
+    """Pipelined connection to one shard. Requests queued in the same loop tick share a write."""
+
+    def __init__(self):
+        self._frames = _Frames()
+        self._futures = {}
+        self._outbox = []
+        self._seq = 0
+        self._loop = None
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._loop = asyncio.get_running_loop()
+
+    def data_received(self, data):
+        for req_id, ok, result in self._frames.feed(data):
+            future = self._futures.pop(req_id, None)
+            if future is None or future.done():
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+
+    def connection_lost(self, exc):
+        self.transport = None
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(ConnectionError("shard connection lost"))
+        self._futures.clear()
+
+    def call(self, op, *args):
+        """Queues a request and returns a future for its result."""
+        future = self._loop.create_future()
+        if self.transport is None:
+            future.set_exception(ConnectionError("shard not connected"))
+            return future
+        self._seq += 1
+        self._futures[self._seq] = future
+        self._outbox.append(_frame((self._seq, op, args)))
+        if len(self._outbox) == 1:
+            self._loop.call_soon(self._flush)
+        return future
+
+    def _flush(self):
+        if self.transport is not None and self._outbox:
+            self.transport.write(b''.join(self._outbox))
+        self._outbox.clear()
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+class ShardRouter:
+    """Web-worker side: routes state updates and cycle searches to the owning shards."""
+
+    def __init__(self, shards, directory=SOCKET_DIR):
+        self.shards = shards
+        self.directory = directory
+        self.clients = []
+        self.calls = 0
+        self.alert_seq = None  # Position in shard 0's alert log
+
+    async def connect(self, config, timeout=30.0):
+        """Connects to every shard (waiting up to timeout for them to come up) and sends the config."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for index in range(self.shards):
+            path = socket_path(self.directory, index)
+            while True:
+                try:
+                    _, client = await loop.create_unix_connection(ShardClient, path)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if loop.time() > deadline:
+                        raise ConnectionError(f"shard {index} not reachable at {path}; "
+                                              f"start it with python -m backend.sharding --shards {self.shards}")
+                    await asyncio.sleep(0.1)
+            self.clients.append(client)
+        await asyncio.gather(*(client.call('hello', self.shards, config) for client in self.clients))
+        # Start reading the shared alert log from here
+        self.alert_seq, _, _ = await self._call(0, 'exchange_alerts', [], None)
+
+    def _call(self, index, op, *args):
+        self.calls += 1
+        return self.clients[index].call(op, *args)
+
+    async def apply(self, sender_id, receiver_id, amount, timestamp, ts, txn_id):
+        """
+        Applies a transfer on the sender's and receiver's shards (one request if they coincide).
+        Both requests are queued before awaiting, so per-shard order follows call order.
+        Returns (velocity counts, fan-in count).
+        """
+        args = (sender_id, receiver_id, amount, timestamp, ts, txn_id)
+        s, r = shard_of(sender_id, self.shards), shard_of(receiver_id, self.shards)
+        if s == r:
+            return await self._call(s, 'apply', *args, True, True)
+        sent = self._call(s, 'apply', *args, True, False)
+        received = self._call(r, 'apply', *args, False, True)
+        (velocity, _), (_, fan_in) = await asyncio.gather(sent, received)
+        return velocity, fan_in
+
+    async def _adjacency(self, side, nodes, max_fanout, start_ts):
+        by_shard = {}
+        for node in nodes:
+            by_shard.setdefault(shard_of(node, self.shards), []).append(node)
+        parts = await asyncio.gather(*(self._call(index, 'adjacency', side, group, max_fanout, start_ts)
+                                       for index, group in by_shard.items()))
+        adjacency = {}
+        for part in parts:
+            adjacency.update(part)
+        return adjacency
+
+    async def find_cycle(self, u, v, now_ts, window_seconds, min_hops=3, max_hops=5,
+                         max_fanout=64, max_visits=2048):
+        """cycles.find_cycle over the partitioned graph: one round of shard requests per BFS level."""
+        if u == v:
+            return None
+        search = cycle_search(u, v, now_ts, window_seconds, min_hops, max_hops, max_fanout, max_visits)
+        start_ts = now_ts - window_seconds
+        try:
+            side, frontier = next(search)
+            while True:
+                side, frontier = search.send(await self._adjacency(side, frontier, max_fanout, start_ts))
+        except StopIteration as done:
+            return done.value
+
+    async def exchange_alerts(self, alerts):
+        """
+        Sends this worker's new alerts to the shared log on shard 0 and returns (alerts from
+        every worker since the last exchange, missed), for AlertBroadcaster's relay.
+        """
+        self.alert_seq, alerts, missed = await self._call(0, 'exchange_alerts', alerts, self.alert_seq)
+        return alerts, missed
+
+    async def stats(self):
+        return await asyncio.gather(*(self._call(i, 'stats') for i in range(self.shards)))
+
+    async def clear(self):
+        await asyncio.gather(*(self._call(i, 'clear') for i in range(self.shards)))
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.clients = []
+
+
+def run_shard(index, shards, directory=SOCKET_DIR):
+    """Process entry point for one shard."""
+    try:
+        asyncio.run(ShardServer(index, shards, directory).serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def start_shards(shards, directory=SOCKET_DIR):
+    """Starts the shard processes. Returns them; terminate() each to stop."""
+    ctx = multiprocessing.get_context('spawn')
+    processes = [ctx.Process(target=run_shard, args=(i, shards, directory), name=f'shard-{i}', daemon=True)
+                 for i in range(shards)]
+    for process in processes:
+        process.start()
+    return processes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the detection state shards (and optionally the web workers).")
+    parser.add_argument('--shards', type=int, default=os.cpu_count() or 1, help='number of shard processes')
+    parser.add_argument('--socket-dir', default=SOCKET_DIR, help='directory for the shard sockets')
+    parser.add_argument('--web-workers', type=int, default=0,
+                        help='also run uvicorn with this many workers routed to the shards')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    processes = start_shards(args.shards, args.socket_dir)
+    try:
+        if args.web_workers:
+            env = dict(os.environ, KAVACH_STATE_SHARDS=str(args.shards), KAVACH_SHARD_SOCKET_DIR=args.socket_dir)
+            subprocess.run([sys.executable, '-m', 'uvicorn', 'backend.main:socket_app', '--host', args.host,
+                            '--port', str(args.port), '--workers', str(args.web_workers)], env=env)
+        else:
+            for process in processes:
+                process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
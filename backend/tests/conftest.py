@@ -0,0 +1,20 @@
+import logging
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    """The API on empty, memory-only detection state, scoring inline."""
+    from fastapi.testclient import TestClient
+    from backend import main
+    main.STATE_PERSISTENCE = False
+    main.SCORING_MODE = 'inline'
+    main.MODEL_WATCH_INTERVAL = 0
+    main.BLOCKLIST.path = str(tmp_path_factory.mktemp('state') / 'frozen_accounts.log')
+    main.BLOCKLIST.seed_path = None
+    logging.disable(logging.CRITICAL)
+    with TestClient(main.socket_app) as client:
+        main.reset_state()
+        yield client
+    logging.disable(logging.NOTSET)
@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime, timedelta
+
+from backend import main
+
+FAR_FUTURE = '2099-01-01T00:00:00'
+
+
+def txn(sender, receiver, timestamp):
+    return {'txn_id': str(uuid.uuid4()), 'sender_id': sender, 'receiver_id': receiver, 'amount': 100.0,
+            'timestamp': timestamp, 'lat': 19.0, 'lng': 72.8, 'device_id': 'd'}
+
+
+def minutes_ago(minutes):
+    return (datetime.now() - timedelta(minutes=minutes)).isoformat()
+
+
+def test_far_future_transaction_does_not_expire_the_graph(app):
+    app.post('/predict', json=txn('early', 'b', minutes_ago(30)))
+    assert app.post('/predict', json=txn('x', 'y', FAR_FUTURE)).status_code == 200
+    for i in range(5):
+        app.post('/predict', json=txn(f'c{i}', f'd{i}', minutes_ago(20 - i)))
+    while main.GRAPH_RETENTION.due:
+        main.GRAPH_RETENTION.step()
+
+    limit = datetime.now().timestamp() + main.MAX_CLOCK_SKEW_SECONDS
+    assert main.GRAPH_RETENTION.watermark <= limit
+    assert main.FRAUD_GRAPH.get_edge_data('x', 'y')['ts'] <= limit
+    assert main.FRAUD_GRAPH.has_edge('early', 'b')
+    assert all(main.FRAUD_GRAPH.has_edge(f'c{i}', f'd{i}') for i in range(5))
+    nodes = app.get('/graph/c0', params={'window': '1h'}).json()['nodes']
+    assert {n['id'] for n in nodes} == {'c0', 'd0'}
+
+
+def test_unparseable_timestamp_is_rejected(app):
+    assert app.post('/predict', json=txn('p', 'q', 'yesterday')).status_code == 400
+    assert app.post('/predict/batch', json=[txn('p', 'q', minutes_ago(1)), txn('p', 'q', 'soon')]).status_code == 400
+    assert 'p' not in main.FRAUD_GRAPH
+
+
+def test_velocity_survives_a_far_future_transaction(app):
+    app.post('/predict', json=txn('v0', 'v1', FAR_FUTURE))
+    results = [app.post('/predict', json=txn('spender', f'shop{i}', minutes_ago(10 - i))).json() for i in range(3)]
+    assert [r['factors']['velocity_1h'] for r in results] == [1, 2, 3]
+
+
+def test_fan_in_survives_a_far_future_transaction(app):
+    app.post('/predict', json=txn('f0', 'f1', FAR_FUTURE))
+    results = [app.post('/predict', json=txn(f'sender{i}', 'hub', minutes_ago(8 - i))).json() for i in range(7)]
+    assert [r['factors']['graph_risk'] for r in results] == [0.0] * 5 + [1.0] * 2
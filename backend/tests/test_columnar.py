@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from backend.columnar import ColumnarTable, ColumnarWriter
+from backend.data_generator import CITY_NAMES, generate_chunks
+
+END_TIME = 1_700_000_000
+
+
+def write(path, chunks, **kwargs):
+    writer = ColumnarWriter(str(path), categories={'city': CITY_NAMES}, **kwargs)
+    for chunk in chunks:
+        writer.append(chunk)
+    writer.close()
+    return ColumnarTable(str(path))
+
+
+def test_round_trip_across_buckets(tmp_path):
+    chunks = list(generate_chunks(5000, chunk_rows=1000, seed=3, end_time=END_TIME))
+    # 10,000 account IDs in buckets of 512: about 20 buckets
+    table = write(tmp_path / 'historical', chunks, bucket_values=512)
+    expected = pd.concat(chunks, ignore_index=True)
+    actual = table.to_frame()
+    assert len(table) == len(expected)
+    for name in ('txn_id', 'sender_id', 'receiver_id', 'device_id', 'city'):
+        assert (actual[name].to_numpy() == expected[name].to_numpy()).all(), name
+    assert np.allclose(actual['amount'], expected['amount'])
+    assert (actual['timestamp'].to_numpy() == expected['timestamp'].to_numpy()).all()
+
+    # Every ID is encoded once, and senders and receivers share codes
+    accounts = table.dictionary('accounts')
+    assert len(np.unique(accounts)) == len(accounts)
+    assert len(accounts) == len(np.unique(expected[['sender_id', 'receiver_id']].to_numpy()))
+    assert not list((tmp_path / 'historical').glob('*.raw.bin'))
+    assert not list((tmp_path / 'historical').glob('*.bucket*'))
+
+
+def test_shared_codes_for_repeated_ids(tmp_path):
+    chunk = pd.DataFrame({
+        'txn_id': [f't{i}' for i in range(4)],
+        'sender_id': ['a', 'b', 'a', 'c'],
+        'receiver_id': ['b', 'a', 'c', 'a'],
+        'amount': [1.0, 2.0, 3.0, 4.0],
+        'timestamp': pd.to_datetime(['2024-01-01'] * 4),
+        'lat': [0.0] * 4,
+        'lng': [0.0] * 4,
+        'device_id': ['d1', 'd1', 'd2', 'd1'],
+        'is_fraud': [0, 1, 0, 1],
+        'city': ['Delhi'] * 4,
+    })
+    table = write(tmp_path / 'small', [chunk, chunk], bucket_values=2)
+    senders, receivers = np.asarray(table.raw('sender_id')), np.asarray(table.raw('receiver_id'))
+    assert senders[0] == senders[2] == receivers[1] == receivers[3] == senders[4]
+    assert len(table.dictionary('accounts')) == 3
+    assert len(table.dictionary('devices')) == 2
+    assert list(table.column('receiver_id')) == ['b', 'a', 'c', 'a'] * 2
+
+
+def test_empty(tmp_path):
+    table = write(tmp_path / 'empty', [])
+    assert len(table) == 0
+    assert len(table.dictionary('accounts')) == 0
@@ -0,0 +1,92 @@
+import warnings
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from backend.compiled_forest import CompiledForest
+from backend.data_generator import generate_chunks
+from backend.train_model import COLUMNS_PATH, MODEL_PATH, feature_engineering
+
+FEATURES = ['amount', 'amount_log', 'hour_of_day', 'velocity_1h', 'geo_cluster_id', 'lat', 'lng']
+
+
+@pytest.fixture(scope='module')
+def feature_rows():
+    """Real training rows: generated transactions run through feature engineering."""
+    df = pd.concat(generate_chunks(6000, seed=11, end_time=1_700_000_000), ignore_index=True)
+    df, _ = feature_engineering(df)
+    return df
+
+
+@pytest.fixture(scope='module')
+def trained(feature_rows):
+    model = RandomForestClassifier(n_estimators=30, max_depth=12, random_state=0)
+    model.fit(feature_rows[FEATURES], feature_rows['is_fraud'])
+    return model
+
+
+@pytest.fixture(scope='module')
+def shipped():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # Pickled with an older scikit-learn
+        return joblib.load(MODEL_PATH), joblib.load(COLUMNS_PATH)
+
+
+def expected(model, X):
+    return model.predict_proba(X)[:, list(model.classes_).index(1)]
+
+
+def threshold_rows(compiled, base, count=400, seed=0):
+    """
+    Real rows with one feature moved onto a split threshold: exactly on it (as the float32
+    value trees compare against) and one float32 step either side.
+    """
+    rng = np.random.default_rng(seed)
+    internal = np.flatnonzero(compiled.left >= 0)
+    rows = []
+    for node in rng.choice(internal, count):
+        row = base[rng.integers(len(base))].astype(np.float32)
+        at = np.float32(compiled.threshold[node])
+        for value in (at, np.nextafter(at, np.float32(-np.inf)), np.nextafter(at, np.float32(np.inf))):
+            edge = row.copy()
+            edge[compiled.feature[node]] = value
+            rows.append(edge)
+    return np.array(rows)
+
+
+def assert_parity(model, columns, rows):
+    compiled = CompiledForest.from_sklearn(model)
+    X = pd.DataFrame(rows, columns=columns)
+    want = expected(model, X)
+    # Batch path
+    np.testing.assert_allclose(compiled.predict_proba(X.to_numpy()), want, rtol=0, atol=1e-12)
+    # Single-row path, as /predict scores
+    single = np.array([compiled.predict_proba(row)[0] for row in X.to_numpy()[:300]])
+    np.testing.assert_allclose(single, want[:300], rtol=0, atol=1e-12)
+
+
+def test_parity_on_feature_rows(trained, feature_rows):
+    assert_parity(trained, FEATURES, feature_rows[FEATURES].to_numpy(dtype=np.float64))
+
+
+def test_parity_at_thresholds(trained, feature_rows):
+    compiled = CompiledForest.from_sklearn(trained)
+    assert_parity(trained, FEATURES, threshold_rows(compiled, feature_rows[FEATURES].to_numpy()))
+
+
+def test_shipped_model_parity(shipped, feature_rows):
+    model, columns = shipped
+    rows = feature_rows[columns].to_numpy(dtype=np.float64)
+    compiled = CompiledForest.from_sklearn(model)
+    assert_parity(model, columns, np.concatenate([rows, threshold_rows(compiled, rows, count=200)]))
+
+
+def test_saved_forest_matches(trained, feature_rows, tmp_path):
+    compiled = CompiledForest.from_sklearn(trained)
+    compiled.save(str(tmp_path / 'compiled'))
+    loaded = CompiledForest.load(str(tmp_path / 'compiled'))
+    X = feature_rows[FEATURES].to_numpy()
+    np.testing.assert_array_equal(loaded.predict_proba(X), compiled.predict_proba(X))
@@ -0,0 +1,54 @@
+import uuid
+
+from backend.cycles import find_cycle, recent_neighbours
+from backend.graph_store import TransferGraph
+
+HOUR = 3600.0
+NOW = 1_700_000_000.0
+
+
+def add(graph, u, v, ts):
+    graph.add_edge(u, v, ts, 100.0, str(uuid.uuid4()))
+
+
+def ring(graph, ts=NOW):
+    add(graph, 'A', 'B', ts - 120)
+    add(graph, 'B', 'C', ts - 60)
+    add(graph, 'C', 'A', ts)
+
+
+def test_finds_ring():
+    graph = TransferGraph()
+    ring(graph)
+    assert find_cycle(graph, 'C', 'A', NOW, 2 * HOUR) == ['C', 'A', 'B']
+
+
+def test_ring_through_hub_with_old_history():
+    # B's 100 older out-edges used to fill the fan-out cap before B -> C was reached
+    graph = TransferGraph()
+    for i in range(100):
+        add(graph, 'B', f'old{i}', NOW - 5 * HOUR)
+    ring(graph)
+    assert find_cycle(graph, 'C', 'A', NOW, 2 * HOUR) == ['C', 'A', 'B']
+
+
+def test_ring_through_hub_with_recent_history():
+    # Within the window the newest edges win the cap
+    graph = TransferGraph()
+    for i in range(100):
+        add(graph, 'B', f'busy{i}', NOW - HOUR + i)
+    ring(graph)
+    assert find_cycle(graph, 'C', 'A', NOW, 2 * HOUR) == ['C', 'A', 'B']
+
+
+def test_ring_outside_window():
+    graph = TransferGraph()
+    ring(graph, ts=NOW - 3 * HOUR)
+    assert find_cycle(graph, 'C', 'A', NOW, 2 * HOUR) is None
+
+
+def test_recent_neighbours():
+    pairs = [('a', 10.0), ('b', 50.0), ('c', 30.0), ('d', 5.0), ('e', 40.0)]
+    assert recent_neighbours(pairs, 20.0, 2) == [('b', 50.0), ('e', 40.0)]
+    assert recent_neighbours(pairs, 20.0, 10) == [('b', 50.0), ('e', 40.0), ('c', 30.0)]
+    assert recent_neighbours(pairs, 60.0, 10) == []
@@ -0,0 +1,19 @@
+from backend.fan_in import FanInIndex
+
+NOW = 1_700_000_000.0
+
+
+def test_far_future_transfer_does_not_hide_fan_in():
+    index = FanInIndex(600, max_skew=300, clock=lambda: NOW)
+    index.add('elsewhere', 4_070_908_800.0)  # 2099
+    counts = [index.add('hub', NOW - 300 + 10 * i) for i in range(7)]
+    assert counts == list(range(1, 8))
+    assert index.count('hub', NOW) == 7
+
+
+def test_receivers_expire_relative_to_their_own_transfers():
+    index = FanInIndex(600, max_skew=300, clock=lambda: NOW)
+    index.add('hub', NOW - 700)
+    index.add('hub', NOW - 100)
+    assert index.add('hub', NOW) == 2
+    assert index.times('hub') == [NOW - 100, NOW]
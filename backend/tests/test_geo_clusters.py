@@ -0,0 +1,78 @@
+import shutil
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pytest
+
+from backend import main
+
+
+@pytest.fixture
+def restore_model():
+    yield
+    main.load_model()
+
+
+def test_shipped_clusters_match_the_model(restore_model):
+    # The committed model scores on geo_cluster_id, so its clusters must ship with it
+    main.load_model()
+    model = main.ACTIVE_MODEL
+    assert 'geo_cluster_id' in model.columns
+    index = model.geo_index
+    assert index is not None and len(index.labels) > 0
+    # Core points get their own training labels back at serving time
+    core = np.degrees(np.asarray(index.tree.data))
+    sample = np.random.default_rng(0).choice(len(core), 200, replace=False)
+    np.testing.assert_array_equal(model.geo_clusters(core[sample, 0], core[sample, 1]), index.labels[sample])
+
+
+def test_missing_clusters_fail_startup(restore_model, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, 'GEO_CLUSTERS_PATH', str(tmp_path / 'geo_clusters.pkl'))
+    with pytest.raises(RuntimeError, match='geo_cluster_id'):
+        main.load_model()
+
+    monkeypatch.setattr(main, 'GEO_CLUSTERS_REQUIRED', False)
+    main.load_model()
+    assert main.ACTIVE_MODEL.geo_cluster(28.6, 77.2) == 0
+
+
+def test_shadow_scores_and_promotes_with_its_own_clusters(app, restore_model, monkeypatch, tmp_path):
+    # A candidate from another training run: same points, different cluster numbering
+    shutil.copy(main.MODEL_PATH, tmp_path / 'candidate.pkl')
+    shutil.copy(main.COLUMNS_PATH, tmp_path / 'model_columns.pkl')
+    clusters = joblib.load(main.GEO_CLUSTERS_PATH)
+    clusters['labels'] = clusters['labels'] + 1000
+    joblib.dump(clusters, tmp_path / 'candidate_geo_clusters.pkl')
+    monkeypatch.setattr(main, 'MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(main, 'USE_COMPILED_MODEL', False)
+
+    response = app.post('/admin/model/reload', params={
+        'shadow': 'true', 'model_path': str(tmp_path / 'candidate.pkl'),
+        'columns_path': str(tmp_path / 'model_columns.pkl')})
+    assert response.status_code == 200, response.text
+    assert response.json()['shadow']['geo_clusters_path'] == str(tmp_path / 'candidate_geo_clusters.pkl')
+
+    active, shadow = main.ACTIVE_MODEL, main.SHADOW_MODEL
+    lat, lng = np.degrees(np.asarray(active.geo_index.tree.data[0]))
+    assert active.geo_cluster(lat, lng) > 0
+    assert shadow.geo_cluster(lat, lng) == active.geo_cluster(lat, lng) + 1000
+    txn = main.Transaction(txn_id='t', sender_id='s', receiver_id='r', amount=10.0,
+                           timestamp='2026-01-01T00:00:00', lat=lat, lng=lng, device_id='d')
+    column = shadow.columns.index('geo_cluster_id')
+    assert main.build_feature_row(txn, datetime(2026, 1, 1), 1, shadow)[column] == shadow.geo_cluster(lat, lng)
+
+    assert app.post('/admin/model/promote').status_code == 200
+    assert main.ACTIVE_MODEL is shadow and main.ACTIVE_MODEL.geo_cluster(lat, lng) == shadow.geo_cluster(lat, lng)
+
+
+def test_shadow_without_its_clusters_is_refused(app, restore_model, monkeypatch, tmp_path):
+    shutil.copy(main.MODEL_PATH, tmp_path / 'candidate.pkl')
+    shutil.copy(main.COLUMNS_PATH, tmp_path / 'model_columns.pkl')
+    monkeypatch.setattr(main, 'MODEL_DIR', str(tmp_path))
+    monkeypatch.setattr(main, 'USE_COMPILED_MODEL', False)
+    response = app.post('/admin/model/reload', params={
+        'shadow': 'true', 'model_path': str(tmp_path / 'candidate.pkl'),
+        'columns_path': str(tmp_path / 'model_columns.pkl')})
+    assert response.status_code == 500 and 'geo_cluster_id' in response.json()['detail']
+    assert main.SHADOW_MODEL is None
@@ -0,0 +1,80 @@
+import uuid
+
+import pytest
+
+from backend.graph_store import TransferGraph
+from backend.neighborhood import NeighborhoodCache
+
+
+def txn(sender, receiver, second):
+    return {'txn_id': str(uuid.uuid4()), 'sender_id': sender, 'receiver_id': receiver, 'amount': 100.0,
+            'timestamp': f'2026-01-01T00:{second // 60:02d}:{second % 60:02d}',
+            'lat': 19.0, 'lng': 72.8, 'device_id': 'd'}
+
+
+@pytest.fixture(scope='module')
+def client(app):
+    app.post('/predict/batch', json=[txn('boss', f'mule{i}', i) for i in range(5)]
+             + [txn(f'mule{i}', 'cash', 60 + i) for i in range(5)])
+    return app
+
+
+@pytest.mark.parametrize('params', [{'hops': 0}, {'hops': 9}, {'window': 'abc'}, {'window': '-1h'},
+                                    {'window': 'inf'}, {'window': 'infh'}, {'window': 'nan'}])
+def test_bad_parameters(client, params):
+    assert client.get('/graph/boss', params=params).status_code == 400
+
+
+def test_unknown_account(client):
+    assert client.get('/graph/nobody').status_code == 404
+
+
+def test_neighborhood_and_cache(client):
+    result = client.get('/graph/boss', params={'hops': 2, 'window': '1h'}).json()
+    assert {n['id']: n['hop'] for n in result['nodes']} == dict(boss=0, cash=2, **{f'mule{i}': 1 for i in range(5)})
+    assert len(result['edges']) == 10
+    assert client.get('/graph/boss', params={'hops': 2, 'window': '1h'}).json() == result
+
+    # A transfer touching any account in the response drops it
+    client.post('/predict', json=txn('cash', 'newcomer', 120))
+    result = client.get('/graph/boss', params={'hops': 3, 'window': '1h'}).json()
+    assert 'newcomer' in [n['id'] for n in result['nodes']]
+
+
+def test_walk_yields_between_chunks():
+    graph = TransferGraph()
+    for i in range(50):
+        graph.add_edge('hub', f'r{i}', float(i), 1.0, str(uuid.uuid4()))
+        for j in range(20):
+            graph.add_edge(f'r{i}', f'r{i}x{j}', float(i), 1.0, str(uuid.uuid4()))
+    walk = graph.ego_walk('hub', 2, max_fanout=100, max_nodes=10_000, max_visits=10_000, chunk=100)
+    pauses = 0
+    try:
+        while True:
+            next(walk)
+            pauses += 1
+            graph.add_edge('late', 'hub', 99.0, 1.0, str(uuid.uuid4()))  # Writes between steps are fine
+    except StopIteration as done:
+        nodes, edges, truncated = done.value
+    assert pauses > 5
+    assert len(nodes) == 1 + 50 + 50 * 20 and not truncated
+    ids = {node_id for node_id, _, _ in nodes}
+    assert all(u in ids and v in ids for u, v, *_ in edges)
+
+
+def test_cache_drops_values_invalidated_while_building():
+    cache = NeighborhoodCache()
+    token = cache.begin()
+    cache.invalidate('a')
+    cache.put('k1', 'stale', ['a', 'b'], token)
+    assert cache.get('k1') is None
+
+    token = cache.begin()
+    cache.invalidate('z')
+    cache.put('k2', 'fresh', ['a', 'b'], token)
+    assert cache.get('k2') == 'fresh'
+
+    token = cache.begin()
+    cache.clear()
+    cache.put('k3', 'stale', ['a'], token)
+    assert cache.get('k3') is None
@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.mark.parametrize('interval', ['0', '-5', '0.001', 'nan', 'inf', '5000'])
+def test_bad_intervals_are_rejected(app, interval):
+    assert app.post('/debug/profiler/start', params={'interval_ms': interval}).status_code == 400
+
+
+def test_samples_the_event_loop(app):
+    assert app.post('/debug/profiler/start', params={'interval_ms': 1}).status_code == 200
+    app.get('/ready')
+    assert app.post('/debug/profiler/stop').status_code == 200
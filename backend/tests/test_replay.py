@@ -0,0 +1,35 @@
+import asyncio
+
+from backend.replay import ReplayEngine
+
+SERVICE_S = 0.02
+
+
+async def slow_handler(item):
+    await asyncio.sleep(SERVICE_S)
+
+
+def replay(**kwargs):
+    async def run():
+        engine = ReplayEngine(slow_handler)
+        return await engine.start(lambda i: i, 30, **kwargs)
+    return asyncio.run(run())
+
+
+def test_latency_includes_queueing_behind_the_schedule():
+    # 200 txn/s against a 50 txn/s handler: row i is sent about i * 15 ms late
+    report = replay(mode='rate', rate=200.0)
+    assert report['sent'] == 30
+    assert report['service_ms']['p99'] < 100
+    assert report['latency_ms']['max'] > 350
+    assert report['latency_ms']['p50'] > 5 * report['service_ms']['p50']
+
+
+def test_latency_matches_service_when_keeping_up():
+    report = replay(mode='rate', rate=25.0)
+    assert report['latency_ms']['max'] < report['service_ms']['max'] + 30
+
+
+def test_max_mode_has_no_schedule():
+    report = replay(mode='max')
+    assert abs(report['latency_ms']['p50'] - report['service_ms']['p50']) < 5
@@ -0,0 +1,112 @@
+import math
+import random
+import uuid
+
+from backend.graph_store import TransferGraph
+from backend.retention import GraphRetention
+
+HOUR = 3600.0
+
+
+def transfer(graph, retention, u, v, ts):
+    retention.track(graph.add_edge(u, v, ts, 100.0, str(uuid.uuid4())), ts)
+
+
+def drain(retention, budget=16):
+    while retention.due:
+        retention.step(budget)
+
+
+def test_repeated_pairs_keep_one_entry_per_edge():
+    graph = TransferGraph()
+    retention = GraphRetention(graph, 24 * HOUR, max_edges=1000, step_budget=0)
+    for i in range(20_000):
+        transfer(graph, retention, f'a{i % 10}', f'b{i % 10}', 1000.0 + i)
+    assert graph.number_of_edges() == 10
+    assert retention.backlog == 10
+
+
+def test_overwritten_edge_expires_from_its_latest_write():
+    graph = TransferGraph()
+    retention = GraphRetention(graph, HOUR)
+    transfer(graph, retention, 'a', 'b', 0.0)
+    transfer(graph, retention, 'a', 'b', 1800.0)
+    transfer(graph, retention, 'x', 'y', 3000.0)
+    transfer(graph, retention, 'x', 'y', 3700.0)  # Watermark moves past the first write's horizon
+    drain(retention)
+    assert graph.has_edge('a', 'b') and graph.get_edge_data('a', 'b')['ts'] == 1800.0
+    transfer(graph, retention, 'x', 'y', 5500.0)
+    drain(retention)
+    assert not graph.has_edge('a', 'b')
+    assert retention.backlog == graph.number_of_edges() == 1
+
+
+def test_out_of_order_overwrite_expires_at_the_older_time():
+    graph = TransferGraph()
+    retention = GraphRetention(graph, HOUR)
+    transfer(graph, retention, 'a', 'b', 2000.0)
+    transfer(graph, retention, 'a', 'b', 100.0)  # Late arrival: latest write wins
+    transfer(graph, retention, 'x', 'y', 3800.0)
+    drain(retention)
+    assert not graph.has_edge('a', 'b')
+
+
+def test_drain_continues_past_stale_entries():
+    # A chunk that only pops stale entries used to end the background drain
+    graph = TransferGraph()
+    retention = GraphRetention(graph, HOUR, step_budget=0)
+    for i in range(50):
+        transfer(graph, retention, f'old{i}', 'sink', 200.0 + i)
+    for i in range(100):
+        transfer(graph, retention, f'gone{i}', 'sink', float(i))
+    for i in range(100):
+        graph.remove_edge(f'gone{i}', 'sink')  # Outside retention: their entries go stale
+    transfer(graph, retention, 'new', 'sink', 10 * HOUR)
+    assert retention.step(16) == 0 and retention.due
+    drain(retention)
+    assert graph.number_of_edges() == 1
+    assert retention.backlog == 1
+
+
+def test_random_stream_matches_reference():
+    rng = random.Random(5)
+    graph = TransferGraph()
+    retention = GraphRetention(graph, HOUR, step_budget=4)
+    latest = {}
+    ts = 0.0
+    for _ in range(20_000):
+        ts += rng.uniform(0, 3)
+        at = ts - rng.uniform(0, 600) if rng.random() < 0.1 else ts  # Some late arrivals
+        u, v = f'a{rng.randrange(300)}', f'a{rng.randrange(300)}'
+        transfer(graph, retention, u, v, at)
+        latest[u, v] = at
+        retention.step()
+    drain(retention)
+    cutoff = retention.watermark - HOUR
+    expected = {pair for pair, at in latest.items() if math.ceil(at) >= cutoff}
+    assert {(u, v) for u, v, *_ in graph.edges()} == expected
+    assert retention.backlog <= 2 * graph.number_of_edges()
+
+
+def test_size_cap_evicts_oldest_current_times():
+    graph = TransferGraph()
+    retention = GraphRetention(graph, 24 * HOUR, max_edges=3)
+    for i, pair in enumerate(['ab', 'cd', 'ef']):
+        transfer(graph, retention, pair[0], pair[1], 100.0 + i)
+    transfer(graph, retention, 'a', 'b', 200.0)  # Refreshes the oldest edge
+    transfer(graph, retention, 'g', 'h', 201.0)
+    drain(retention)
+    assert {(u, v) for u, v, *_ in graph.edges()} == {('a', 'b'), ('e', 'f'), ('g', 'h')}
+
+
+def test_far_future_transfer_cannot_move_the_watermark_past_the_clock():
+    now = 1_700_000_000.0
+    graph = TransferGraph()
+    retention = GraphRetention(graph, HOUR, max_skew=300, clock=lambda: now)
+    transfer(graph, retention, 'a', 'b', now - 60)
+    transfer(graph, retention, 'x', 'y', 4_070_908_800.0)  # 2099
+    for i in range(5):
+        transfer(graph, retention, f'c{i}', f'd{i}', now + i)
+    drain(retention)
+    assert retention.watermark == now + 300
+    assert graph.number_of_edges() == 7
@@ -0,0 +1,98 @@
+import asyncio
+import uuid
+
+from backend.alerts import AlertBroadcaster, AlertLog
+from backend.sharding import ShardRouter, ShardState, shard_of
+
+HOUR = 3600.0
+NOW = 1_700_000_000.0
+CONFIG = {
+    'retention_seconds': 24 * HOUR,
+    'max_edges': 100_000,
+    'max_nodes': 100_000,
+    'step_budget': 100,
+    'max_skew': None,
+    'alert_log_size': 100,
+    'velocity_windows': {'1h': 3600},
+    'fan_in_window': 1800,
+}
+
+
+class LocalClient:
+    """Stands in for a shard connection, calling the ShardState in-process."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def call(self, op, *args):
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(getattr(self.state, op)(*args))
+        return future
+
+
+def router(shards=3, states=None):
+    router = ShardRouter(shards)
+    router.clients = [LocalClient(state) for state in states or [ShardState(i, shards, CONFIG) for i in range(shards)]]
+    return router
+
+
+def apply(router, u, v, ts):
+    for index, as_sender, as_receiver in {(shard_of(u, router.shards), True, False),
+                                          (shard_of(v, router.shards), False, True)}:
+        router.clients[index].state.apply(u, v, 100.0, None, ts, str(uuid.uuid4()), as_sender, as_receiver)
+
+
+def find_cycle(router, u, v):
+    return asyncio.run(router.find_cycle(u, v, NOW, 2 * HOUR))
+
+
+def test_ring_through_hub_with_old_history():
+    shards = router()
+    for i in range(100):
+        apply(shards, 'B', f'old{i}', NOW - 5 * HOUR)
+    apply(shards, 'A', 'B', NOW - 120)
+    apply(shards, 'B', 'C', NOW - 60)
+    apply(shards, 'C', 'A', NOW)
+    assert find_cycle(shards, 'C', 'A') == ['C', 'A', 'B']
+
+
+def test_adjacency_is_newest_in_window_first():
+    state = ShardState(0, 1, CONFIG)
+    for i in range(10):
+        state.apply('hub', f'r{i}', 100.0, None, NOW - i * HOUR, str(uuid.uuid4()), True, True)
+    adjacency = state.adjacency('succ', ['hub'], 3, NOW - 5 * HOUR)
+    assert adjacency == {'hub': [('r0', NOW), ('r1', NOW - HOUR), ('r2', NOW - 2 * HOUR)]}
+    adjacency = state.adjacency('succ', ['hub'], 64, NOW - 2.5 * HOUR)
+    assert [nbr for nbr, _ in adjacency['hub']] == ['r0', 'r1', 'r2']
+
+
+def test_alerts_reach_clients_of_every_worker():
+    states = [ShardState(i, 2, CONFIG) for i in range(2)]
+    delivered = {'w1': [], 'w2': []}
+
+    def worker(name):
+        async def emit(event, frame, to, callback):
+            delivered[name].extend(alert['txn_id'] for alert in frame)
+        broadcaster = AlertBroadcaster(emit, relay=router(2, states).exchange_alerts)
+        broadcaster.connect(f'{name}-dashboard')
+        return broadcaster
+
+    async def run():
+        w1, w2 = worker('w1'), worker('w2')
+        await w1.flush()
+        await w2.flush()  # Both workers are polling the log before any alert
+        w1.publish({'txn_id': 'a', 'lat': 19.0, 'lng': 72.8})
+        w2.publish({'txn_id': 'b', 'lat': 19.0, 'lng': 72.8})
+        await w1.flush()
+        await w2.flush()
+        await w1.flush()
+    asyncio.run(run())
+    assert delivered == {'w1': ['a', 'b'], 'w2': ['a', 'b']}
+
+
+def test_alert_log_reports_alerts_it_no_longer_holds():
+    log = AlertLog(3)
+    seq, alerts, missed = log.exchange(['a'], None)
+    assert (seq, alerts, missed) == (1, ['a'], 0)
+    log.exchange(['b', 'c', 'd', 'e'], None)
+    assert log.exchange([], seq) == (5, ['c', 'd', 'e'], 1)
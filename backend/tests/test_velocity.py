@@ -0,0 +1,35 @@
+import numpy as np
+
+from backend.train_model import velocity_counts
+from backend.velocity import VelocityStore
+
+HOUR = 3600
+
+
+def test_serving_counts_match_training():
+    # Whole-second times with ties and gaps of exactly one hour, where the window edge matters
+    rng = np.random.default_rng(3)
+    n = 5000
+    senders = rng.integers(0, 40, n)
+    ts = np.sort(rng.integers(0, 12, n) * 900 + rng.integers(0, 3, n))  # Served in time order
+    store = VelocityStore({'velocity_1h': HOUR})
+    serving = [store.observe(int(s), float(t))['velocity_1h'] for s, t in zip(senders, ts)]
+    np.testing.assert_array_equal(serving, velocity_counts(senders, ts * 1_000_000))
+
+
+def test_event_exactly_one_hour_old_is_outside_the_window():
+    store = VelocityStore({'velocity_1h': HOUR})
+    store.observe('a', 1000.0)
+    assert store.observe('a', 1000.0 + HOUR)['velocity_1h'] == 1
+    assert store.count('a', 1000.0 + HOUR, HOUR + 1) == 2
+
+
+def test_far_future_event_does_not_reset_other_senders():
+    now = 1_700_000_000.0
+    store = VelocityStore({'velocity_1h': HOUR}, max_skew=300, clock=lambda: now)
+    store.observe('mallory', 4_070_908_800.0)  # 2099
+    for i in range(5):
+        for sender in ('a', 'b', 'c'):
+            counts = store.observe(sender, now - 600 + 60 * i)
+    assert counts['velocity_1h'] == 5
+    assert store.num_senders == 4
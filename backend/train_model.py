@@ -3,24 +3,95 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
-from sklearn.cluster import DBSCAN
 import joblib
 import os
 
+from backend.compiled_forest import CompiledForest, check_parity, probe_rows
+from backend.columnar import ColumnarTable, exists as columnar_exists, load_frame
+from backend.geo_dbscan import grid_dbscan
+from backend.geo_index import KMS_PER_RADIAN
+
 # Constants
 DATA_PATH = 'backend/data/historical_data.csv'
+COLUMNAR_DATA_PATH = 'backend/data/historical'
+# Only the columns feature engineering and training read
+TRAIN_COLUMNS = ['txn_id', 'sender_id', 'timestamp', 'amount', 'lat', 'lng', 'is_fraud']
 MODEL_DIR = 'backend/models'
 MODEL_PATH = os.path.join(MODEL_DIR, 'fraud_model.pkl')
 COLUMNS_PATH = os.path.join(MODEL_DIR, 'model_columns.pkl')
+GEO_CLUSTERS_PATH = os.path.join(MODEL_DIR, 'geo_clusters.pkl')
+# Memory-mappable flat form of the forest that the backend loads at startup
+COMPILED_MODEL_PATH = os.path.join(MODEL_DIR, 'fraud_model_compiled')
+
+US_PER_HOUR = 3600 * 1_000_000
+VELOCITY_WINDOW_US = US_PER_HOUR
+# DBSCAN epsilon: 0.5 km radius in radians
+GEO_EPS = 0.5 / KMS_PER_RADIAN
+GEO_MIN_SAMPLES = 3
+# Out-of-core feature engineering: rows per sender partition and per streamed chunk
+PARTITION_ROWS = 2_000_000
+CHUNK_ROWS = 1_000_000
+
+def load_data(path, csv_path=DATA_PATH):
+    """
+    Loads the training columns, memory-mapped from the columnar dataset when present.
+    IDs stay dictionary-encoded (int codes); they are only grouped on, never shown.
+    """
+    source = path if columnar_exists(path) else csv_path
+    print(f"Loading data from {source}...")
+    return load_frame(path, csv_path, TRAIN_COLUMNS, decode=False)
+
+def velocity_counts(sender, ts_us, window_us=VELOCITY_WINDOW_US):
+    """
+    Transactions by the same sender in (ts - 1h, ts], counting the row itself; the same
+    numbers groupby('sender_id').rolling('1h').count() gives, but without the merge back
+    (which duplicated rows whenever a sender had equal timestamps).
+    Ties count the rows before them in time order, like rolling does.
+    """
+    n = len(ts_us)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    ts_us = np.asarray(ts_us, dtype=np.int64)
+
+    # Dense timestamp ranks so (sender, time) fits in one int64 key
+    by_time = np.argsort(ts_us, kind='stable')
+    ts_sorted = ts_us[by_time]
+    is_new = np.empty(n, dtype=bool)
+    is_new[0] = True
+    np.not_equal(ts_sorted[1:], ts_sorted[:-1], out=is_new[1:])
+    unique_ts = ts_sorted[is_new]
+    rank = np.empty(n, dtype=np.int64)
+    rank[by_time] = np.cumsum(is_new) - 1
+    # Rank of the oldest timestamp still inside each row's window
+    lower = np.searchsorted(unique_ts, ts_us - window_us, side='right')
+
+    codes = pd.factorize(np.asarray(sender))[0].astype(np.int64)
+    # Rows ordered by (sender, time); keys are non-decreasing in this order
+    order = by_time[np.argsort(codes[by_time], kind='stable')]
+    keys = codes[order] * len(unique_ts) + rank[order]
+    first = np.searchsorted(keys, codes[order] * len(unique_ts) + lower[order], side='left')
 
-def load_data(path):
-    print(f"Loading data from {path}...")
-    df = pd.read_csv(path)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    return df
+    counts = np.empty(n, dtype=np.int64)
+    counts[order] = np.arange(n) - first + 1
+    return counts
+
+def cluster_locations(lats, lngs, ts=None):
+    """
+    DBSCAN geo clusters via the grid-partitioned implementation (same clusters, memory bounded
+    by the densest grid tile). Returns (labels, geo_clusters) with noise as 0 and clusters
+    numbered from 1.
+    """
+    labels, core = grid_dbscan(lats, lngs, GEO_EPS, GEO_MIN_SAMPLES, ts=ts)
+
+    # Keep core points and their labels so serving can assign clusters
+    # with a radius lookup instead of re-running DBSCAN
+    core_points = np.radians(np.column_stack([np.asarray(lats)[core], np.asarray(lngs)[core]]))
+    geo_clusters = {'core_points': core_points, 'labels': labels[core], 'eps': GEO_EPS}
+    return labels, geo_clusters
 
 def feature_engineering(df):
     print("Starting feature engineering...")
+    df = df.sort_values('timestamp', kind='stable', ignore_index=True)
     
     # 1. Hour of Day
     df['hour_of_day'] = df['timestamp'].dt.hour
@@ -30,42 +101,67 @@ def feature_engineering(df):
     
     # 3. Velocity (Transactions in last 1 hour per sender)
     print("Calculating velocity...")
-    df = df.sort_values('timestamp')
-    # Group by sender_id and use rolling window on timestamp
-    # We need to set timestamp as index for rolling
-    df_indexed = df.set_index('timestamp')
-    # 1h window, count transactions. 
-    # We use 'txn_id' to count. 
-    # closed='both' includes endpoints, but rolling count usually includes current row.
-    velocity = df_indexed.groupby('sender_id')['txn_id'].rolling('1h').count().reset_index()
-    # Rename column
-    velocity = velocity.rename(columns={'txn_id': 'velocity_1h'})
-    
-    # Merge back to original df. 
-    # Note: rolling returns timestamp as well, so we merge on sender_id and timestamp.
-    # However, duplicates in timestamp for same sender might cause issues if not handled carefully.
-    # Let's ensure we merge correctly.
-    df = pd.merge(df, velocity, on=['sender_id', 'timestamp'], how='left')
+    ts_us = df['timestamp'].to_numpy().astype('datetime64[us]').view(np.int64)
+    df['velocity_1h'] = velocity_counts(df['sender_id'].to_numpy(), ts_us)
     
     # 4. Geo Clustering (DBSCAN)
     print("Clustering locations...")
-    # DBSCAN expects radians for haversine metric
-    coords = np.radians(df[['lat', 'lng']])
-    
-    # Epsilon: 0.5 km radius (approx). Earth radius ~6371 km.
-    # 0.5 / 6371 ~= 0.000078 radians
-    kms_per_radian = 6371.0088
-    epsilon = 0.5 / kms_per_radian
-    
-    db = DBSCAN(eps=epsilon, min_samples=3, metric='haversine', algorithm='ball_tree')
-    df['geo_cluster_id'] = db.fit_predict(coords)
-    
-    # Treat noise (-1) as 0, and shift others to avoid negative inputs if model dislikes them (though RF handles it)
-    # Let's just map -1 to 0 and others to cluster_id + 1 to keep it clean positive integers
-    df['geo_cluster_id'] = df['geo_cluster_id'].apply(lambda x: 0 if x == -1 else x + 1)
+    df['geo_cluster_id'], geo_clusters = cluster_locations(df['lat'].to_numpy(), df['lng'].to_numpy(), ts_us)
     
     print("Feature engineering complete.")
-    return df
+    return df, geo_clusters
+
+def feature_engineering_columnar(path, partition_rows=PARTITION_ROWS, chunk_rows=CHUNK_ROWS):
+    """
+    feature_engineering over the memory-mapped columnar dataset, without loading it into a
+    DataFrame first. Row-local features are computed chunk by chunk; velocity is computed
+    per partition of senders (by dictionary code), so every partition holds complete sender
+    histories and its time sort and ranks are bounded by partition_rows.
+    This is not constant-memory: the feature columns (about 57 bytes per row, and training
+    needs them in memory anyway) and DBSCAN's per-point arrays span every row, and DBSCAN's
+    neighbour queries grow with the densest grid tile. Peak is about 400 bytes per row on
+    generated data (800k rows), whatever partition_rows is.
+    Rows keep storage order rather than time order; the features per row are the same.
+    """
+    print("Starting out-of-core feature engineering...")
+    table = ColumnarTable(path)
+    n = len(table)
+    ts, sender = table.raw('timestamp'), table.raw('sender_id')
+    amount, lats, lngs = table.raw('amount'), table.raw('lat'), table.raw('lng')
+
+    # 1-2. Hour of Day and Log Amount
+    hour_of_day = np.empty(n, dtype=np.int64)
+    amount_log = np.empty(n, dtype=np.float64)
+    for start in range(0, n, chunk_rows):
+        stop = min(start + chunk_rows, n)
+        hour_of_day[start:stop] = ts[start:stop] // US_PER_HOUR % 24
+        amount_log[start:stop] = np.log1p(amount[start:stop])
+
+    # 3. Velocity, one sender partition at a time
+    partitions = max(1, -(-n // partition_rows))
+    print(f"Calculating velocity over {partitions} sender partition(s)...")
+    velocity_1h = np.empty(n, dtype=np.int64)
+    for part in range(partitions):
+        rows = np.concatenate([np.flatnonzero(sender[start:start + chunk_rows] % partitions == part) + start
+                               for start in range(0, n, chunk_rows)] or [np.zeros(0, dtype=np.int64)])
+        velocity_1h[rows] = velocity_counts(sender[rows], ts[rows])
+
+    # 4. Geo Clustering (DBSCAN)
+    print("Clustering locations...")
+    geo_cluster_id, geo_clusters = cluster_locations(lats, lngs, ts)
+
+    df = pd.DataFrame({
+        'amount': np.asarray(amount),
+        'amount_log': amount_log,
+        'hour_of_day': hour_of_day,
+        'velocity_1h': velocity_1h,
+        'geo_cluster_id': geo_cluster_id,
+        'lat': np.asarray(lats),
+        'lng': np.asarray(lngs),
+        'is_fraud': np.asarray(table.raw('is_fraud')),
+    })
+    print("Feature engineering complete.")
+    return df, geo_clusters
 
 def train_model(df):
     print("Preparing data for training...")
@@ -95,7 +191,7 @@ def train_model(df):
     
     return clf, features
 
-def save_model(clf, features):
+def save_model(clf, features, geo_clusters):
     os.makedirs(MODEL_DIR, exist_ok=True)
     
     print(f"Saving model to {MODEL_PATH}...")
@@ -104,14 +200,27 @@ def save_model(clf, features):
     print(f"Saving column names to {COLUMNS_PATH}...")
     joblib.dump(features, COLUMNS_PATH)
     
+    print(f"Saving {len(geo_clusters['labels'])} geo cluster core points to {GEO_CLUSTERS_PATH}...")
+    joblib.dump(geo_clusters, GEO_CLUSTERS_PATH)
+    
+    print(f"Saving compiled model to {COMPILED_MODEL_PATH}...")
+    compiled = CompiledForest.from_sklearn(clf)
+    compiled.columns = list(features)
+    check_parity(clf, compiled, pd.DataFrame(probe_rows(compiled, len(features)), columns=features))
+    compiled.save(COMPILED_MODEL_PATH)
+    
     print("Serialization complete.")
 
 if __name__ == "__main__":
-    if not os.path.exists(DATA_PATH):
-        print(f"Error: Data file not found at {DATA_PATH}. Please run Task 1 first.")
+    if columnar_exists(COLUMNAR_DATA_PATH):
+        print(f"Loading data from {COLUMNAR_DATA_PATH}...")
+        df, geo_clusters = feature_engineering_columnar(COLUMNAR_DATA_PATH)
+    elif os.path.exists(DATA_PATH):
+        df = load_data(COLUMNAR_DATA_PATH)
+        df, geo_clusters = feature_engineering(df)
+    else:
+        print(f"Error: Data not found at {COLUMNAR_DATA_PATH} or {DATA_PATH}. Please run Task 1 first.")
         exit(1)
         
-    df = load_data(DATA_PATH)
-    df = feature_engineering(df)
     model, features = train_model(df)
-    save_model(model, features)
+    save_model(model, features, geo_clusters)
@@ -0,0 +1,157 @@
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+
+# Default velocity windows (feature name -> window length in seconds)
+DEFAULT_WINDOWS = {
+    'velocity_10m': 10 * 60,
+    'velocity_1h': 60 * 60,
+    'velocity_24h': 24 * 60 * 60,
+}
+
+# How many idle senders to inspect for expiry on each update.
+# Keeps cleanup amortized instead of sweeping the whole store at once.
+EXPIRY_SWEEP_BATCH = 8
+
+
+class _SenderBuffer:
+    """Sorted epoch times for one sender. Expired entries are skipped with a head offset."""
+    __slots__ = ('times', 'head')
+
+    def __init__(self):
+        self.times = []
+        self.head = 0
+
+    def add(self, ts):
+        times = self.times
+        if not times or ts >= times[-1]:
+            times.append(ts)  # Common case: events arrive in time order
+        else:
+            insort(times, ts, lo=self.head)
+
+    def expire(self, cutoff):
+        """Drops entries older than cutoff. Returns number of entries dropped."""
+        new_head = bisect_left(self.times, cutoff, lo=self.head)
+        dropped = new_head - self.head
+        self.head = new_head
+        # Compact once the dead prefix dominates, so memory tracks the live window
+        if self.head > 32 and self.head * 2 > len(self.times):
+            del self.times[:self.head]
+            self.head = 0
+        return dropped
+
+    def count(self, start, end):
+        """Entries in (start, end], the window train_model.velocity_counts uses."""
+        lo = bisect_right(self.times, start, lo=self.head)
+        hi = bisect_right(self.times, end, lo=lo)
+        return hi - lo
+
+    def __len__(self):
+        return len(self.times) - self.head
+
+    @property
+    def newest(self):
+        return self.times[-1] if len(self) else None
+
+
+class VelocityStore:
+    """
+    Per-sender sliding-window transaction counter.
+    Holds pre-parsed epoch timestamps per sender and expires them by time (the largest
+    configured window), so a lookup plus update costs amortized O(1) instead of a scan
+    over every recent transaction.
+    A sender's buffer expires relative to its own event times. Idle senders are dropped
+    against the newest event time seen, which with max_skew set never moves past the clock
+    plus max_skew, so one far-future event cannot empty the store.
+    """
+
+    def __init__(self, windows=None, max_skew=None, clock=time.time):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.horizon = max(self.windows.values())
+        self.max_skew = max_skew
+        self.clock = clock
+        # Ordered by last update so idle senders drift to the front for expiry
+        self._buffers = OrderedDict()
+        self._size = 0
+        self._watermark = None  # Newest event time seen so far (bounded by max_skew)
+
+    def observe(self, sender_id, ts):
+        """
+        Records a transaction at epoch time ts and returns the count per window,
+        including this transaction.
+        """
+        buf = self._buffers.get(sender_id)
+        if buf is None:
+            buf = self._buffers[sender_id] = _SenderBuffer()
+        else:
+            self._buffers.move_to_end(sender_id)
+
+        buf.add(ts)
+        self._size += 1
+        if self._watermark is None or ts > self._watermark:
+            self._advance(ts)
+
+        counts = {name: buf.count(ts - length, ts) for name, length in self.windows.items()}
+        self._size -= buf.expire(ts - self.horizon)
+        self._sweep()
+        return counts
+
+    def _advance(self, ts):
+        """Moves the watermark up to ts, but never past the clock plus max_skew."""
+        if self.max_skew is not None:
+            ts = min(ts, self.clock() + self.max_skew)
+        if self._watermark is None or ts > self._watermark:
+            self._watermark = ts
+
+    def count(self, sender_id, ts, window_seconds):
+        """Number of recorded transactions for sender in (ts - window_seconds, ts]."""
+        buf = self._buffers.get(sender_id)
+        if buf is None:
+            return 0
+        return buf.count(ts - window_seconds, ts)
+
+    def _sweep(self):
+        """Drops a few senders whose newest event fell out of the horizon."""
+        cutoff = self._watermark - self.horizon
+        for _ in range(EXPIRY_SWEEP_BATCH):
+            if len(self._buffers) <= 1:
+                break
+            sender_id, buf = next(iter(self._buffers.items()))
+            newest = buf.newest
+            if newest is not None and newest >= cutoff:
+                break
+            del self._buffers[sender_id]
+            self._size -= len(buf)
+
+    def keys(self):
+        """Tracked senders, least recently updated first."""
+        return list(self._buffers)
+
+    def times(self, sender_id):
+        """Live (unexpired) epoch times for sender, oldest first."""
+        buf = self._buffers.get(sender_id)
+        return buf.times[buf.head:] if buf is not None else []
+
+    def restore(self, sender_id, times):
+        """Replaces sender's buffer with sorted epoch times (e.g. from a snapshot)."""
+        old = self._buffers.pop(sender_id, None)
+        if old is not None:
+            self._size -= len(old)
+        buf = self._buffers[sender_id] = _SenderBuffer()
+        buf.times = list(times)
+        self._size += len(buf)
+        if buf.times:
+            self._advance(buf.times[-1])
+
+    def clear(self):
+        self._buffers.clear()
+        self._size = 0
+        self._watermark = None
+
+    @property
+    def num_senders(self):
+        return len(self._buffers)
+
+    def __len__(self):
+        """Total buffered events across all senders."""
+        return self._size
@@ -9,35 +9,43 @@ const AstraPanel = ({ transaction, onClose }) => {
 
     useEffect(() => {
         if (!transaction) return;
+        setFreezeStatus(null);
 
-        // Construct graph data centered on the fraudster (sender for fan-out)
-        // For Mule Fan-Out, the sender is the central node distributing funds.
-        // We simulate connected nodes (mules) for visualization since we don't have the full graph in frontend state.
-        // In a real app, we'd fetch neighbors from backend.
-
+        // Fraud ring around the sender: its 2-hop transfer network over the last 3 hours.
+        // Repeat opens of the same alert are served from the backend's cache.
         const centerNode = transaction.sender_id;
-        const receiverNode = transaction.receiver_id;
-
-        // Mocking a fan-out network for visualization
-        const nodes = [
-            { id: centerNode, group: 'fraudster', val: 20 },
-            { id: receiverNode, group: 'mule', val: 10 }
-        ];
-
-        const links = [
-            { source: centerNode, target: receiverNode }
-        ];
-
-        // Add some dummy mules to show the "Fan-Out" pattern visually
-        for (let i = 0; i < 8; i++) {
-            const muleId = `mule-${i}`;
-            nodes.push({ id: muleId, group: 'mule', val: 5 });
-            links.push({ source: centerNode, target: muleId });
-        }
-
-        setGraphData({ nodes, links });
-        setFreezeStatus(null);
+        const fallback = {
+            nodes: [
+                { id: centerNode, group: 'fraudster', val: 20 },
+                { id: transaction.receiver_id, group: 'mule', val: 10 }
+            ],
+            links: [{ source: centerNode, target: transaction.receiver_id }]
+        };
+        let cancelled = false;
+
+        axios.get(`http://localhost:8000/graph/${encodeURIComponent(centerNode)}`, { params: { hops: 2, window: '3h' } })
+            .then(res => {
+                if (cancelled) return;
+                const { nodes, edges } = res.data;
+                setGraphData({
+                    nodes: nodes.map(n => ({
+                        id: n.id,
+                        group: n.hop === 0 ? 'fraudster' : n.frozen ? 'frozen' : 'mule',
+                        val: n.hop === 0 ? 20 : n.hop === 1 ? 10 : 5
+                    })),
+                    links: edges.map(([source, target, ts, amount]) => ({
+                        source: nodes[source].id,
+                        target: nodes[target].id,
+                        amount
+                    }))
+                });
+            })
+            .catch(err => {
+                console.error("Error fetching transfer network:", err);
+                if (!cancelled) setGraphData(fallback);
+            });
 
+        return () => { cancelled = true; };
     }, [transaction]);
 
     const handleFreeze = () => {
@@ -1,5 +1,5 @@
-import React, { useEffect, useState } from 'react';
-import { MapContainer, TileLayer, CircleMarker, Popup } from 'react-leaflet';
+import React, { useEffect, useRef, useState } from 'react';
+import { MapContainer, TileLayer, CircleMarker, Popup, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import socket from '../utils/socket';
 import axios from 'axios';
@@ -19,17 +19,45 @@ let DefaultIcon = L.icon({
 
 L.Marker.prototype.options.icon = DefaultIcon;
 
+// Live alerts are kept for the most recent MAX_ALERTS only
+const MAX_ALERTS = 500;
+
+// Reports the visible map bounds so the server only streams alerts for this viewport
+const ViewportWatcher = ({ onChange }) => {
+    const map = useMapEvents({
+        moveend: () => onChange(map.getBounds()),
+    });
+    useEffect(() => onChange(map.getBounds()), [map]);
+    return null;
+};
+
 const Dashboard = () => {
     const [alerts, setAlerts] = useState([]);
     const [hotspots, setHotspots] = useState([]);
     const [isConnected, setIsConnected] = useState(socket.connected);
     const [selectedAlert, setSelectedAlert] = useState(null);
+    const viewport = useRef(null);
+
+    const subscribe = () => {
+        if (viewport.current) socket.emit('subscribe', viewport.current);
+    };
+
+    const onViewportChange = (bounds) => {
+        viewport.current = {
+            min_lat: bounds.getSouth(),
+            min_lng: bounds.getWest(),
+            max_lat: bounds.getNorth(),
+            max_lng: bounds.getEast(),
+        };
+        subscribe();
+    };
 
     useEffect(() => {
         // Connect to socket
         socket.on('connect', () => {
             console.log('Connected to WebSocket');
             setIsConnected(true);
+            subscribe(); // Subscriptions don't survive a reconnect
         });
 
         socket.on('disconnect', () => {
@@ -37,15 +65,15 @@ const Dashboard = () => {
             setIsConnected(false);
         });
 
-        // Listen for alerts
-        socket.on('new_alert', (data) => {
-            console.log('New Alert:', data);
-            setAlerts((prev) => [data, ...prev]); // Add new alert to top
-            // Play sound effect (optional)
+        // Alerts arrive coalesced into periodic batches. Acking tells the server we kept up;
+        // without acks it stops sending and drops our oldest alerts.
+        socket.on('alerts_batch', (batch, ack) => {
+            setAlerts((prev) => [...[...batch].reverse(), ...prev].slice(0, MAX_ALERTS)); // Newest first
+            if (ack) ack();
         });
 
-        // Fetch initial hotspots
-        axios.get('http://localhost:8000/hotspots')
+        // Fetch initial hotspots (aggregated cells with counts)
+        axios.get('http://localhost:8000/hotspots', { params: { zoom: 5 } })
             .then(res => {
                 setHotspots(res.data);
             })
@@ -54,7 +82,7 @@ const Dashboard = () => {
         return () => {
             socket.off('connect');
             socket.off('disconnect');
-            socket.off('new_alert');
+            socket.off('alerts_batch');
         };
     }, []);
 
@@ -111,6 +139,8 @@ const Dashboard = () => {
                     maxBoundsViscosity={1.0}
                     style={{ height: '100%', width: '100%', background: '#1a1a1a' }}
                 >
+                    <ViewportWatcher onChange={onViewportChange} />
+
                     {/* CartoDB Dark Matter Tiles */}
                     <TileLayer
                         attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors &copy; <a href="https://carto.com/attributions">CARTO</a>'
@@ -123,10 +153,10 @@ const Dashboard = () => {
                         <CircleMarker
                             key={`hotspot-${i}`}
                             center={[h.lat, h.lng]}
-                            radius={5}
+                            radius={5 + Math.log2(h.count || 1)}
                             pathOptions={{ color: 'orange', fillColor: 'orange', fillOpacity: 0.5, weight: 0 }}
                         >
-                            <Popup>Historical Hotspot</Popup>
+                            <Popup>Hotspot: {h.count || 1} fraud txns</Popup>
                         </CircleMarker>
                     ))}
 
@@ -3,7 +3,8 @@ import { io } from 'socket.io-client';
 const URL = 'http://localhost:8000';
 const socket = io(URL, {
     autoConnect: true,
-    transports: ['polling', 'websocket'],
+    // WebSocket only: with several backend workers, polling requests would hit different workers
+    transports: ['websocket'],
 });
 
 socket.on('connect_error', (err) => {